@@ -0,0 +1,538 @@
+"""
+Reverse geocoder backends for alert locations.
+
+Alert.reverse_geocode() asks the backend configured by GEOCODER_BACKEND for
+a short address and falls back to formatted coordinates when the backend
+has no answer or fails:
+
+- NominatimBackend queries the public Nominatim service (the default).
+- GazetteerBackend answers from a local gazetteer index built with
+  `python manage.py build_gazetteer`, without any network access.
+
+The gazetteer index is a single binary file holding places bucketed into a
+regular latitude/longitude grid:
+
+    header        magic, byte order mark, cell size, counts
+    cell ids      sorted uint32 ids of the non-empty grid cells
+    cell offsets  uint32 index of the first place of each cell (+ end)
+    latitudes     float32 per place, grouped by cell
+    longitudes    float32 per place, grouped by cell
+    name offsets  uint32 offset of each place name (+ end)
+    names         UTF-8 names, concatenated
+
+The file is memory-mapped read-only, so every worker process on a host
+shares one copy through the page cache and opening it costs no parsing.
+A lookup binary-searches the cells around the point and only computes
+distances to the places in them.
+
+Calls to remote backends go through a circuit breaker and a rate limiter
+shared by the worker process. After GEOCODER_CIRCUIT_FAILURE_THRESHOLD
+consecutive failures the circuit opens and lookups fall back to
+coordinates immediately instead of waiting for the timeout; after
+GEOCODER_CIRCUIT_RESET_TIMEOUT seconds a single probe call is let through
+and closes the circuit again if it succeeds. The limiter caps concurrent
+calls and spaces them GEOCODER_MIN_INTERVAL seconds apart; callers that
+cannot get a slot within GEOCODER_QUEUE_TIMEOUT seconds fall back as well.
+"""
+import logging
+import mmap
+import struct
+import threading
+import time
+from collections import Counter
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from safezone_backend.geo_utils import grid_cell, grid_ring, grid_ring_distance_km, grid_shape
+from .utils import haversine_distance
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_MAGIC = b'SZGAZ001'
+# Written in native byte order; a mismatch means the file came from another architecture
+GAZETTEER_BYTE_ORDER_MARK = 0x01020304
+# magic, byte order mark, cell size (degrees), cell count, place count, names size
+_HEADER = struct.Struct('=8sIdIII')
+
+
+class GeocoderBackend:
+    """Base class for reverse geocoder backends."""
+
+    # Remote backends are called through the circuit breaker and rate limiter
+    remote = False
+
+    def reverse(self, latitude, longitude):
+        """
+        Return a short address for a location.
+
+        Returns:
+            Address string, or None when the location is unknown
+        """
+        raise NotImplementedError
+
+
+class NominatimBackend(GeocoderBackend):
+    """Reverse geocode with the public Nominatim service."""
+
+    remote = True
+
+    def reverse(self, latitude, longitude):
+        from .models import Alert, get_geolocator
+
+        location = get_geolocator().reverse(f"{latitude}, {longitude}", language='en')
+        if not location or not location.raw.get('address'):
+            return None
+
+        address = location.raw['address']
+        address_parts = []
+
+        # Try to get street information
+        if 'road' in address:
+            address_parts.append(address['road'])
+        elif 'pedestrian' in address:
+            address_parts.append(address['pedestrian'])
+
+        # Add neighborhood or suburb
+        if 'neighbourhood' in address:
+            address_parts.append(address['neighbourhood'])
+        elif 'suburb' in address:
+            address_parts.append(address['suburb'])
+        elif 'city_district' in address:
+            address_parts.append(address['city_district'])
+
+        # Add city or town
+        if 'city' in address:
+            address_parts.append(address['city'])
+        elif 'town' in address:
+            address_parts.append(address['town'])
+        elif 'village' in address:
+            address_parts.append(address['village'])
+
+        if address_parts:
+            return ', '.join(address_parts[:Alert.MAX_ADDRESS_PARTS])
+        return None
+
+
+def write_gazetteer(places, fileobj, cell_size=0.05):
+    """
+    Write a gazetteer index.
+
+    Args:
+        places: Iterable of (latitude, longitude, name) tuples
+        fileobj: Writable binary file object
+        cell_size: Grid cell size in degrees (0.05 = ~5.5km)
+
+    Returns:
+        Number of places written
+    """
+    _, columns = grid_shape(cell_size)
+
+    entries = []
+    for latitude, longitude, name in places:
+        row, column = grid_cell(latitude, longitude, cell_size)
+        entries.append((row * columns + column, latitude, longitude, name))
+    entries.sort(key=lambda entry: entry[0])
+
+    cell_ids = array('I')
+    cell_offsets = array('I')
+    latitudes = array('f')
+    longitudes = array('f')
+    name_offsets = array('I')
+    names = bytearray()
+
+    for index, (cell_id, latitude, longitude, name) in enumerate(entries):
+        if not cell_ids or cell_ids[-1] != cell_id:
+            cell_ids.append(cell_id)
+            cell_offsets.append(index)
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+        name_offsets.append(len(names))
+        names += name.encode('utf-8')
+    cell_offsets.append(len(entries))
+    name_offsets.append(len(names))
+
+    fileobj.write(_HEADER.pack(
+        GAZETTEER_MAGIC,
+        GAZETTEER_BYTE_ORDER_MARK,
+        cell_size,
+        len(cell_ids),
+        len(entries),
+        len(names),
+    ))
+    for section in (cell_ids, cell_offsets, latitudes, longitudes, name_offsets):
+        fileobj.write(section.tobytes())
+    fileobj.write(names)
+    return len(entries)
+
+
+class GazetteerIndex:
+    """Read-only, memory-mapped view of a gazetteer index file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as index_file:
+            self._mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, byte_order_mark, cell_size, cell_count, place_count, names_size = (
+            _HEADER.unpack_from(self._mmap)
+        )
+        if magic != GAZETTEER_MAGIC:
+            raise ValueError(f"{path} is not a gazetteer index")
+        if byte_order_mark != GAZETTEER_BYTE_ORDER_MARK:
+            raise ValueError(f"{path} was built on a machine with a different byte order")
+
+        self.cell_size = cell_size
+        self.rows, self.columns = grid_shape(cell_size)
+        self.place_count = place_count
+
+        view = memoryview(self._mmap)
+        offset = _HEADER.size
+
+        def section(typecode, count):
+            nonlocal offset
+            size = count * array(typecode).itemsize
+            data = view[offset:offset + size].cast(typecode)
+            offset += size
+            return data
+
+        self._cell_ids = section('I', cell_count)
+        self._cell_offsets = section('I', cell_count + 1)
+        self._latitudes = section('f', place_count)
+        self._longitudes = section('f', place_count)
+        self._name_offsets = section('I', place_count + 1)
+        self._names = view[offset:offset + names_size]
+
+    def _cell_places(self, row, column):
+        """Return the range of place indexes in a grid cell."""
+        cell_id = row * self.columns + column
+        position = bisect_left(self._cell_ids, cell_id)
+        if position == len(self._cell_ids) or self._cell_ids[position] != cell_id:
+            return range(0)
+        return range(self._cell_offsets[position], self._cell_offsets[position + 1])
+
+    def name(self, index):
+        """Return the name of a place."""
+        start, end = self._name_offsets[index], self._name_offsets[index + 1]
+        return bytes(self._names[start:end]).decode('utf-8')
+
+    def nearest(self, latitude, longitude, max_distance_km):
+        """
+        Find the nearest place within max_distance_km of a point.
+
+        Returns:
+            Tuple (name, distance in km), or None if no place is close enough
+        """
+        row, column = grid_cell(latitude, longitude, self.cell_size)
+
+        best_index, best_distance = None, max_distance_km
+        for radius in range(max(self.rows, self.columns) + 1):
+            # Places in this and further rings are at least this far away
+            if grid_ring_distance_km(latitude, radius, self.cell_size) > best_distance:
+                break
+            for ring_row, ring_column in grid_ring(row, column, radius, self.cell_size):
+                for index in self._cell_places(ring_row, ring_column):
+                    distance = haversine_distance(
+                        longitude, latitude,
+                        self._longitudes[index], self._latitudes[index],
+                    )
+                    if distance <= best_distance:
+                        best_index, best_distance = index, distance
+
+        if best_index is None:
+            return None
+        return self.name(best_index), best_distance
+
+
+class GazetteerBackend(GeocoderBackend):
+    """
+    Reverse geocode from a local gazetteer index (GEOCODER_GAZETTEER_PATH).
+
+    Returns the nearest place within GEOCODER_GAZETTEER_MAX_DISTANCE_KM.
+    """
+
+    def __init__(self, path=None, max_distance_km=None):
+        self.path = path or getattr(settings, 'GEOCODER_GAZETTEER_PATH', '')
+        if max_distance_km is None:
+            max_distance_km = getattr(settings, 'GEOCODER_GAZETTEER_MAX_DISTANCE_KM', 5.0)
+        self.max_distance_km = max_distance_km
+        self.index = GazetteerIndex(self.path)
+        logger.info(f"Loaded gazetteer with {self.index.place_count} place(s) from {self.path}")
+
+    def reverse(self, latitude, longitude):
+        result = self.index.nearest(latitude, longitude, self.max_distance_km)
+        return result[0] if result else None
+
+
+_backend = None
+_backend_key = None
+_backend_lock = threading.Lock()
+
+
+def get_geocoder_backend():
+    """
+    Return the geocoder backend configured by GEOCODER_BACKEND.
+
+    The instance is shared by all requests of the worker and rebuilt when
+    the backend settings change.
+    """
+    global _backend, _backend_key
+
+    key = (
+        getattr(settings, 'GEOCODER_BACKEND', 'alerts.geocoding.NominatimBackend'),
+        getattr(settings, 'GEOCODER_GAZETTEER_PATH', ''),
+        getattr(settings, 'GEOCODER_GAZETTEER_MAX_DISTANCE_KM', 5.0),
+    )
+    with _backend_lock:
+        if _backend is None or _backend_key != key:
+            _backend = import_string(key[0])()
+            _backend_key = key
+        return _backend
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    Closed: calls are allowed. Open: calls are rejected until reset_timeout
+    has passed. Half-open: one probe call is allowed; its success closes the
+    circuit and its failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Return True if a call may proceed; claims the probe when half-open."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def cancel(self):
+        """Give back a probe claimed by allow() when the call did not happen."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        """
+        Record a successful call.
+
+        Returns:
+            True if this closed the circuit
+        """
+        with self._lock:
+            closed = self._state != self.CLOSED
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+            return closed
+
+    def record_failure(self):
+        """
+        Record a failed call.
+
+        Returns:
+            True if this opened the circuit
+        """
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                return True
+            return False
+
+
+class RateLimiter:
+    """Limit concurrent calls and space the start of calls min_interval apart."""
+
+    def __init__(self, max_concurrency, min_interval, clock=time.monotonic, sleep=time.sleep):
+        self.min_interval = min_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def acquire(self, timeout):
+        """
+        Wait up to timeout seconds for a slot.
+
+        Returns:
+            True if a slot was acquired; release() it after the call
+        """
+        deadline = self._clock() + timeout
+        if not self._slots.acquire(timeout=timeout):
+            return False
+
+        with self._lock:
+            start = max(self._clock(), self._next_start)
+            if start > deadline:
+                self._slots.release()
+                return False
+            self._next_start = start + self.min_interval
+
+        delay = start - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+        return True
+
+    def release(self):
+        self._slots.release()
+
+
+class GeocoderStats:
+    """Thread-safe geocoder call counters."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def get(self, name):
+        with self._lock:
+            return self._counts[name]
+
+    def snapshot(self):
+        """Return a copy of all counters."""
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+# Per-worker counters: calls, failures, short_circuited, rate_limited,
+# circuit_opened, failure_seconds and time_saved_seconds
+geocoder_stats = GeocoderStats()
+
+_guards = None
+_guards_key = None
+_guards_lock = threading.Lock()
+
+
+def get_geocoder_guards():
+    """Return the worker's (CircuitBreaker, RateLimiter) for remote geocoder calls."""
+    global _guards, _guards_key
+
+    key = (
+        getattr(settings, 'GEOCODER_CIRCUIT_FAILURE_THRESHOLD', 5),
+        getattr(settings, 'GEOCODER_CIRCUIT_RESET_TIMEOUT', 30.0),
+        getattr(settings, 'GEOCODER_MAX_CONCURRENCY', 2),
+        getattr(settings, 'GEOCODER_MIN_INTERVAL', 1.0),
+    )
+    with _guards_lock:
+        if _guards is None or _guards_key != key:
+            failure_threshold, reset_timeout, max_concurrency, min_interval = key
+            _guards = (
+                CircuitBreaker(failure_threshold, reset_timeout),
+                RateLimiter(max_concurrency, min_interval),
+            )
+            _guards_key = key
+        return _guards
+
+
+def reset_geocoder_guards():
+    """Close the circuit, clear the limiter and reset the counters."""
+    global _guards
+    with _guards_lock:
+        _guards = None
+    geocoder_stats.reset()
+
+
+def get_geocoder_stats():
+    """Return this worker's geocoder counters and the circuit state."""
+    breaker, _ = get_geocoder_guards()
+    stats = geocoder_stats.snapshot()
+    stats['circuit_state'] = breaker.state
+    return stats
+
+
+def _average_failure_seconds():
+    failures = geocoder_stats.get('failures')
+    return geocoder_stats.get('failure_seconds') / failures if failures else 0.0
+
+
+def reverse_geocode(latitude, longitude):
+    """
+    Reverse geocode with the configured backend.
+
+    Remote backends are called through the circuit breaker and rate limiter;
+    rejected calls return None without contacting the service.
+
+    Returns:
+        Address string, or None when the location is unknown or the call
+        was rejected
+
+    Raises:
+        Whatever the backend raises when the call fails
+    """
+    backend = get_geocoder_backend()
+    if not backend.remote:
+        return backend.reverse(latitude, longitude)
+
+    breaker, limiter = get_geocoder_guards()
+    if not breaker.allow():
+        geocoder_stats.increment('short_circuited')
+        # A failing call would have taken about as long as the previous failures
+        geocoder_stats.increment('time_saved_seconds', _average_failure_seconds())
+        return None
+
+    if not limiter.acquire(getattr(settings, 'GEOCODER_QUEUE_TIMEOUT', 0.5)):
+        breaker.cancel()
+        geocoder_stats.increment('rate_limited')
+        return None
+
+    started = time.monotonic()
+    try:
+        address = backend.reverse(latitude, longitude)
+    except Exception:
+        geocoder_stats.increment('failures')
+        geocoder_stats.increment('failure_seconds', time.monotonic() - started)
+        if breaker.record_failure():
+            geocoder_stats.increment('circuit_opened')
+            logger.warning(
+                f"Geocoder circuit opened; falling back to coordinates for "
+                f"{breaker.reset_timeout}s"
+            )
+        raise
+    else:
+        geocoder_stats.increment('calls')
+        if breaker.record_success():
+            logger.info("Geocoder circuit closed")
+        return address
+    finally:
+        limiter.release()
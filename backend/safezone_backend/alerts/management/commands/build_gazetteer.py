@@ -0,0 +1,82 @@
+"""
+Django management command to build the offline reverse geocoding index.
+
+Reads a GeoNames-style tab-separated extract (for example a country file
+from https://download.geonames.org/export/dump/) and writes the compact
+gazetteer index used by alerts.geocoding.GazetteerBackend.
+
+Usage:
+    python manage.py build_gazetteer GB.txt [more.txt ...] --output gazetteer.bin
+                                     [--feature-classes P,R,S] [--cell-size 0.05]
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from alerts.geocoding import write_gazetteer
+
+# GeoNames columns used by the index
+NAME_COLUMN = 1
+LATITUDE_COLUMN = 4
+LONGITUDE_COLUMN = 5
+FEATURE_CLASS_COLUMN = 6
+
+
+class Command(BaseCommand):
+    help = 'Build the offline reverse geocoding index from GeoNames-style extracts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'sources',
+            nargs='+',
+            help='GeoNames-style tab-separated files',
+        )
+        parser.add_argument(
+            '--output',
+            help='Index file to write (default: GEOCODER_GAZETTEER_PATH)',
+        )
+        parser.add_argument(
+            '--feature-classes',
+            default='',
+            help='Comma-separated GeoNames feature classes to include, e.g. P,R,S '
+                 '(default: all)',
+        )
+        parser.add_argument(
+            '--cell-size',
+            type=float,
+            default=0.05,
+            help='Grid cell size in degrees (default: 0.05, ~5.5km)',
+        )
+
+    def iter_places(self, sources, feature_classes):
+        """Yield (latitude, longitude, name) tuples, skipping malformed lines."""
+        for source in sources:
+            with open(source, encoding='utf-8') as source_file:
+                for line_number, line in enumerate(source_file, 1):
+                    columns = line.rstrip('\n').split('\t')
+                    try:
+                        name = columns[NAME_COLUMN]
+                        latitude = float(columns[LATITUDE_COLUMN])
+                        longitude = float(columns[LONGITUDE_COLUMN])
+                        feature_class = columns[FEATURE_CLASS_COLUMN]
+                    except (IndexError, ValueError):
+                        self.stderr.write(f'  Skipping malformed line {line_number} of {source}')
+                        continue
+                    if name and (not feature_classes or feature_class in feature_classes):
+                        yield latitude, longitude, name
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'GEOCODER_GAZETTEER_PATH', '')
+        if not output:
+            raise CommandError('Provide --output or set GEOCODER_GAZETTEER_PATH')
+        if options['cell_size'] <= 0:
+            raise CommandError('--cell-size must be positive')
+
+        feature_classes = {c.strip() for c in options['feature_classes'].split(',') if c.strip()}
+        with open(output, 'wb') as output_file:
+            count = write_gazetteer(
+                self.iter_places(options['sources'], feature_classes),
+                output_file,
+                cell_size=options['cell_size'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {count} place(s) to {output}'))
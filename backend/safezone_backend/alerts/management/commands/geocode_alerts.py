@@ -0,0 +1,50 @@
+"""
+Django management command to geocode alerts still showing coordinates.
+
+Alerts are created with their coordinates as location and geocoded by a
+background worker after the response. Lookups that fail, batches shed
+when the worker's queue is full and batches lost when a worker restarts
+leave the coordinates in place; run this periodically (e.g. hourly from
+cron) to retry them, newest first.
+
+Usage:
+    python manage.py geocode_alerts [--limit 500] [--batch-size 50]
+"""
+
+from django.core.management.base import BaseCommand
+from alerts.utils import alerts_awaiting_geocoding, geocode_alert_locations
+
+
+class Command(BaseCommand):
+    help = 'Reverse geocode alerts whose location is still the coordinate placeholder'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='Maximum number of alerts to look up (default: 500)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Alerts loaded per query (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        alert_ids = list(
+            alerts_awaiting_geocoding().order_by('-id').values_list('id', flat=True)[:options['limit']]
+        )
+        self.stdout.write(f'Geocoding {len(alert_ids)} alert(s)...')
+
+        updated = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(alert_ids), batch_size):
+            updated += geocode_alert_locations(alert_ids[start:start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Geocoded {updated} alert(s); {len(alert_ids) - updated} still without an address'
+            )
+        )
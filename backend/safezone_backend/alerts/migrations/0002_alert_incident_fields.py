@@ -0,0 +1,45 @@
+# Generated by Django 4.2.23 on 2026-10-19 08:13
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_incident_fields(apps, schema_editor):
+    """Copy incident category, coordinates and confirmations onto existing alerts."""
+    Alert = apps.get_model('alerts', 'Alert')
+    Incident = apps.get_model('incident_reporting', 'Incident')
+
+    incident = Incident.objects.filter(pk=OuterRef('incident_id'))
+    Alert.objects.update(
+        incident_category=Subquery(incident.values('category')[:1]),
+        incident_latitude=Subquery(incident.values('latitude')[:1]),
+        incident_longitude=Subquery(incident.values('longitude')[:1]),
+        confirmed_by=Subquery(incident.values('confirmed_by')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0001_initial'),
+        ('incident_reporting', '0002_incident_reporter_device_id_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='incident_category',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='incident_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='incident_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_incident_fields, migrations.RunPython.noop),
+    ]
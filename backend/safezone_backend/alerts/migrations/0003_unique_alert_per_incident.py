@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-19 08:14
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicate_alerts(apps, schema_editor):
+    """Keep only the oldest alert of each incident before adding the constraint."""
+    Alert = apps.get_model('alerts', 'Alert')
+
+    first_alerts = (
+        Alert.objects.values('incident_id')
+        .annotate(first_id=Min('id'))
+        .values('first_id')
+    )
+    Alert.objects.exclude(id__in=first_alerts).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerts', '0002_alert_incident_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(fields=('incident',), name='unique_alert_per_incident'),
+        ),
+    ]
@@ -33,6 +33,28 @@ class Alert(models.Model):
         ('info', 'Info'),
     ]
     
+    # Severity of the alert raised for each incident category
+    SEVERITY_MAP = {
+        'assault': 'high',
+        'theft': 'high',
+        'fire': 'high',
+        'weaponSighting': 'high',
+        'medicalEmergency': 'high',
+        'naturalDisaster': 'high',
+        'harassment': 'medium',
+        'suspicious': 'medium',
+        'vandalism': 'medium',
+        'drugActivity': 'medium',
+        'roadHazard': 'medium',
+        'accident': 'medium',
+        'trespassing': 'low',
+        'lighting': 'low',
+        'powerOutage': 'info',
+        'waterIssue': 'info',
+        'noise': 'info',
+        'animalDanger': 'low',
+    }
+    
     TYPE_CHOICES = [
         ('highRisk', 'High Risk'),
         ('theft', 'Theft'),
@@ -61,6 +83,11 @@ class Alert(models.Model):
     location = models.CharField(max_length=255)
     timestamp = models.DateTimeField(auto_now_add=True)
     confirmed_by = models.IntegerField(default=0, blank=True, null=True)
+    # Copied from the incident so alert lists are served from this table alone;
+    # kept in sync by alerts.signals
+    incident_category = models.CharField(max_length=50, blank=True, null=True)
+    incident_latitude = models.FloatField(blank=True, null=True)
+    incident_longitude = models.FloatField(blank=True, null=True)
     distance_meters = models.FloatField(
         null=True,
         blank=True,
@@ -69,6 +96,10 @@ class Alert(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        constraints = [
+            # One alert per incident, also when generated concurrently
+            models.UniqueConstraint(fields=['incident'], name='unique_alert_per_incident'),
+        ]
         indexes = [
             models.Index(fields=['-timestamp']),
             models.Index(fields=['severity']),
@@ -78,11 +109,38 @@ class Alert(models.Model):
     def __str__(self):
         return f"{self.severity.upper()} - {self.title}"
     
+    def save(self, *args, **kwargs):
+        if self.incident_category is None:
+            # Alert created directly rather than with build_alert_from_incident()
+            self.incident_category = self.incident.category
+            self.incident_latitude = self.incident.latitude
+            self.incident_longitude = self.incident.longitude
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def incident_field_values(incident):
+        """Return the denormalized incident fields as update() keyword arguments."""
+        return {
+            'incident_category': incident.category,
+            'incident_latitude': incident.latitude,
+            'incident_longitude': incident.longitude,
+            'confirmed_by': incident.confirmed_by,
+        }
+    
+    @staticmethod
+    def coordinate_location(latitude, longitude):
+        """Return the formatted coordinates used as location before geocoding."""
+        return f"{latitude:.6f}, {longitude:.6f}"
+    
     @staticmethod
     def reverse_geocode(latitude, longitude):
         """
         Reverse geocode coordinates to get a simplified street address.
         
+        Uses the backend configured by GEOCODER_BACKEND (Nominatim by
+        default, or a local gazetteer; see alerts.geocoding). While the
+        geocoder circuit is open, returns coordinates without waiting.
+        
         Args:
             latitude: Latitude coordinate
             longitude: Longitude coordinate
@@ -90,44 +148,12 @@ class Alert(models.Model):
         Returns:
             Simplified street address or formatted coordinates if geocoding fails
         """
+        from .geocoding import reverse_geocode
+        
         try:
-            # Get the shared geolocator instance
-            geolocator = get_geolocator()
-            
-            # Reverse geocode the coordinates
-            location = geolocator.reverse(f"{latitude}, {longitude}", language='en')
-            
-            if location and location.raw.get('address'):
-                address = location.raw['address']
-                
-                # Build simplified address from available components
-                address_parts = []
-                
-                # Try to get street information
-                if 'road' in address:
-                    address_parts.append(address['road'])
-                elif 'pedestrian' in address:
-                    address_parts.append(address['pedestrian'])
-                
-                # Add neighborhood or suburb
-                if 'neighbourhood' in address:
-                    address_parts.append(address['neighbourhood'])
-                elif 'suburb' in address:
-                    address_parts.append(address['suburb'])
-                elif 'city_district' in address:
-                    address_parts.append(address['city_district'])
-                
-                # Add city or town
-                if 'city' in address:
-                    address_parts.append(address['city'])
-                elif 'town' in address:
-                    address_parts.append(address['town'])
-                elif 'village' in address:
-                    address_parts.append(address['village'])
-                
-                # Return simplified address if we have components
-                if address_parts:
-                    return ', '.join(address_parts[:Alert.MAX_ADDRESS_PARTS])
+            address = reverse_geocode(latitude, longitude)
+            if address:
+                return address
             
             # Fallback to coordinates if address not found
             return f"{latitude:.6f}, {longitude:.6f}"
@@ -151,28 +177,24 @@ class Alert(models.Model):
         Returns:
             Alert object
         """
-        # Determine severity based on incident category
-        severity_map = {
-            'assault': 'high',
-            'theft': 'high',
-            'fire': 'high',
-            'weaponSighting': 'high',
-            'medicalEmergency': 'high',
-            'naturalDisaster': 'high',
-            'harassment': 'medium',
-            'suspicious': 'medium',
-            'vandalism': 'medium',
-            'drugActivity': 'medium',
-            'roadHazard': 'medium',
-            'accident': 'medium',
-            'trespassing': 'low',
-            'lighting': 'low',
-            'powerOutage': 'info',
-            'waterIssue': 'info',
-            'noise': 'info',
-            'animalDanger': 'low',
-        }
+        alert = cls.build_alert_from_incident(incident, distance_meters)
+        alert.save()
+        return alert
+    
+    @classmethod
+    def build_alert_from_incident(cls, incident, distance_meters=None, geocode=True):
+        """
+        Build an unsaved alert from an incident.
         
+        Args:
+            incident: The Incident object to create an alert from
+            distance_meters: Optional distance from user location
+            geocode: Reverse geocode the location; when False the incident
+                coordinates are used, e.g. for bulk imports
+            
+        Returns:
+            Unsaved Alert object
+        """
         # Determine alert type based on category
         type_map = {
             'assault': 'highRisk',
@@ -183,21 +205,24 @@ class Alert(models.Model):
             'accident': 'trafficCleared',
         }
         
-        severity = severity_map.get(incident.category, 'info')
+        severity = cls.SEVERITY_MAP.get(incident.category, 'info')
         alert_type = type_map.get(incident.category, 'highRisk')
         
         # Generate location string using reverse geocoding
-        location = cls.reverse_geocode(incident.latitude, incident.longitude)
+        if geocode:
+            location = cls.reverse_geocode(incident.latitude, incident.longitude)
+        else:
+            location = cls.coordinate_location(incident.latitude, incident.longitude)
         
         # Create alert title based on incident
         title = f"{incident.get_category_display()} Reported Nearby"
         
-        return cls.objects.create(
+        return cls(
             incident=incident,
             alert_type=alert_type,
             severity=severity,
             title=title,
             location=location,
-            confirmed_by=incident.confirmed_by,
             distance_meters=distance_meters,
+            **cls.incident_field_values(incident),
         )
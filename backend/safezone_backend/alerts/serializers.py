@@ -44,21 +44,14 @@ class AlertSerializer(serializers.ModelSerializer):
 
 
 class AlertListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for listing alerts without full incident data."""
+    """
+    Lightweight serializer for listing alerts without full incident data.
     
-    incident_id = serializers.IntegerField(source='incident.id', read_only=True)
-    incident_category = serializers.CharField(
-        source='incident.category',
-        read_only=True
-    )
-    incident_latitude = serializers.FloatField(
-        source='incident.latitude',
-        read_only=True
-    )
-    incident_longitude = serializers.FloatField(
-        source='incident.longitude',
-        read_only=True
-    )
+    Incident fields are read from the copies stored on the alert, so
+    listing never loads the incidents.
+    """
+    
+    incident_id = serializers.IntegerField(read_only=True)
     time_ago = serializers.SerializerMethodField()
     
     class Meta:
@@ -78,7 +71,14 @@ class AlertListSerializer(serializers.ModelSerializer):
             'distance_meters',
             'time_ago',
         ]
-        read_only_fields = ['id', 'timestamp', 'time_ago']
+        read_only_fields = [
+            'id',
+            'incident_category',
+            'incident_latitude',
+            'incident_longitude',
+            'timestamp',
+            'time_ago',
+        ]
     
     def get_time_ago(self, obj):
         """Calculate human-readable time difference."""
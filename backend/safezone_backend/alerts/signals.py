@@ -0,0 +1,19 @@
+"""
+Signal handlers keeping the incident fields copied onto alerts up to date.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from incident_reporting.models import Incident
+from .models import Alert
+
+
+@receiver(post_save, sender=Incident)
+def sync_alert_incident_fields(sender, instance, created, **kwargs):
+    """Copy an updated incident's category, coordinates and confirmations to its alerts."""
+    if created:
+        # Alerts are built from the incident after it is saved
+        return
+    Alert.objects.filter(incident_id=instance.pk).update(
+        **Alert.incident_field_values(instance)
+    )
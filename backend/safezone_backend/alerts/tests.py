@@ -1,7 +1,9 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from datetime import timedelta
 from unittest.mock import patch, MagicMock
+from rest_framework.test import APIClient
+from .geocoding import reset_geocoder_guards
 from .models import Alert
 from incident_reporting.models import Incident
 
@@ -11,6 +13,9 @@ class AlertModelTest(TestCase):
 
     def setUp(self):
         """Set up test data."""
+        # Start every test with a closed geocoder circuit and an idle rate limiter
+        reset_geocoder_guards()
+        
         # Create a test incident
         self.incident = Incident.objects.create(
             category='assault',
@@ -74,8 +79,14 @@ class AlertModelTest(TestCase):
         )
         
         # Manually set timestamp for older alert
+        other_incident = Incident.objects.create(
+            category='theft',
+            latitude=37.7750,
+            longitude=-122.4195,
+            title='Test Theft Incident',
+        )
         alert2 = Alert.objects.create(
-            incident=self.incident,
+            incident=other_incident,
             alert_type='theft',
             severity='medium',
             title='Alert 2',
@@ -204,3 +215,365 @@ class AlertModelTest(TestCase):
             
             # Should fallback to coordinates
             self.assertEqual(result, '37.774900, -122.419400')
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='')
+class AlertReadModelTest(TestCase):
+    """Tests for the incident fields copied onto alerts."""
+
+    def setUp(self):
+        """Set up an incident with an alert."""
+        self.client = APIClient()
+        self.incident = Incident.objects.create(
+            category='theft',
+            latitude=40.7128,
+            longitude=-74.0060,
+            title='Bike stolen',
+            description='Test description',
+        )
+        self.alert = Alert.build_alert_from_incident(self.incident, geocode=False)
+        self.alert.save()
+
+    def test_alert_copies_incident_fields(self):
+        """Test that alerts store the incident category and coordinates."""
+        built = self.alert
+        built.delete()
+        direct = Alert.objects.create(
+            incident=self.incident,
+            title='Direct alert',
+            location='Somewhere',
+        )
+        for alert in (built, direct):
+            self.assertEqual(alert.incident_category, 'theft')
+            self.assertEqual(alert.incident_latitude, 40.7128)
+            self.assertEqual(alert.incident_longitude, -74.0060)
+
+    def test_incident_update_syncs_alerts(self):
+        """Test that editing or confirming an incident updates its alerts."""
+        self.incident.category = 'assault'
+        self.incident.latitude = 40.75
+        self.incident.confirmed_by = 4
+        self.incident.save()
+
+        self.alert.refresh_from_db()
+        self.assertEqual(self.alert.incident_category, 'assault')
+        self.assertEqual(self.alert.incident_latitude, 40.75)
+        self.assertEqual(self.alert.confirmed_by, 4)
+
+    def test_alert_list_single_query(self):
+        """Test that listing alerts does not load incidents."""
+        other = Incident.objects.create(
+            category='fire',
+            latitude=40.7130,
+            longitude=-74.0062,
+            title='Fire',
+            description='Test description',
+        )
+        Alert.build_alert_from_incident(other, geocode=False).save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/alerts/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        result = next(r for r in response.data['results'] if r['incident_id'] == other.id)
+        self.assertEqual(result['incident_category'], 'fire')
+        self.assertEqual(result['incident_latitude'], 40.7130)
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='')
+class AlertGenerateViewTest(TestCase):
+    """Tests for deduplicated alert generation."""
+
+    def setUp(self):
+        """Set up nearby incidents and one far away."""
+        self.client = APIClient()
+        self.nearby = [
+            Incident.objects.create(
+                category=category,
+                latitude=51.5074 + offset,
+                longitude=-0.1278,
+                title=f'Test {category}',
+            )
+            for category, offset in [('theft', 0.001), ('fire', 0.002), ('assault', 0.003)]
+        ]
+        Incident.objects.create(
+            category='noise',
+            latitude=48.8566,
+            longitude=2.3522,
+            title='Far away',
+        )
+        self.payload = {'latitude': 51.5074, 'longitude': -0.1278, 'radius_km': 5}
+
+    def test_generate_uses_constant_queries(self):
+        """Test that alerts are created in bulk and geocoded later."""
+        with patch('alerts.views.schedule_alert_geocoding') as mock_schedule, \
+                patch.object(Alert, 'reverse_geocode') as mock_geocode:
+            # Recent incidents, existing alerts, bulk insert, created alerts
+            with self.assertNumQueries(4):
+                response = self.client.post('/api/alerts/generate/', self.payload, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 3)
+        mock_geocode.assert_not_called()
+        scheduled = set(mock_schedule.call_args[0][0])
+        self.assertEqual(scheduled, set(Alert.objects.values_list('id', flat=True)))
+        self.assertEqual(
+            Alert.objects.get(incident=self.nearby[0]).location,
+            f'{51.5084:.6f}, {-0.1278:.6f}'
+        )
+
+    def test_generate_skips_existing_alerts(self):
+        """Test that repeated generation does not duplicate alerts."""
+        Alert.build_alert_from_incident(self.nearby[0], geocode=False).save()
+        
+        with patch('alerts.views.schedule_alert_geocoding'):
+            first = self.client.post('/api/alerts/generate/', self.payload, format='json')
+            second = self.client.post('/api/alerts/generate/', self.payload, format='json')
+        
+        self.assertEqual(first.data['count'], 2)
+        self.assertEqual(second.data['count'], 0)
+        self.assertEqual(Alert.objects.count(), 3)
+
+    def test_one_alert_per_incident(self):
+        """Test that the database rejects a second alert for an incident."""
+        from django.db import IntegrityError, transaction
+        
+        Alert.build_alert_from_incident(self.nearby[0], geocode=False).save()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Alert.build_alert_from_incident(self.nearby[0], geocode=False).save()
+        
+        # bulk_create with ignore_conflicts skips the duplicate
+        Alert.objects.bulk_create(
+            [Alert.build_alert_from_incident(self.nearby[0], geocode=False)],
+            ignore_conflicts=True
+        )
+        self.assertEqual(Alert.objects.filter(incident=self.nearby[0]).count(), 1)
+
+    def test_geocode_alert_locations(self):
+        """Test that deferred geocoding replaces the coordinate placeholder."""
+        from .utils import geocode_alert_locations
+        
+        alert = Alert.build_alert_from_incident(self.nearby[1], geocode=False)
+        alert.save()
+        
+        with patch.object(Alert, 'reverse_geocode', return_value='Strand, London') as mock_geocode:
+            self.assertEqual(geocode_alert_locations([alert.id]), 1)
+        
+        mock_geocode.assert_called_once_with(51.5094, -0.1278)
+        alert.refresh_from_db()
+        self.assertEqual(alert.location, 'Strand, London')
+    
+    def test_geocode_alert_locations_skips_geocoded_alerts(self):
+        """Test that repeated and concurrent runs do not geocode an alert twice."""
+        from .utils import geocode_alert_locations
+        
+        alerts = [Alert.build_alert_from_incident(incident, geocode=False) for incident in self.nearby]
+        for alert in alerts:
+            alert.save()
+        Alert.objects.filter(id=alerts[0].id).update(location='Already, London')
+        
+        def geocode_concurrently(latitude, longitude):
+            # Another worker geocodes the last alert while this call is in flight
+            Alert.objects.filter(id=alerts[2].id).update(location='Concurrent, London')
+            return 'Strand, London'
+        
+        alert_ids = [alert.id for alert in alerts]
+        with patch.object(Alert, 'reverse_geocode', side_effect=geocode_concurrently) as mock_geocode:
+            self.assertEqual(geocode_alert_locations(alert_ids), 1)
+            self.assertEqual(geocode_alert_locations(alert_ids), 0)
+        
+        self.assertEqual(mock_geocode.call_count, 2)
+        self.assertEqual(
+            sorted(Alert.objects.filter(id__in=alert_ids).values_list('location', flat=True)),
+            ['Already, London', 'Concurrent, London', 'Strand, London'],
+        )
+    
+    def test_geocode_alerts_command_retries_placeholders(self):
+        """Test that the command geocodes alerts still showing their coordinates."""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        alerts = [Alert.build_alert_from_incident(incident, geocode=False) for incident in self.nearby]
+        for alert in alerts:
+            alert.save()
+        Alert.objects.filter(id=alerts[0].id).update(location='Already, London')
+        
+        out = StringIO()
+        with patch.object(Alert, 'reverse_geocode', side_effect=lambda lat, lon: (
+            'Strand, London' if lat == alerts[1].incident_latitude else Alert.coordinate_location(lat, lon)
+        )) as mock_geocode:
+            call_command('geocode_alerts', stdout=out)
+        
+        self.assertEqual(mock_geocode.call_count, 2)
+        self.assertIn('Geocoded 1 alert(s); 1 still without an address', out.getvalue())
+        self.assertEqual(
+            list(Alert.objects.filter(id__in=[a.id for a in alerts]).order_by('id').values_list('location', flat=True)),
+            ['Already, London', 'Strand, London', alerts[2].location],
+        )
+    
+    @override_settings(GEOCODER_BACKGROUND_MAX_PENDING=1)
+    def test_geocoding_queue_sheds_when_full(self):
+        """Test that batches beyond the pending limit are not queued."""
+        from . import utils
+        
+        with patch.object(utils, '_geocoding_executor') as mock_executor, \
+                patch.object(utils, 'geocode_alert_locations'), \
+                patch.object(utils, 'connection'):
+            with self.captureOnCommitCallbacks(execute=True):
+                utils.schedule_alert_geocoding([1])
+                utils.schedule_alert_geocoding([2])
+            self.assertEqual(mock_executor.submit.call_count, 1)
+            
+            # Finishing the queued batch frees its slot
+            utils._geocode_in_background([1])
+            with self.captureOnCommitCallbacks(execute=True):
+                utils.schedule_alert_geocoding([3])
+            self.assertEqual(mock_executor.submit.call_count, 2)
+            utils._geocode_in_background([3])
+
+
+class GazetteerGeocoderTest(TestCase):
+    """Tests for the offline gazetteer reverse geocoder."""
+
+    PLACES = [
+        # GeoNames columns: id, name, ascii name, alternate names, latitude, longitude, feature class
+        ('1', 'Whitehall', 'Whitehall', '', '51.5040', '-0.1265', 'R'),
+        ('2', 'Trafalgar Square', 'Trafalgar Square', '', '51.5080', '-0.1281', 'S'),
+        ('3', 'London', 'London', '', '51.5085', '-0.1257', 'P'),
+        ('4', 'Taveuni', 'Taveuni', '', '-16.85', '179.99', 'T'),
+        ('5', 'Broken line', 'Broken', '', 'north', '', 'P'),
+    ]
+
+    def setUp(self):
+        """Build an index from a small GeoNames-style extract."""
+        import os
+        import shutil
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, 'places.txt')
+        with open(source, 'w', encoding='utf-8') as source_file:
+            for place in self.PLACES:
+                source_file.write('\t'.join(place) + '\n')
+        
+        self.index_path = os.path.join(directory, 'gazetteer.bin')
+        out = StringIO()
+        call_command(
+            'build_gazetteer', source, '--output', self.index_path,
+            '--feature-classes', 'R,S,T', stdout=out, stderr=StringIO(),
+        )
+        self.assertIn('Wrote 3 place(s)', out.getvalue())
+
+    def test_nearest_place(self):
+        """Test that the nearest place within the distance limit is returned."""
+        from .geocoding import GazetteerIndex
+        
+        index = GazetteerIndex(self.index_path)
+        name, distance = index.nearest(51.5075, -0.1279, max_distance_km=5)
+        self.assertEqual(name, 'Trafalgar Square')
+        self.assertLess(distance, 0.1)
+        
+        # Across the antimeridian
+        name, _ = index.nearest(-16.85, -179.99, max_distance_km=5)
+        self.assertEqual(name, 'Taveuni')
+        
+        self.assertIsNone(index.nearest(48.8566, 2.3522, max_distance_km=5))
+
+    def test_reverse_geocode_with_gazetteer_backend(self):
+        """Test that alerts are geocoded offline and fall back to coordinates."""
+        with override_settings(
+            GEOCODER_BACKEND='alerts.geocoding.GazetteerBackend',
+            GEOCODER_GAZETTEER_PATH=self.index_path,
+            GEOCODER_GAZETTEER_MAX_DISTANCE_KM=1,
+        ), patch('alerts.models.get_geolocator') as mock_get_geolocator:
+            self.assertEqual(Alert.reverse_geocode(51.5041, -0.1266), 'Whitehall')
+            self.assertEqual(Alert.reverse_geocode(51.6, -0.1266), '51.600000, -0.126600')
+        
+        mock_get_geolocator.assert_not_called()
+
+
+class GeocoderGuardTest(TestCase):
+    """Tests for the circuit breaker and rate limiter around the geocoder."""
+
+    def setUp(self):
+        """Reset the worker's geocoder guards and counters."""
+        reset_geocoder_guards()
+        self.addCleanup(reset_geocoder_guards)
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def test_circuit_breaker_states(self):
+        """Test opening, half-open probing and closing of the circuit."""
+        from .geocoding import CircuitBreaker
+        
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=self.clock)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.record_failure())
+        self.assertTrue(breaker.record_failure())
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        
+        # After the reset timeout exactly one probe goes through
+        self.now = 10
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        
+        # A failed probe reopens the circuit, a successful one closes it
+        self.assertTrue(breaker.record_failure())
+        self.assertFalse(breaker.allow())
+        self.now = 20
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.record_success())
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_rate_limiter(self):
+        """Test that calls are spaced out and concurrency is capped."""
+        from .geocoding import RateLimiter
+        
+        sleeps = []
+        
+        def sleep(seconds):
+            sleeps.append(seconds)
+            self.now += seconds
+        
+        limiter = RateLimiter(max_concurrency=1, min_interval=1.0, clock=self.clock, sleep=sleep)
+        self.assertTrue(limiter.acquire(timeout=0))
+        self.assertFalse(limiter.acquire(timeout=0))
+        limiter.release()
+        
+        # The next call may start one interval after the previous one
+        self.now = 0.25
+        self.assertFalse(limiter.acquire(timeout=0.5))
+        self.assertTrue(limiter.acquire(timeout=1.0))
+        self.assertEqual(sleeps, [0.75])
+        limiter.release()
+
+    @override_settings(GEOCODER_CIRCUIT_FAILURE_THRESHOLD=2, GEOCODER_MIN_INTERVAL=0)
+    def test_outage_short_circuits_geocoding(self):
+        """Test that an open circuit falls back to coordinates without calling the service."""
+        from geopy.exc import GeocoderTimedOut
+        from .geocoding import get_geocoder_stats
+        
+        with patch('alerts.models.get_geolocator') as mock_get_geolocator:
+            mock_geolocator = mock_get_geolocator.return_value
+            mock_geolocator.reverse.side_effect = GeocoderTimedOut('timed out')
+            
+            results = [Alert.reverse_geocode(37.7749, -122.4194) for _ in range(4)]
+        
+        self.assertEqual(results, ['37.774900, -122.419400'] * 4)
+        self.assertEqual(mock_geolocator.reverse.call_count, 2)
+        
+        stats = get_geocoder_stats()
+        self.assertEqual(stats['circuit_state'], 'open')
+        self.assertEqual(stats['failures'], 2)
+        self.assertEqual(stats['circuit_opened'], 1)
+        self.assertEqual(stats['short_circuited'], 2)
+        self.assertIn('time_saved_seconds', stats)
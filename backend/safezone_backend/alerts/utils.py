@@ -1,6 +1,23 @@
 """Utility functions for the alerts app."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from math import radians, cos, sin, asin, sqrt
 
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# A single worker keeps geocoding within the service's one request per second policy
+_geocoding_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='alert-geocoding')
+# Batches submitted to the executor and not finished yet
+_pending_batches = 0
+_pending_lock = threading.Lock()
+
+# Matches Alert.coordinate_location(); candidates are checked exactly before geocoding
+PLACEHOLDER_LOCATION_REGEX = r'^-?[0-9]+\.[0-9]{6}, -?[0-9]+\.[0-9]{6}$'
+
 
 def haversine_distance(lon1, lat1, lon2, lat2):
     """
@@ -27,3 +44,91 @@ def haversine_distance(lon1, lat1, lon2, lat2):
     # Radius of Earth in kilometers
     km = 6371 * c
     return km
+
+
+def geocode_alert_locations(alert_ids):
+    """
+    Replace the coordinate placeholder location of alerts with a street address.
+    
+    Alerts whose location is no longer the placeholder were geocoded by an
+    earlier or concurrent run and are skipped, and the update only applies
+    while the placeholder is still there, so an alert is never geocoded twice.
+    
+    Args:
+        alert_ids: IDs of alerts built with geocode=False
+    
+    Returns:
+        Number of alerts updated
+    """
+    from .models import Alert
+    
+    alerts = Alert.objects.filter(id__in=alert_ids).values_list(
+        'id', 'incident_latitude', 'incident_longitude', 'location'
+    )
+    updated = 0
+    for alert_id, latitude, longitude, location in alerts:
+        placeholder = Alert.coordinate_location(latitude, longitude)
+        if location != placeholder:
+            continue
+        address = Alert.reverse_geocode(latitude, longitude)
+        if address == placeholder:
+            # No address found; geocode_alerts retries it later
+            continue
+        updated += Alert.objects.filter(id=alert_id, location=placeholder).update(location=address)
+    return updated
+
+
+def alerts_awaiting_geocoding():
+    """Return the alerts whose location still looks like the coordinate placeholder."""
+    from .models import Alert
+    
+    return Alert.objects.filter(location__regex=PLACEHOLDER_LOCATION_REGEX)
+
+
+def _geocode_in_background(alert_ids):
+    global _pending_batches
+    try:
+        geocode_alert_locations(alert_ids)
+    except Exception as e:
+        logger.error(f"Failed to geocode {len(alert_ids)} alert(s): {e}")
+    finally:
+        with _pending_lock:
+            _pending_batches -= 1
+        # The worker thread has its own connection; don't leave it open
+        connection.close()
+
+
+def _submit_geocoding(alert_ids):
+    """
+    Queue a batch for the background worker unless too many are pending.
+    
+    Shed batches keep their coordinate placeholder until
+    `python manage.py geocode_alerts` picks them up.
+    
+    Returns:
+        True if the batch was queued
+    """
+    global _pending_batches
+    with _pending_lock:
+        if _pending_batches >= getattr(settings, 'GEOCODER_BACKGROUND_MAX_PENDING', 100):
+            logger.warning(
+                f"Alert geocoding queue is full; leaving {len(alert_ids)} alert(s) "
+                f"for the geocode_alerts command"
+            )
+            return False
+        _pending_batches += 1
+    _geocoding_executor.submit(_geocode_in_background, alert_ids)
+    return True
+
+
+def schedule_alert_geocoding(alert_ids):
+    """
+    Geocode alert locations in a background thread once the transaction commits.
+    
+    The in-memory queue is bounded by GEOCODER_BACKGROUND_MAX_PENDING batches
+    and lost on restart; `python manage.py geocode_alerts` retries alerts
+    that still show their coordinates.
+    """
+    alert_ids = list(alert_ids)
+    if alert_ids:
+        transaction.on_commit(lambda: _submit_geocoding(alert_ids))
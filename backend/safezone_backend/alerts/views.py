@@ -10,7 +10,7 @@ import logging
 
 from .models import Alert
 from .serializers import AlertSerializer, AlertListSerializer
-from .utils import haversine_distance
+from .utils import haversine_distance, schedule_alert_geocoding
 from incident_reporting.models import Incident
 
 logger = logging.getLogger(__name__)
@@ -39,7 +39,7 @@ class AlertListView(generics.ListAPIView):
         return [IsAuthenticatedOrReadOnly()]
     
     def get_queryset(self):
-        queryset = Alert.objects.select_related('incident').all()
+        queryset = Alert.objects.all()
         
         # Filter by severity
         severity = self.request.query_params.get('severity', None)
@@ -82,8 +82,8 @@ class AlertListView(generics.ListAPIView):
                 for alert in queryset:
                     distance = haversine_distance(
                         lon, lat,
-                        alert.incident.longitude,
-                        alert.incident.latitude
+                        alert.incident_longitude,
+                        alert.incident_latitude
                     )
                     if distance <= radius:
                         alert.distance_meters = distance * 1000  # Convert to meters
@@ -135,6 +135,10 @@ class AlertGenerateView(generics.GenericAPIView):
     - longitude: User's longitude
     - radius_km: Maximum distance in km (default: 5, max: 50)
     - hours: Look at incidents from last N hours (default: 24)
+    
+    Existing alerts are looked up with one query and missing ones are
+    inserted together, so the number of queries does not grow with the
+    number of incidents. Locations are reverse geocoded in the background.
     """
     
     def get_permissions(self):
@@ -168,8 +172,8 @@ class AlertGenerateView(generics.GenericAPIView):
                 timestamp__gte=time_threshold
             )
             
-            # Calculate distance and generate alerts for nearby incidents
-            generated_alerts = []
+            # Calculate distance and keep incidents within the radius
+            nearby_incidents = []
             for incident in recent_incidents:
                 distance = haversine_distance(
                     lon, lat,
@@ -178,17 +182,38 @@ class AlertGenerateView(generics.GenericAPIView):
                 )
                 
                 if distance <= radius:
-                    # Check if alert already exists for this incident
-                    existing_alert = Alert.objects.filter(
-                        incident=incident
-                    ).first()
-                    
-                    if not existing_alert:
-                        alert = Alert.generate_alert_from_incident(
-                            incident,
-                            distance_meters=distance * 1000
-                        )
-                        generated_alerts.append(alert)
+                    nearby_incidents.append((incident, distance))
+            
+            # Skip incidents that already have an alert, in a single query
+            existing_incident_ids = set(
+                Alert.objects.filter(
+                    incident_id__in=[incident.id for incident, _ in nearby_incidents]
+                ).values_list('incident_id', flat=True)
+            ) if nearby_incidents else set()
+            
+            # Reverse geocoding is slow, so alerts start with the coordinates
+            # as location and are geocoded after the response
+            new_alerts = [
+                Alert.build_alert_from_incident(
+                    incident,
+                    distance_meters=distance * 1000,
+                    geocode=False
+                )
+                for incident, distance in nearby_incidents
+                if incident.id not in existing_incident_ids
+            ]
+            
+            generated_alerts = []
+            if new_alerts:
+                # Concurrent requests may insert the same alerts; the unique
+                # constraint on incident turns the losing inserts into no-ops
+                Alert.objects.bulk_create(new_alerts, ignore_conflicts=True)
+                generated_alerts = list(
+                    Alert.objects.filter(
+                        incident_id__in=[alert.incident_id for alert in new_alerts]
+                    )
+                )
+                schedule_alert_geocoding(alert.id for alert in generated_alerts)
             
             serializer = AlertListSerializer(generated_alerts, many=True)
             return Response({
@@ -1,6 +1,7 @@
 """
 Custom permission classes for SafeZone API.
 """
+from django.conf import settings
 from rest_framework import permissions
 
 
@@ -17,3 +18,43 @@ class IsAuthenticatedOrReadOnly(permissions.BasePermission):
         
         # Require authentication for POST, PUT, PATCH, DELETE
         return request.user and request.user.is_authenticated
+
+
+class IsAdmin(permissions.BasePermission):
+    """
+    Allow access only to administrators.
+    
+    Django staff users (session authentication) and Auth0 users whose access
+    token grants AUTH0_ADMIN_PERMISSION are administrators.
+    """
+    
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        
+        if getattr(user, 'is_staff', False):
+            return True
+        
+        payload = getattr(user, 'payload', None) or {}
+        return settings.AUTH0_ADMIN_PERMISSION in payload.get('permissions', [])
+
+
+class DevAllowAnyMixin:
+    """
+    View mixin that allows anyone in development without Auth0 (DEBUG with
+    no AUTH0_DOMAIN) and otherwise applies production_permission_classes.
+    
+    The default lets anyone read and requires authentication for writes.
+    """
+    production_permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    
+    def get_permissions(self):
+        if settings.DEBUG and not settings.AUTH0_DOMAIN:
+            return [permissions.AllowAny()]
+        return [permission() for permission in self.production_permission_classes]
+
+
+class DevAllowAnyAdminMixin(DevAllowAnyMixin):
+    """View mixin like DevAllowAnyMixin that requires an administrator in production."""
+    production_permission_classes = [IsAdmin]
@@ -6,3 +6,7 @@ class EmergencyServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'emergency_services'
     verbose_name = 'Emergency Services'
+
+    def ready(self):
+        # Keep the nearest-service index in sync with EmergencyService changes
+        from . import signals  # noqa: F401
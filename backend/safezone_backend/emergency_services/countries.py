@@ -0,0 +1,257 @@
+"""
+Offline country lookup from coordinates.
+
+Resolves the ISO 3166-1 alpha-2 code of the country containing a point
+with a point-in-polygon test over the country boundaries in the GeoJSON
+file at COUNTRY_BOUNDARIES_PATH (e.g. Natural Earth admin 0 countries).
+
+Boundaries are loaded once per worker and simplified with
+Douglas-Peucker to COUNTRY_BOUNDARIES_SIMPLIFY_TOLERANCE degrees, which
+keeps them accurate to about a kilometre while cutting the vertex count
+by an order of magnitude. Every polygon is bucketed into a coarse
+latitude/longitude grid by its bounding box, so a lookup only runs the
+ray-casting test on the few polygons whose bounding box contains the
+point.
+"""
+import json
+import logging
+import os
+import threading
+from array import array
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Feature properties holding the country code, in order of preference.
+# Natural Earth sets ISO_A2 to -99 for a few countries and has ISO_A2_EH.
+COUNTRY_CODE_PROPERTIES = ('ISO_A2', 'ISO_A2_EH', 'iso_a2', 'ISO3166-1-Alpha-2', 'country_code')
+
+
+def _country_code(properties):
+    """Return the alpha-2 code from a feature's properties, or None."""
+    for name in COUNTRY_CODE_PROPERTIES:
+        value = properties.get(name)
+        if isinstance(value, str) and len(value) == 2 and value.isalpha():
+            return value.upper()
+    return None
+
+
+def simplify_ring(points, tolerance):
+    """
+    Simplify a closed ring with the Douglas-Peucker algorithm.
+
+    Args:
+        points: List of (longitude, latitude) pairs, first equal to last
+        tolerance: Maximum distance in degrees a removed vertex may lie
+            from the simplified ring
+
+    Returns:
+        Simplified list of points; the input when it would collapse
+        below a triangle
+    """
+    if tolerance <= 0 or len(points) <= 4:
+        return points
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    # A closed ring's endpoints coincide, so split at the farthest vertex first
+    first = points[0]
+    split = max(
+        range(1, len(points) - 1),
+        key=lambda i: (points[i][0] - first[0]) ** 2 + (points[i][1] - first[1]) ** 2,
+    )
+    keep[split] = True
+    stack = [(0, split), (split, len(points) - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        (x1, y1), (x2, y2) = points[start], points[end]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+
+        farthest, farthest_sq = None, tolerance * tolerance
+        for i in range(start + 1, end):
+            x, y = points[i]
+            if length_sq:
+                t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length_sq))
+                px, py = x1 + t * dx, y1 + t * dy
+            else:
+                px, py = x1, y1
+            distance_sq = (x - px) ** 2 + (y - py) ** 2
+            if distance_sq > farthest_sq:
+                farthest, farthest_sq = i, distance_sq
+
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((start, farthest))
+            stack.append((farthest, end))
+
+    simplified = [point for point, kept in zip(points, keep) if kept]
+    return simplified if len(simplified) >= 4 else points
+
+
+class CountryBoundaryIndex:
+    """Point-in-polygon index of country boundaries."""
+
+    def __init__(self, cell_size=5.0):
+        self.cell_size = cell_size
+        # Per polygon: country code, bounding box and rings as (longitudes, latitudes)
+        self._codes = []
+        self._bboxes = []
+        self._rings = []
+        self._cells = {}
+
+    def _cell_range(self, min_value, max_value, origin):
+        return range(
+            int((min_value - origin) // self.cell_size),
+            int((max_value - origin) // self.cell_size) + 1,
+        )
+
+    def add_polygon(self, code, rings):
+        """
+        Add a polygon to the index.
+
+        Args:
+            code: Country code returned for points inside the polygon
+            rings: Outer ring followed by any holes, each a list of
+                (longitude, latitude) pairs
+        """
+        rings = [ring for ring in rings if len(ring) >= 3]
+        if not rings:
+            return
+
+        outer = rings[0]
+        min_lon = min(point[0] for point in outer)
+        max_lon = max(point[0] for point in outer)
+        min_lat = min(point[1] for point in outer)
+        max_lat = max(point[1] for point in outer)
+
+        polygon_id = len(self._codes)
+        self._codes.append(code)
+        self._bboxes.append((min_lon, min_lat, max_lon, max_lat))
+        self._rings.append([
+            (array('d', (point[0] for point in ring)), array('d', (point[1] for point in ring)))
+            for ring in rings
+        ])
+
+        for row in self._cell_range(min_lat, max_lat, -90.0):
+            for column in self._cell_range(min_lon, max_lon, -180.0):
+                self._cells.setdefault((row, column), []).append(polygon_id)
+
+    @classmethod
+    def from_geojson(cls, data, tolerance=0.0, cell_size=5.0):
+        """
+        Build an index from a GeoJSON FeatureCollection.
+
+        Args:
+            data: Parsed GeoJSON document
+            tolerance: Douglas-Peucker tolerance in degrees (0 keeps every vertex)
+            cell_size: Size in degrees of the bounding-box grid cells
+
+        Returns:
+            CountryBoundaryIndex
+        """
+        index = cls(cell_size=cell_size)
+        for feature in data.get('features', []):
+            code = _country_code(feature.get('properties') or {})
+            geometry = feature.get('geometry') or {}
+            if code is None:
+                continue
+
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+
+            for polygon in polygons:
+                index.add_polygon(code, [
+                    simplify_ring([tuple(point[:2]) for point in ring], tolerance)
+                    for ring in polygon
+                ])
+        return index
+
+    @staticmethod
+    def _contains(rings, latitude, longitude):
+        """Ray-casting test with the even-odd rule, so holes are excluded."""
+        inside = False
+        for longitudes, latitudes in rings:
+            j = len(longitudes) - 1
+            for i in range(len(longitudes)):
+                yi, yj = latitudes[i], latitudes[j]
+                if (yi > latitude) != (yj > latitude):
+                    xi, xj = longitudes[i], longitudes[j]
+                    if longitude < xi + (latitude - yi) * (xj - xi) / (yj - yi):
+                        inside = not inside
+                j = i
+        return inside
+
+    def lookup(self, latitude, longitude):
+        """
+        Find the country containing a point.
+
+        Returns:
+            ISO 3166-1 alpha-2 code, or None if the point is in no country
+        """
+        cell = (
+            int((latitude + 90.0) // self.cell_size),
+            int((longitude + 180.0) // self.cell_size),
+        )
+        for polygon_id in self._cells.get(cell, ()):
+            min_lon, min_lat, max_lon, max_lat = self._bboxes[polygon_id]
+            if not (min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon):
+                continue
+            if self._contains(self._rings[polygon_id], latitude, longitude):
+                return self._codes[polygon_id]
+        return None
+
+    def __len__(self):
+        return len(self._codes)
+
+
+# Per-worker index, loaded on first use
+_country_index = None
+_country_index_key = None
+_country_index_lock = threading.Lock()
+
+
+def get_country_index():
+    """
+    Return the worker's country boundary index.
+
+    Returns None when COUNTRY_BOUNDARIES_PATH does not point to a file.
+    The index is reloaded when the boundary settings change.
+    """
+    global _country_index, _country_index_key
+
+    key = (
+        str(getattr(settings, 'COUNTRY_BOUNDARIES_PATH', '') or ''),
+        getattr(settings, 'COUNTRY_BOUNDARIES_SIMPLIFY_TOLERANCE', 0.01),
+    )
+    with _country_index_lock:
+        if _country_index_key != key:
+            path, tolerance = key
+            _country_index = None
+            if path and os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    _country_index = CountryBoundaryIndex.from_geojson(json.load(f), tolerance)
+                logger.info(f"Loaded {len(_country_index)} country boundary polygons from {path}")
+            else:
+                logger.warning(f"Country boundaries not found at {path!r}; country lookup disabled")
+            _country_index_key = key
+        return _country_index
+
+
+def resolve_country_code(latitude, longitude):
+    """
+    Resolve the country containing a point.
+
+    Returns:
+        ISO 3166-1 alpha-2 code, or None if unknown or boundaries are not configured
+    """
+    index = get_country_index()
+    if index is None:
+        return None
+    return index.lookup(latitude, longitude)
@@ -0,0 +1,180 @@
+"""
+Bulk loading of emergency service datasets.
+
+Records are keyed on external_id, the service's identifier in the source
+dataset (the `external_id` or `id` column, or the GeoJSON feature id).
+Records without one get an id derived from their country, type, name and
+rounded location, so reloading an unchanged dataset is still idempotent.
+"""
+
+import hashlib
+import logging
+
+from safezone_backend.bulk_loading import DEFAULT_BATCH_SIZE, parse_bool, upsert
+
+from .models import EmergencyService
+
+logger = logging.getLogger(__name__)
+
+SERVICE_TYPES = {choice for choice, _ in EmergencyService.SERVICE_TYPE_CHOICES}
+
+# Fields overwritten when a service is loaded again
+UPDATE_FIELDS = [
+    'country_code',
+    'name',
+    'service_type',
+    'phone_number',
+    'latitude',
+    'longitude',
+    'address',
+    'hours',
+    'is_active',
+    'updated_at',
+]
+
+
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def derive_external_id(country_code, service_type, name, latitude, longitude):
+    """Build a stable identifier for records that have none."""
+    key = f'{country_code}|{service_type}|{name.lower()}|{latitude:.5f}|{longitude:.5f}'
+    return 'sha1:' + hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def service_from_record(record, default_country_code=None):
+    """
+    Build an unsaved EmergencyService from a dataset record.
+
+    Args:
+        record: Dictionary with EmergencyService field names
+        default_country_code: Country for records without country_code
+
+    Returns:
+        EmergencyService, or None if the record is invalid
+    """
+    country_code = (_text(record, 'country_code') or default_country_code or '').upper()
+    service_type = _text(record, 'service_type')
+    name = _text(record, 'name')
+    phone_number = _text(record, 'phone_number')
+    try:
+        latitude = float(record.get('latitude'))
+        longitude = float(record.get('longitude'))
+    except (TypeError, ValueError):
+        return None
+
+    if (
+        len(country_code) != 2
+        or not country_code.isalpha()
+        or service_type not in SERVICE_TYPES
+        or not name
+        or not phone_number
+        or not -90 <= latitude <= 90
+        or not -180 <= longitude <= 180
+    ):
+        return None
+
+    external_id = _text(record, 'external_id') or _text(record, 'id')
+    if not external_id:
+        external_id = derive_external_id(country_code, service_type, name, latitude, longitude)
+
+    return EmergencyService(
+        external_id=external_id[:100],
+        country_code=country_code,
+        name=name[:200],
+        service_type=service_type,
+        phone_number=phone_number[:50],
+        latitude=latitude,
+        longitude=longitude,
+        address=_text(record, 'address')[:500] or None,
+        hours=_text(record, 'hours')[:100] or None,
+        is_active=parse_bool(record.get('is_active')),
+    )
+
+
+def upsert_services(services, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert or update EmergencyService instances keyed on external_id."""
+    return upsert(
+        EmergencyService,
+        services,
+        unique_fields=['external_id'],
+        update_fields=UPDATE_FIELDS,
+        batch_size=batch_size,
+    )
+
+
+def seed_external_id(country_code, service_type):
+    """Return the external_id of the built-in seed service for a country and type."""
+    return f'seed:{country_code}:{service_type}'
+
+
+def adopt_legacy_seed_services(services):
+    """
+    Key seed rows created before external_id existed.
+
+    The seed command used to wipe the table and insert services without an
+    external_id. For each seed key not yet in use, the oldest unkeyed row of
+    the same country and type takes it, so the next upsert updates that row
+    instead of inserting a duplicate.
+
+    Args:
+        services: Seed EmergencyService instances with their external_id set
+
+    Returns:
+        Number of rows keyed
+    """
+    keys = {service.external_id: service for service in services}
+    taken = set(
+        EmergencyService.objects.filter(external_id__in=keys).values_list('external_id', flat=True)
+    )
+    adopted = 0
+    for key, service in keys.items():
+        if key in taken:
+            continue
+        legacy = (
+            EmergencyService.objects.filter(
+                external_id__isnull=True,
+                country_code=service.country_code,
+                service_type=service.service_type,
+            )
+            .order_by('id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if legacy is not None:
+            EmergencyService.objects.filter(pk=legacy).update(external_id=key)
+            adopted += 1
+    if adopted:
+        logger.info(f"Keyed {adopted} legacy seed emergency service(s)")
+    return adopted
+
+
+def load_emergency_services(records, default_country_code=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Upsert emergency services from an iterable of records.
+
+    Bulk writes bypass the model signals, so worker indexes pick the new
+    services up when they are next rebuilt (EMERGENCY_SERVICE_INDEX_MAX_AGE).
+
+    Returns:
+        Tuple of (services written, records skipped as invalid)
+    """
+    skipped = 0
+
+    def services():
+        nonlocal skipped
+        for record in records:
+            service = service_from_record(record, default_country_code)
+            if service is None:
+                skipped += 1
+                continue
+            yield service
+
+    written = upsert_services(services(), batch_size=batch_size)
+    if skipped:
+        logger.warning(f"Skipped {skipped} invalid emergency service records")
+    return written, skipped
@@ -0,0 +1,61 @@
+"""
+Django management command to load emergency services from datasets.
+
+Reads CSV, JSON, NDJSON or GeoJSON files as streams and upserts services in
+batches keyed on external_id: existing services are updated in place, new
+ones are inserted and services missing from the dataset are left untouched.
+Columns use EmergencyService field names; GeoJSON Point geometries provide
+latitude and longitude.
+
+Usage:
+    python manage.py load_emergency_services services.csv [more files...]
+                                             [--format csv] [--country GH]
+                                             [--batch-size 2000]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from emergency_services.loaders import load_emergency_services
+from safezone_backend.bulk_loading import DEFAULT_BATCH_SIZE, iter_records
+
+
+class Command(BaseCommand):
+    help = 'Upsert emergency services from CSV, JSON, NDJSON or GeoJSON datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Dataset files to load')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'json', 'ndjson'],
+            help='Dataset format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--country',
+            help='Country code for records without a country_code column',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Services written per query (default: {DEFAULT_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            started = time.perf_counter()
+            try:
+                written, skipped = load_emergency_services(
+                    iter_records(path, options['format']),
+                    default_country_code=options['country'],
+                    batch_size=options['batch_size'],
+                )
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not load {path}: {e}')
+
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Loaded {written} emergency services from {path} '
+                f'in {time.perf_counter() - started:.1f}s'
+            ))
+            if skipped:
+                self.stdout.write(self.style.WARNING(f'  Skipped {skipped} invalid record(s)'))
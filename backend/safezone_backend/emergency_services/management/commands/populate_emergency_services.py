@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from emergency_services.loaders import adopt_legacy_seed_services, seed_external_id, upsert_services
 from emergency_services.models import EmergencyService
 
 
@@ -8,9 +9,6 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         self.stdout.write('Populating emergency services database...')
         
-        # Clear existing data
-        EmergencyService.objects.all().delete()
-        
         services = [
             # United States
             EmergencyService(
@@ -223,10 +221,15 @@ class Command(BaseCommand):
             ),
         ]
         
-        EmergencyService.objects.bulk_create(services)
+        # One service per country and type; the key lets reruns update them in place
+        for service in services:
+            service.external_id = seed_external_id(service.country_code, service.service_type)
+        # Rows seeded before external_id existed would otherwise be duplicated
+        adopt_legacy_seed_services(services)
+        written = upsert_services(services)
         
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully created {len(services)} emergency service records'
+                f'Successfully loaded {written} emergency service records'
             )
         )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emergency_services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emergencyservice',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Identifier in the source dataset, used to update the service on reload', max_length=100, null=True, unique=True),
+        ),
+    ]
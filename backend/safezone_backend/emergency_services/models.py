@@ -12,6 +12,13 @@ class EmergencyService(models.Model):
     ]
     
     # Service identification
+    external_id = models.CharField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text='Identifier in the source dataset, used to update the service on reload',
+    )
     country_code = models.CharField(
         max_length=2,
         db_index=True,
@@ -0,0 +1,38 @@
+"""
+Signal handlers keeping the per-worker emergency service index and cached
+list responses in sync.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from safezone_backend.http_caching import bump_content_generation
+
+from .models import EmergencyService
+from .spatial_index import peek_emergency_service_index
+
+
+@receiver(post_save, sender=EmergencyService)
+def update_emergency_service_index(sender, instance, **kwargs):
+    """Apply a saved service to the index once the transaction commits."""
+    def apply():
+        bump_content_generation(EmergencyService)
+        index = peek_emergency_service_index()
+        if index is not None:
+            index.update_service(instance)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=EmergencyService)
+def remove_from_emergency_service_index(sender, instance, **kwargs):
+    """Drop a deleted service from the index once the transaction commits."""
+    service_id = instance.id
+
+    def apply():
+        bump_content_generation(EmergencyService)
+        index = peek_emergency_service_index()
+        if index is not None:
+            index.remove_service(service_id)
+
+    transaction.on_commit(apply)
@@ -0,0 +1,127 @@
+"""
+In-memory spatial index of active emergency services for nearest lookups.
+
+Each worker keeps a PointGridIndex of every active service, so finding the
+services nearest to a caller scans a few grid cells around them instead of
+the whole table. The index is rebuilt lazily on first use (and when it is
+older than EMERGENCY_SERVICE_INDEX_MAX_AGE seconds, so workers pick up
+changes made by other processes) and updated incrementally from
+EmergencyService save/delete signals.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from safezone_backend.geo_utils import PointGridIndex
+
+logger = logging.getLogger(__name__)
+
+
+class EmergencyServiceIndex:
+    """Grid index of active emergency services keyed by id."""
+
+    def __init__(self, cell_size=None):
+        self.cell_size = cell_size or getattr(settings, 'EMERGENCY_SERVICE_INDEX_CELL_SIZE', 0.1)
+        self._grid = PointGridIndex(self.cell_size)
+        self.built_at = None
+        self.last_rebuild_seconds = None
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def is_stale(self):
+        """Check whether the index should be rebuilt from the database."""
+        if not self.is_built:
+            return True
+        max_age = getattr(settings, 'EMERGENCY_SERVICE_INDEX_MAX_AGE', 300)
+        return time.monotonic() - self.built_at > max_age
+
+    def rebuild(self):
+        """Rebuild the whole index from active services."""
+        from .models import EmergencyService
+
+        started = time.perf_counter()
+        rows = EmergencyService.objects.filter(is_active=True).values_list(
+            'id', 'latitude', 'longitude', 'service_type',
+        )
+
+        grid = PointGridIndex(self.cell_size)
+        for service_id, latitude, longitude, service_type in rows.iterator(chunk_size=2000):
+            grid.insert(service_id, latitude, longitude, service_type)
+
+        self._grid = grid
+        self.built_at = time.monotonic()
+        self.last_rebuild_seconds = time.perf_counter() - started
+        logger.info(
+            f"Rebuilt emergency service index: {len(grid)} services "
+            f"({self.last_rebuild_seconds * 1000:.1f} ms)"
+        )
+
+    def update_service(self, service):
+        """Insert, move or drop a single service after it was saved."""
+        if service.is_active:
+            self._grid.insert(service.id, service.latitude, service.longitude, service.service_type)
+        else:
+            self._grid.remove(service.id)
+
+    def remove_service(self, service_id):
+        """Drop a single service after it was deleted."""
+        self._grid.remove(service_id)
+
+    def nearest(self, latitude, longitude, k=5, service_type=None, radius_km=None):
+        """
+        Find the services nearest to a point.
+
+        Args:
+            latitude, longitude: Caller location
+            k: Maximum number of services to return
+            service_type: Only return services of this type
+            radius_km: Only return services within this distance
+
+        Returns:
+            List of (service_id, distance_km) tuples, nearest first
+        """
+        predicate = (lambda value: value == service_type) if service_type else None
+        matches = self._grid.nearest(
+            latitude, longitude, k=k, max_distance_km=radius_km, predicate=predicate,
+        )
+        return [(service_id, distance) for distance, service_id, _ in matches]
+
+    def __len__(self):
+        return len(self._grid)
+
+
+# Per-worker index instance
+_service_index = None
+_index_lock = threading.Lock()
+
+
+def get_emergency_service_index():
+    """Get the worker's emergency service index, building it if missing or stale."""
+    global _service_index
+    with _index_lock:
+        if _service_index is None:
+            _service_index = EmergencyServiceIndex()
+        index = _service_index
+
+    if index.is_stale():
+        index.rebuild()
+    return index
+
+
+def peek_emergency_service_index():
+    """Return the worker's index only if it has already been built."""
+    index = _service_index
+    if index is not None and index.is_built:
+        return index
+    return None
+
+
+def reset_emergency_service_index():
+    """Discard the worker's index so it is rebuilt on next use."""
+    global _service_index
+    with _index_lock:
+        _service_index = None
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
 
-# Create your tests here.
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from alerts.utils import haversine_distance
+from safezone_backend.geo_utils import PointGridIndex
+
+from .countries import CountryBoundaryIndex, resolve_country_code, simplify_ring
+from .models import EmergencyService
+from .spatial_index import get_emergency_service_index, reset_emergency_service_index
+
+
+class PointGridIndexTestCase(TestCase):
+    """Tests for the grid index behind nearest-neighbour lookups."""
+
+    def test_nearest_matches_brute_force(self):
+        """Test that grid lookups agree with a full scan, including across the antimeridian."""
+        rng = random.Random(42)
+        points = {
+            i: (rng.uniform(-80, 80), rng.uniform(-180, 180)) for i in range(2000)
+        }
+        index = PointGridIndex(cell_size=1.0)
+        for key, (lat, lon) in points.items():
+            index.insert(key, lat, lon)
+
+        for lat, lon in [(0.0, 0.0), (51.5, -0.12), (-33.9, 151.2), (10.0, 179.9)]:
+            expected = sorted(
+                (haversine_distance(lon, lat, plon, plat), key)
+                for key, (plat, plon) in points.items()
+            )[:5]
+            found = [(distance, key) for distance, key, _ in index.nearest(lat, lon, k=5)]
+            self.assertEqual([key for _, key in found], [key for _, key in expected])
+            for (found_distance, _), (expected_distance, _) in zip(found, expected):
+                self.assertAlmostEqual(found_distance, expected_distance, places=6)
+
+    def test_remove_and_move(self):
+        """Test that re-inserting a key moves it and removing drops it."""
+        index = PointGridIndex(cell_size=0.1)
+        index.insert('a', 5.60, -0.19)
+        index.insert('a', 6.69, -1.62)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.nearest(6.69, -1.62, max_distance_km=1)[0][1], 'a')
+        self.assertEqual(index.nearest(5.60, -0.19, max_distance_km=1), [])
+
+        index.remove('a')
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.nearest(6.69, -1.62), [])
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='')
+class EmergencyServiceNearestViewTest(TestCase):
+    """Tests for the nearest emergency services endpoint."""
+
+    def setUp(self):
+        reset_emergency_service_index()
+        self.client = APIClient()
+        self.url = reverse('emergency-service-nearest')
+        # Accra, with services at increasing distances
+        self.police = self._create('Central Police', 'police', 5.5600, -0.2050)
+        self.hospital = self._create('Korle Bu Hospital', 'hospital', 5.5370, -0.2270)
+        self.fire = self._create('Fire Station', 'fireStation', 5.6500, -0.1870)
+        self.kumasi = self._create('Kumasi Police', 'police', 6.6885, -1.6244)
+        self._create('Closed Clinic', 'hospital', 5.5601, -0.2051, is_active=False)
+
+    def tearDown(self):
+        reset_emergency_service_index()
+
+    def _create(self, name, service_type, latitude, longitude, is_active=True):
+        return EmergencyService.objects.create(
+            country_code='GH',
+            name=name,
+            service_type=service_type,
+            phone_number='191',
+            latitude=latitude,
+            longitude=longitude,
+            is_active=is_active,
+        )
+
+    def test_returns_active_services_sorted_by_distance(self):
+        """Test that results are active services ordered nearest first."""
+        response = self.client.get(self.url, {'latitude': 5.5600, 'longitude': -0.2050})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [service['id'] for service in response.data['results']]
+        self.assertEqual(ids, [self.police.id, self.hospital.id, self.fire.id, self.kumasi.id])
+        distances = [service['distance_km'] for service in response.data['results']]
+        self.assertEqual(distances, sorted(distances))
+        self.assertEqual(distances[0], 0.0)
+
+    def test_k_type_and_radius_filters(self):
+        """Test limiting by count, service type and radius."""
+        response = self.client.get(self.url, {'latitude': 5.5600, 'longitude': -0.2050, 'k': 2})
+        self.assertEqual(response.data['count'], 2)
+
+        response = self.client.get(
+            self.url, {'latitude': 5.5600, 'longitude': -0.2050, 'service_type': 'police'}
+        )
+        self.assertEqual(
+            [service['id'] for service in response.data['results']],
+            [self.police.id, self.kumasi.id],
+        )
+
+        response = self.client.get(
+            self.url, {'latitude': 5.5600, 'longitude': -0.2050, 'radius_km': 5}
+        )
+        self.assertEqual(
+            [service['id'] for service in response.data['results']],
+            [self.police.id, self.hospital.id],
+        )
+
+    def test_invalid_parameters(self):
+        """Test that missing or invalid parameters are rejected."""
+        for params in [
+            {'latitude': 5.56},
+            {'latitude': 'abc', 'longitude': -0.2},
+            {'latitude': 95, 'longitude': -0.2},
+            {'latitude': 5.56, 'longitude': -0.2, 'k': 0},
+        ]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count_is_constant(self):
+        """Test that a lookup on a built index only fetches the matched rows."""
+        get_emergency_service_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(20):
+                self._create(f'Station {i}', 'police', 5.0 + i * 0.05, -0.5)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'latitude': 5.5600, 'longitude': -0.2050})
+        self.assertEqual(response.data['count'], 5)
+
+    def test_signals_update_built_index(self):
+        """Test that saving, deactivating and deleting services updates the index."""
+        index = get_emergency_service_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new = self._create('New Police', 'police', 5.5700, -0.2050)
+        self.assertEqual(index.nearest(5.5700, -0.2050, k=1)[0][0], new.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new.is_active = False
+            new.save()
+        self.assertNotEqual(index.nearest(5.5700, -0.2050, k=1)[0][0], new.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.police.delete()
+        self.assertNotIn(self.police.id, [service_id for service_id, _ in index.nearest(5.56, -0.205)])
+
+
+# Two neighbouring squares; the second has a hole and a detached island
+BOUNDARIES = {
+    'type': 'FeatureCollection',
+    'features': [
+        {
+            'type': 'Feature',
+            'properties': {'ISO_A2': 'GH'},
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [[[-3, 5], [1, 5], [1, 11], [-3, 11], [-3, 5]]],
+            },
+        },
+        {
+            'type': 'Feature',
+            'properties': {'ISO_A2': '-99', 'ISO_A2_EH': 'TG'},
+            'geometry': {
+                'type': 'MultiPolygon',
+                'coordinates': [
+                    [
+                        [[1, 6], [2, 6], [2, 11], [1, 11], [1, 6]],
+                        [[1.2, 8], [1.8, 8], [1.8, 9], [1.2, 9], [1.2, 8]],
+                    ],
+                    [[[20, 20], [21, 20], [21, 21], [20, 21], [20, 20]]],
+                ],
+            },
+        },
+    ],
+}
+
+
+class CountryBoundaryIndexTestCase(TestCase):
+    """Tests for resolving countries from coordinates."""
+
+    def test_lookup(self):
+        """Test points inside, outside and in holes of polygons."""
+        index = CountryBoundaryIndex.from_geojson(BOUNDARIES)
+
+        self.assertEqual(index.lookup(5.56, -0.20), 'GH')
+        self.assertEqual(index.lookup(7.0, 1.5), 'TG')
+        self.assertEqual(index.lookup(20.5, 20.5), 'TG')
+        self.assertIsNone(index.lookup(8.5, 1.5))
+        self.assertIsNone(index.lookup(0.0, 0.0))
+
+    def test_simplify_ring_drops_collinear_vertices(self):
+        """Test that vertices within the tolerance are removed."""
+        ring = [(0, 0), (0.5, 0.001), (1, 0), (1, 1), (0, 1), (0, 0)]
+        self.assertEqual(simplify_ring(ring, 0.01), [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)])
+        self.assertEqual(simplify_ring(ring, 0), ring)
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='')
+class EmergencyServiceCountryInferenceTest(TestCase):
+    """Tests for listing services by coordinates instead of country code."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.geojson')
+        with os.fdopen(handle, 'w') as f:
+            json.dump(BOUNDARIES, f)
+        self.settings_override = override_settings(COUNTRY_BOUNDARIES_PATH=self.path)
+        self.settings_override.enable()
+
+        self.client = APIClient()
+        self.url = reverse('emergency-service-list')
+        for country_code in ['GH', 'TG']:
+            EmergencyService.objects.create(
+                country_code=country_code,
+                name=f'{country_code} Police',
+                service_type='police',
+                phone_number='191',
+                latitude=6.0,
+                longitude=0.0,
+            )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        os.remove(self.path)
+
+    def test_country_resolved_from_coordinates(self):
+        """Test that coordinates select the services of the containing country."""
+        response = self.client.get(self.url, {'latitude': 5.56, 'longitude': -0.20})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([s['country_code'] for s in response.data['results']], ['GH'])
+        self.assertEqual(resolve_country_code(7.0, 1.5), 'TG')
+
+    def test_country_code_takes_precedence(self):
+        """Test that an explicit country code wins over coordinates."""
+        response = self.client.get(
+            self.url, {'country_code': 'tg', 'latitude': 5.56, 'longitude': -0.20}
+        )
+        self.assertEqual([s['country_code'] for s in response.data['results']], ['TG'])
+
+    def test_unknown_location_and_invalid_coordinates(self):
+        """Test that points outside every country match nothing and bad input is rejected."""
+        response = self.client.get(self.url, {'latitude': 0.0, 'longitude': 0.0})
+        self.assertEqual(response.data['count'], 0)
+
+        response = self.client.get(self.url, {'latitude': 'abc', 'longitude': 0.0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unconfigured_boundaries_skip_country_filter(self):
+        """Test that coordinates list every country when no boundaries are loaded."""
+        with override_settings(COUNTRY_BOUNDARIES_PATH=''):
+            with self.assertLogs('emergency_services.views', level='WARNING'):
+                response = self.client.get(self.url, {'latitude': 5.56, 'longitude': -0.20})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(s['country_code'] for s in response.data['results']), ['GH', 'TG'])
+
+
+class LoadEmergencyServicesCommandTest(TestCase):
+    """Tests for the emergency service dataset loader."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_reload_updates_in_place(self):
+        """Test that loading a dataset twice updates rows instead of duplicating them."""
+        header = 'external_id,name,service_type,phone_number,latitude,longitude\n'
+        path = self._write('services.csv', header + (
+            'osm-1,Central Police,police,191,5.56,-0.20\n'
+            'osm-2,Korle Bu,hospital,193,5.53,-0.22\n'
+            'osm-3,Bad Row,unknown,000,5.5,-0.2\n'
+        ))
+        other = EmergencyService.objects.create(
+            country_code='GH', name='Manual', service_type='police',
+            phone_number='191', latitude=5.0, longitude=0.0,
+        )
+
+        out = StringIO()
+        call_command('load_emergency_services', path, '--country', 'gh', stdout=out)
+        self.assertIn('Loaded 2 emergency services', out.getvalue())
+        self.assertIn('Skipped 1', out.getvalue())
+
+        self._write('services.csv', header + 'osm-1,Central Police HQ,police,191,5.57,-0.20\n')
+        call_command('load_emergency_services', path, '--country', 'GH', stdout=StringIO())
+
+        self.assertEqual(EmergencyService.objects.count(), 3)
+        police = EmergencyService.objects.get(external_id='osm-1')
+        self.assertEqual(police.name, 'Central Police HQ')
+        self.assertEqual(police.latitude, 5.57)
+        self.assertEqual(police.country_code, 'GH')
+        self.assertTrue(EmergencyService.objects.filter(pk=other.pk).exists())
+
+    def test_geojson_without_ids_is_idempotent(self):
+        """Test that records without ids get a stable derived key."""
+        path = self._write('services.geojson', json.dumps({
+            'type': 'FeatureCollection',
+            'features': [
+                {
+                    'type': 'Feature',
+                    'properties': {
+                        'country_code': 'KE', 'name': 'Nairobi Hospital',
+                        'service_type': 'hospital', 'phone_number': '999',
+                    },
+                    'geometry': {'type': 'Point', 'coordinates': [36.82, -1.29]},
+                },
+            ],
+        }))
+
+        for _ in range(2):
+            call_command('load_emergency_services', path, '--batch-size', '1', stdout=StringIO())
+
+        service = EmergencyService.objects.get()
+        self.assertTrue(service.external_id.startswith('sha1:'))
+        self.assertEqual((service.latitude, service.longitude), (-1.29, 36.82))
+
+    def test_populate_keeps_existing_services(self):
+        """Test that the seed command upserts instead of wiping the table."""
+        call_command('populate_emergency_services', stdout=StringIO())
+        seeded = EmergencyService.objects.count()
+        manual = EmergencyService.objects.create(
+            country_code='GH', name='Manual', service_type='police',
+            phone_number='191', latitude=5.0, longitude=0.0,
+        )
+
+        call_command('populate_emergency_services', stdout=StringIO())
+
+        self.assertEqual(EmergencyService.objects.count(), seeded + 1)
+        self.assertTrue(EmergencyService.objects.filter(pk=manual.pk).exists())
+
+
+    def test_populate_adopts_legacy_seed_rows(self):
+        """Test that rows seeded before external_id existed are updated, not duplicated."""
+        call_command('populate_emergency_services', stdout=StringIO())
+        seeded = EmergencyService.objects.count()
+        # Old layout: the same seed rows without an external_id
+        EmergencyService.objects.update(external_id=None)
+        manual = EmergencyService.objects.create(
+            country_code='US', name='Manual', service_type='police',
+            phone_number='911', latitude=40.0, longitude=-74.0,
+        )
+
+        call_command('populate_emergency_services', stdout=StringIO())
+
+        self.assertEqual(EmergencyService.objects.count(), seeded + 1)
+        self.assertEqual(EmergencyService.objects.filter(country_code='US', service_type='police').count(), 2)
+        self.assertIsNone(EmergencyService.objects.get(pk=manual.pk).external_id)
+        self.assertFalse(EmergencyService.objects.filter(external_id__isnull=True).exclude(pk=manual.pk).exists())
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='')
+class EmergencyServiceConditionalRequestTest(TestCase):
+    """Tests for ETag handling of the emergency service list."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('emergency-service-list')
+        self.service = EmergencyService.objects.create(
+            country_code='GH', name='Central Police', service_type='police',
+            phone_number='191', latitude=5.56, longitude=-0.20,
+        )
+
+    def test_etag_per_filter_and_invalidation(self):
+        """Test that ETags differ per query and change when services are deleted."""
+        gh = self.client.get(self.url, {'country_code': 'GH'})
+        us = self.client.get(self.url, {'country_code': 'US'})
+        self.assertNotEqual(gh['ETag'], us['ETag'])
+        self.assertIn('private', gh['Cache-Control'])
+
+        response = self.client.get(
+            self.url, {'country_code': 'GH'}, HTTP_IF_NONE_MATCH=f'W/{gh["ETag"]}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.delete()
+        response = self.client.get(self.url, {'country_code': 'GH'}, HTTP_IF_NONE_MATCH=gh['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import EmergencyServiceListView
+from .views import EmergencyServiceListView, EmergencyServiceNearestView
 
 urlpatterns = [
     path('emergency-services/', EmergencyServiceListView.as_view(), name='emergency-service-list'),
+    path('emergency-services/nearest/', EmergencyServiceNearestView.as_view(), name='emergency-service-nearest'),
 ]
@@ -1,28 +1,70 @@
-from rest_framework import generics
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from safezone_backend.http_caching import ConditionalContentMixin
+from .countries import get_country_index
 from .models import EmergencyService
 from .serializers import EmergencyServiceSerializer
+from .spatial_index import get_emergency_service_index
+import logging
 
+logger = logging.getLogger(__name__)
 
-class EmergencyServiceListView(generics.ListAPIView):
+
+class EmergencyServiceListView(ConditionalContentMixin, generics.ListAPIView):
     """
     List emergency services filtered by country code and optionally by service type.
     
     Query parameters:
-    - country_code (required): ISO 3166-1 alpha-2 country code (e.g., US, GH, NG)
+    - country_code: ISO 3166-1 alpha-2 country code (e.g., US, GH, NG)
+    - latitude, longitude: Caller location, used to resolve the country
+      when country_code is not given (ignored when COUNTRY_BOUNDARIES_PATH
+      is not configured)
     - service_type (optional): Filter by service type (police, hospital, fireStation, ambulance)
     
-    GET: Returns list of emergency services for the specified country
+    GET: Returns list of emergency services for the specified country.
+    Supports ETag / If-None-Match conditional requests.
     """
     serializer_class = EmergencyServiceSerializer
+    # Requires authentication outside development, so keep it out of shared caches
+    cache_control = 'private'
+    
+    def get_country_code(self):
+        """Return the requested country code, resolving it from coordinates if needed."""
+        params = self.request.query_params
+        country_code = params.get('country_code')
+        if country_code:
+            return country_code.upper()
+        
+        if 'latitude' not in params or 'longitude' not in params:
+            return None
+        try:
+            latitude = float(params['latitude'])
+            longitude = float(params['longitude'])
+        except ValueError:
+            raise ValidationError({'error': 'latitude and longitude must be numbers'})
+        if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+            raise ValidationError({
+                'error': 'latitude must be between -90 and 90 and longitude between -180 and 180'
+            })
+        
+        index = get_country_index()
+        if index is None:
+            # Without boundaries the country is unknown, not empty; list every country
+            logger.warning("Country boundaries are not configured; not filtering emergency services by country")
+            return None
+        # Locations outside every loaded country match no services
+        return index.lookup(latitude, longitude) or ''
     
     def get_queryset(self):
         """Filter emergency services by country code and service type."""
         queryset = EmergencyService.objects.filter(is_active=True)
         
-        country_code = self.request.query_params.get('country_code')
+        country_code = self.get_country_code()
+        if country_code == '':
+            return queryset.none()
         if country_code:
-            queryset = queryset.filter(country_code=country_code.upper())
+            queryset = queryset.filter(country_code=country_code)
         
         service_type = self.request.query_params.get('service_type')
         if service_type:
@@ -46,3 +88,74 @@ class EmergencyServiceListView(generics.ListAPIView):
             'previous': None,
             'results': serializer.data
         })
+
+
+class EmergencyServiceNearestView(generics.GenericAPIView):
+    """
+    List the emergency services nearest to a location.
+    
+    Query parameters:
+    - latitude, longitude (required): Caller location
+    - k (optional): Number of services to return (default: 5, max: 50)
+    - service_type (optional): Filter by service type (police, hospital, fireStation, ambulance)
+    - radius_km (optional): Only return services within this distance
+    
+    GET: Returns services sorted by distance, each with distance_km. Answered
+    from the worker's in-memory index, so the table is never scanned.
+    """
+    serializer_class = EmergencyServiceSerializer
+    
+    MAX_RESULTS = 50
+    
+    def get(self, request):
+        params = request.query_params
+        try:
+            latitude = float(params['latitude'])
+            longitude = float(params['longitude'])
+            k = int(params.get('k', 5))
+            radius_km = float(params['radius_km']) if params.get('radius_km') else None
+        except KeyError:
+            return Response(
+                {'error': 'latitude and longitude are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ValueError as e:
+            return Response(
+                {'error': f'Invalid parameters: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+            return Response(
+                {'error': 'latitude must be between -90 and 90 and longitude between -180 and 180'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if k < 1 or (radius_km is not None and radius_km <= 0):
+            return Response(
+                {'error': 'k and radius_km must be positive'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        matches = get_emergency_service_index().nearest(
+            latitude,
+            longitude,
+            k=min(k, self.MAX_RESULTS),
+            service_type=params.get('service_type'),
+            radius_km=radius_km,
+        )
+        
+        # The index may lag behind other workers; skip services deactivated since
+        services = EmergencyService.objects.filter(is_active=True).in_bulk(
+            [service_id for service_id, _ in matches]
+        )
+        results = []
+        for service_id, distance in matches:
+            if service_id in services:
+                data = self.get_serializer(services[service_id]).data
+                data['distance_km'] = round(distance, 3)
+                results.append(data)
+        
+        return Response({
+            'count': len(results),
+            'results': results
+        })
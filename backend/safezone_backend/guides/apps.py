@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GuidesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'guides'
+
+    def ready(self):
+        # Invalidate cached guide responses when guides change
+        from . import signals  # noqa: F401
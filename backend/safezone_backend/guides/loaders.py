@@ -0,0 +1,74 @@
+"""
+Bulk loading of safety guide content, keyed on (section, title).
+"""
+
+import logging
+
+from safezone_backend.bulk_loading import DEFAULT_BATCH_SIZE, parse_bool, upsert
+
+from .models import Guide
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = {choice for choice, _ in Guide.SECTION_CHOICES}
+
+# Fields overwritten when a guide is loaded again
+UPDATE_FIELDS = ['content', 'icon', 'order', 'is_active', 'updated_at']
+
+
+def guide_from_record(record):
+    """
+    Build an unsaved Guide from a dataset record.
+
+    Returns:
+        Guide, or None if the record is invalid
+    """
+    section = str(record.get('section') or '').strip()
+    title = str(record.get('title') or '').strip()
+    content = str(record.get('content') or '').strip()
+    if section not in SECTIONS or not title or not content:
+        return None
+
+    try:
+        order = int(record.get('order') or 0)
+    except (TypeError, ValueError):
+        return None
+
+    return Guide(
+        section=section,
+        title=title[:200],
+        content=content,
+        icon=str(record.get('icon') or '').strip()[:100] or None,
+        order=order,
+        is_active=parse_bool(record.get('is_active')),
+    )
+
+
+def load_guides(records, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Upsert guides from an iterable of records.
+
+    Returns:
+        Tuple of (guides written, records skipped as invalid)
+    """
+    skipped = 0
+
+    def guides():
+        nonlocal skipped
+        for record in records:
+            guide = guide_from_record(record)
+            if guide is None:
+                skipped += 1
+                continue
+            yield guide
+
+    written = upsert(
+        Guide,
+        guides(),
+        unique_fields=['section', 'title'],
+        update_fields=UPDATE_FIELDS,
+        batch_size=batch_size,
+    )
+    if skipped:
+        logger.warning(f"Skipped {skipped} invalid guide records")
+    return written, skipped
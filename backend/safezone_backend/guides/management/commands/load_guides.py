@@ -0,0 +1,37 @@
+"""
+Django management command to load safety guides from datasets.
+
+Reads CSV, JSON or NDJSON files with Guide field names and upserts guides
+keyed on (section, title), so content can be updated without clearing
+the table.
+
+Usage:
+    python manage.py load_guides guides.json [more files...] [--format json]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from guides.loaders import load_guides
+from safezone_backend.bulk_loading import iter_records
+
+
+class Command(BaseCommand):
+    help = 'Upsert safety guides from CSV, JSON or NDJSON datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Dataset files to load')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'json', 'ndjson'],
+            help='Dataset format (default: from the file extension)',
+        )
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            try:
+                written, skipped = load_guides(iter_records(path, options['format']))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not load {path}: {e}')
+
+            self.stdout.write(self.style.SUCCESS(f'✓ Loaded {written} guides from {path}'))
+            if skipped:
+                self.stdout.write(self.style.WARNING(f'  Skipped {skipped} invalid record(s)'))
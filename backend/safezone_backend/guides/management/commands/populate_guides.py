@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from guides.models import Guide
+from guides.loaders import load_guides
 
 
 class Command(BaseCommand):
@@ -8,9 +8,6 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         self.stdout.write('Populating safety guides database...')
         
-        # Clear existing guides
-        Guide.objects.all().delete()
-        
         guides_data = [
             # How SafeZone Works
             {
@@ -225,12 +222,11 @@ class Command(BaseCommand):
             },
         ]
         
-        # Create all guides
-        guides = [Guide(**guide_data) for guide_data in guides_data]
-        Guide.objects.bulk_create(guides)
+        # Update existing guides in place and add new ones
+        written, _ = load_guides(guides_data)
         
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully created {len(guides_data)} guide entries!'
+                f'Successfully loaded {written} guide entries!'
             )
         )
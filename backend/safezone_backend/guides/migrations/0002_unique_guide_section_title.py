@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-19 08:27
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def delete_duplicate_guides(apps, schema_editor):
+    """Keep only the newest guide of each section and title before adding the constraint."""
+    Guide = apps.get_model('guides', 'Guide')
+
+    latest_guides = (
+        Guide.objects.values('section', 'title')
+        .annotate(latest_id=Max('id'))
+        .values('latest_id')
+    )
+    Guide.objects.exclude(id__in=latest_guides).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_guides, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='guide',
+            constraint=models.UniqueConstraint(fields=('section', 'title'), name='unique_guide_section_title'),
+        ),
+    ]
@@ -31,6 +31,9 @@ class Guide(models.Model):
             models.Index(fields=['section', 'order']),
             models.Index(fields=['is_active']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['section', 'title'], name='unique_guide_section_title'),
+        ]
 
     def __str__(self):
         return f"{self.get_section_display()} - {self.title}"
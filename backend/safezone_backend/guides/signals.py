@@ -0,0 +1,17 @@
+"""
+Signal handlers invalidating cached guide responses.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from safezone_backend.http_caching import bump_content_generation
+
+from .models import Guide
+
+
+@receiver(post_save, sender=Guide)
+@receiver(post_delete, sender=Guide)
+def invalidate_guide_responses(sender, **kwargs):
+    """Drop cached guide responses once the transaction commits."""
+    transaction.on_commit(lambda: bump_content_generation(Guide))
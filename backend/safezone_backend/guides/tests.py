@@ -1,3 +1,7 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
@@ -107,3 +111,93 @@ class GuideAPITest(APITestCase):
         response = self.client.get('/api/guides/9999/')
         
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+
+class GuideLoaderTest(TestCase):
+    """Tests for loading guide content."""
+
+    def test_populate_guides_is_idempotent(self):
+        """Test that repopulating updates guides in place by section and title."""
+        call_command('populate_guides', stdout=StringIO())
+        count = Guide.objects.count()
+        guide = Guide.objects.get(section='how_it_works', title='Crowdsourced Safety')
+        guide.content = 'Outdated'
+        guide.save()
+
+        call_command('populate_guides', stdout=StringIO())
+
+        self.assertEqual(Guide.objects.count(), count)
+        guide.refresh_from_db()
+        self.assertNotEqual(guide.content, 'Outdated')
+
+    def test_load_guides_from_ndjson(self):
+        """Test loading guides from a dataset file."""
+        import os
+        import tempfile
+
+        handle, path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(handle, 'w') as f:
+            f.write('{"section": "privacy", "title": "Data", "content": "Kept local", "order": "2"}\n')
+            f.write('{"section": "nope", "title": "Invalid", "content": "x"}\n')
+        try:
+            out = StringIO()
+            call_command('load_guides', path, stdout=out)
+        finally:
+            os.remove(path)
+
+        self.assertIn('Loaded 1 guides', out.getvalue())
+        guide = Guide.objects.get(section='privacy', title='Data')
+        self.assertEqual(guide.order, 2)
+        self.assertTrue(guide.is_active)
+
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='', CONTENT_CACHE_MAX_AGE=600)
+class GuideConditionalRequestTest(APITestCase):
+    """Tests for ETag handling and response caching of guides."""
+
+    def setUp(self):
+        cache.clear()
+        self.guide = Guide.objects.create(
+            section='how_it_works',
+            title='How SafeZone Works',
+            content='SafeZone is a community safety platform',
+            order=1,
+        )
+
+    def test_not_modified_with_matching_etag(self):
+        """Test that a matching If-None-Match gets an empty 304."""
+        response = self.client.get('/api/guides/')
+        etag = response['ETag']
+        self.assertIn('max-age=600', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/guides/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_cached_body_is_reused(self):
+        """Test that unchanged content is served from the rendered body cache."""
+        first = self.client.get('/api/guides/')
+
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/guides/')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_save_changes_etag(self):
+        """Test that saving a guide produces a new ETag and fresh content."""
+        etag = self.client.get(f'/api/guides/{self.guide.id}/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guide.title = 'Updated Title'
+            self.guide.save()
+
+        response = self.client.get(f'/api/guides/{self.guide.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['title'], 'Updated Title')
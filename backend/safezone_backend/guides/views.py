@@ -2,15 +2,17 @@ from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny
 from django.conf import settings
+from safezone_backend.http_caching import ConditionalContentMixin
 from .models import Guide
 from .serializers import GuideSerializer
 
 
-class GuideListView(generics.ListAPIView):
+class GuideListView(ConditionalContentMixin, generics.ListAPIView):
     """
     List all active guides.
     
-    GET: Returns list of all active guides ordered by section and order
+    GET: Returns list of all active guides ordered by section and order.
+    Supports ETag / If-None-Match conditional requests.
     """
     serializer_class = GuideSerializer
     
@@ -44,11 +46,12 @@ class GuideListView(generics.ListAPIView):
         })
 
 
-class GuideRetrieveView(generics.RetrieveAPIView):
+class GuideRetrieveView(ConditionalContentMixin, generics.RetrieveAPIView):
     """
     Retrieve a specific guide by ID.
     
-    GET: Returns details of a single guide
+    GET: Returns details of a single guide.
+    Supports ETag / If-None-Match conditional requests.
     """
     queryset = Guide.objects.all()
     serializer_class = GuideSerializer
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class IncidentReportingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'incident_reporting'
+
+    def ready(self):
+        # Keep the map cluster index and incident rollups up to date
+        from . import signals  # noqa: F401
@@ -0,0 +1,233 @@
+"""
+Server-side clustering of recent incidents for map rendering.
+
+Incidents reported in the last CLUSTER_WINDOW_HOURS are projected to Web
+Mercator and bucketed into a grid of CLUSTER_CELLS_PER_TILE x
+CLUSTER_CELLS_PER_TILE cells per 256 px map tile. A zoom level doubles
+the cells per axis, so every cell at zoom z splits into at most four cells
+at zoom z + 1 and cluster ids ('zoom/x/y') form a hierarchy clients can
+drill into.
+
+Each worker keeps one index. A zoom level is aggregated on first request
+and then kept; each cluster stores its count, centroid, bounds and
+counts by category. The index is rebuilt when older than
+CLUSTER_INDEX_MAX_AGE seconds, so incidents age out of the window and
+changes from other workers are picked up, and new incidents are added
+incrementally from the post_save signal in between.
+"""
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Web Mercator is undefined at the poles
+MAX_LATITUDE = 85.05112878
+
+
+def project(latitude, longitude):
+    """Project a point to Web Mercator coordinates in [0, 1)."""
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    x = (longitude + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(latitude))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+def unproject(x, y):
+    """Convert Web Mercator coordinates back to (latitude, longitude)."""
+    longitude = x * 360.0 - 180.0
+    latitude = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return latitude, longitude
+
+
+class IncidentClusterIndex:
+    """Per-zoom grid clusters of recent incidents."""
+
+    def __init__(self, max_zoom=None, cells_per_tile=None):
+        self.max_zoom = max_zoom if max_zoom is not None else getattr(settings, 'CLUSTER_MAX_ZOOM', 16)
+        self.cells_per_tile = cells_per_tile or getattr(settings, 'CLUSTER_CELLS_PER_TILE', 4)
+        self._points = []
+        self._levels = {}
+        self._lock = threading.Lock()
+        self.built_at = None
+        self.last_rebuild_seconds = None
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def is_stale(self):
+        """Check whether the index should be rebuilt from the database."""
+        if not self.is_built:
+            return True
+        max_age = getattr(settings, 'CLUSTER_INDEX_MAX_AGE', 60)
+        return time.monotonic() - self.built_at > max_age
+
+    def rebuild(self):
+        """Reload the incidents of the recent window and drop all zoom levels."""
+        from .models import Incident
+
+        started = time.perf_counter()
+        window = timedelta(hours=getattr(settings, 'CLUSTER_WINDOW_HOURS', 168))
+        rows = Incident.objects.filter(timestamp__gte=timezone.now() - window).values_list(
+            'id', 'latitude', 'longitude', 'category',
+        )
+
+        points = []
+        for incident_id, latitude, longitude, category in rows.iterator(chunk_size=2000):
+            points.append(self._point(incident_id, latitude, longitude, category))
+
+        with self._lock:
+            self._points = points
+            self._levels = {}
+        self.built_at = time.monotonic()
+        self.last_rebuild_seconds = time.perf_counter() - started
+        logger.info(
+            f"Rebuilt incident cluster index: {len(points)} incidents "
+            f"({self.last_rebuild_seconds * 1000:.1f} ms)"
+        )
+
+    @staticmethod
+    def _point(incident_id, latitude, longitude, category):
+        x, y = project(latitude, longitude)
+        return (incident_id, latitude, longitude, category, x, y)
+
+    def _cells_per_axis(self, zoom):
+        return self.cells_per_tile << zoom
+
+    def _add_to_level(self, cells, size, point):
+        incident_id, latitude, longitude, category, x, y = point
+        key = (int(x * size), int(y * size))
+        cell = cells.get(key)
+        if cell is None:
+            # count, sum x, sum y, min lat, min lon, max lat, max lon, categories, incident id
+            cells[key] = [1, x, y, latitude, longitude, latitude, longitude, {category: 1}, incident_id]
+            return
+        cell[0] += 1
+        cell[1] += x
+        cell[2] += y
+        cell[3] = min(cell[3], latitude)
+        cell[4] = min(cell[4], longitude)
+        cell[5] = max(cell[5], latitude)
+        cell[6] = max(cell[6], longitude)
+        cell[7][category] = cell[7].get(category, 0) + 1
+        cell[8] = None
+
+    def _level(self, zoom):
+        """Return the cells of a zoom level, aggregating them on first use."""
+        with self._lock:
+            cells = self._levels.get(zoom)
+            if cells is None:
+                cells = {}
+                size = self._cells_per_axis(zoom)
+                for point in self._points:
+                    self._add_to_level(cells, size, point)
+                self._levels[zoom] = cells
+            return cells
+
+    def add_incident(self, incident):
+        """Add a newly reported incident to the index and every built zoom level."""
+        point = self._point(incident.id, incident.latitude, incident.longitude, incident.category)
+        with self._lock:
+            self._points.append(point)
+            for zoom, cells in self._levels.items():
+                self._add_to_level(cells, self._cells_per_axis(zoom), point)
+
+    def clusters(self, bbox, zoom, limit=None):
+        """
+        Return the clusters of a zoom level inside a bounding box.
+
+        Args:
+            bbox: Tuple (min_lat, min_lon, max_lat, max_lon)
+            zoom: Map zoom level; levels above max_zoom use max_zoom
+            limit: Maximum number of clusters to return, largest first
+
+        Returns:
+            List of cluster dictionaries
+        """
+        zoom = max(0, min(int(zoom), self.max_zoom))
+        cells = self._level(zoom)
+        size = self._cells_per_axis(zoom)
+
+        min_lat, min_lon, max_lat, max_lon = bbox
+        min_x, max_y = project(min_lat, min_lon)
+        max_x, min_y = project(max_lat, max_lon)
+        columns = range(int(min_x * size), int(max_x * size) + 1)
+        rows = range(int(min_y * size), int(max_y * size) + 1)
+
+        if len(columns) * len(rows) > len(cells):
+            matches = [
+                (key, cell) for key, cell in cells.items()
+                if key[0] in columns and key[1] in rows
+            ]
+        else:
+            matches = []
+            for column in columns:
+                for row in rows:
+                    cell = cells.get((column, row))
+                    if cell is not None:
+                        matches.append(((column, row), cell))
+
+        if limit is not None and len(matches) > limit:
+            matches.sort(key=lambda match: -match[1][0])
+            matches = matches[:limit]
+
+        return [self._serialize(zoom, key, cell) for key, cell in matches]
+
+    @staticmethod
+    def _serialize(zoom, key, cell):
+        count, sum_x, sum_y, min_lat, min_lon, max_lat, max_lon, categories, incident_id = cell
+        latitude, longitude = unproject(sum_x / count, sum_y / count)
+        cluster = {
+            'id': f'{zoom}/{key[0]}/{key[1]}',
+            'latitude': round(latitude, 6),
+            'longitude': round(longitude, 6),
+            'count': count,
+            'categories': dict(categories),
+            'bounds': [min_lat, min_lon, max_lat, max_lon],
+        }
+        if count == 1:
+            cluster['incident_id'] = incident_id
+        return cluster
+
+    def __len__(self):
+        return len(self._points)
+
+
+# Per-worker index instance
+_cluster_index = None
+_index_lock = threading.Lock()
+
+
+def get_incident_cluster_index():
+    """Get the worker's incident cluster index, building it if missing or stale."""
+    global _cluster_index
+    with _index_lock:
+        if _cluster_index is None:
+            _cluster_index = IncidentClusterIndex()
+        index = _cluster_index
+
+    if index.is_stale():
+        index.rebuild()
+    return index
+
+
+def peek_incident_cluster_index():
+    """Return the worker's index only if it has already been built."""
+    index = _cluster_index
+    if index is not None and index.is_built:
+        return index
+    return None
+
+
+def reset_incident_cluster_index():
+    """Discard the worker's index so it is rebuilt on next use."""
+    global _cluster_index
+    with _index_lock:
+        _cluster_index = None
@@ -36,3 +36,10 @@ class IncidentConsumer(AsyncWebsocketConsumer):
             'type': 'incident_update',
             'incident': event['incident']
         }))
+
+    async def incident_bulk_update(self, event):
+        """Handle batches of incidents published by the bulk endpoint."""
+        await self.send(text_data=json.dumps({
+            'type': 'incident_bulk_update',
+            'incidents': event['incidents']
+        }))
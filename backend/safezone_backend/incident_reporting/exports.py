@@ -0,0 +1,194 @@
+"""
+Streaming incident exports for analytics.
+
+Incidents are read with values() and iterator(chunk_size=...), so rows are
+fetched from the database in chunks without instantiating models and
+rendered to NDJSON or CSV one line at a time. Memory use stays constant
+regardless of the size of the export.
+"""
+import csv
+import json
+from datetime import datetime, time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+
+from .models import Incident
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# The reporter hash is deliberately not exported
+EXPORT_FIELDS = [
+    'id',
+    'category',
+    'latitude',
+    'longitude',
+    'title',
+    'description',
+    'timestamp',
+    'confirmed_by',
+    'notify_nearby',
+]
+
+# Free-text fields written to CSV; spreadsheets run cells starting with a
+# formula character, so those are prefixed with a quote
+CSV_TEXT_FIELDS = ['title', 'description']
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 date or datetime used as an export bound.
+
+    Raises:
+        ValueError: If the value is not a valid date or datetime
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"Invalid date or datetime: {value}")
+        parsed = datetime.combine(date, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_bbox(value):
+    """
+    Parse a bounding box given as 'min_lat,min_lon,max_lat,max_lon'.
+
+    Raises:
+        ValueError: If the value is not four numbers with min <= max
+    """
+    try:
+        min_lat, min_lon, max_lat, max_lon = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError("Bounding box must be 'min_lat,min_lon,max_lat,max_lon'")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("Bounding box minimums must not exceed maximums")
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def filter_incidents(since=None, until=None, categories=None, bbox=None):
+    """
+    Build the queryset of incidents to export.
+
+    Args:
+        since: Only include incidents reported at or after this datetime
+        until: Only include incidents reported before this datetime
+        categories: Only include these categories
+        bbox: Tuple (min_lat, min_lon, max_lat, max_lon)
+
+    Returns:
+        Incident queryset ordered by id
+    """
+    queryset = Incident.objects.order_by('id')
+
+    if since:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until:
+        queryset = queryset.filter(timestamp__lt=until)
+    if categories:
+        queryset = queryset.filter(category__in=categories)
+    if bbox:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        queryset = queryset.filter(
+            latitude__gte=min_lat,
+            latitude__lte=max_lat,
+            longitude__gte=min_lon,
+            longitude__lte=max_lon,
+        )
+    return queryset
+
+
+def iter_incident_rows(queryset, chunk_size=None):
+    """Yield incidents as dictionaries, fetching chunk_size rows at a time."""
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'INCIDENT_EXPORT_CHUNK_SIZE', 2000)
+    return queryset.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def render_ndjson(rows):
+    """Yield one JSON document per line."""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class _LineBuffer:
+    """File-like object returning what csv.writer writes instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    """
+    Yield a CSV header followed by one line per row.
+
+    Text cells that a spreadsheet would read as a formula are prefixed
+    with a single quote, so the export is safe to open in Excel or Sheets.
+    """
+    writer = csv.DictWriter(_LineBuffer(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        row['timestamp'] = row['timestamp'].isoformat()
+        for field in CSV_TEXT_FIELDS:
+            if row[field] and row[field].startswith(CSV_FORMULA_PREFIXES):
+                row[field] = "'" + row[field]
+        yield writer.writerow(row)
+
+
+def export_incidents(export_format='ndjson', chunk_size=None, **filters):
+    """
+    Stream incidents in the given format.
+
+    Args:
+        export_format: 'ndjson' or 'csv'
+        chunk_size: Rows fetched from the database per query
+        **filters: Passed to filter_incidents()
+
+    Yields:
+        Lines of the export
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    rows = iter_incident_rows(filter_incidents(**filters), chunk_size)
+    if export_format == 'csv':
+        return render_csv(rows)
+    return render_ndjson(rows)
+
+
+def batch_lines(lines, size=500):
+    """Join lines into larger chunks to reduce per-write overhead."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+async def aiterate(iterator):
+    """
+    Consume a synchronous iterator from async code one item at a time.
+
+    StreamingHttpResponse buffers the whole content of a synchronous
+    iterator when served over ASGI; this keeps the export streaming.
+    """
+    iterator = iter(iterator)
+    done = object()
+    while True:
+        item = await sync_to_async(next)(iterator, done)
+        if item is done:
+            break
+        yield item
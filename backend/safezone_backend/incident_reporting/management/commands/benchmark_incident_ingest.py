@@ -0,0 +1,126 @@
+"""
+Django management command to compare the sync and async incident endpoints.
+
+Requests are driven concurrently through the ASGI handler in-process, the
+same way a single Daphne worker would serve them. Blocking side effects
+(reverse geocoding) can be simulated with a fixed latency.
+
+Usage:
+    python manage.py benchmark_incident_ingest [--requests 200] [--concurrency 50]
+                                               [--simulated-latency-ms 50]
+"""
+
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from incident_reporting.models import Incident
+
+BENCHMARK_TITLE = '[benchmark] incident ingest'
+
+ENDPOINTS = (
+    ('sync', '/api/incidents/'),
+    ('async', '/api/incidents/ingest/'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent report submissions on the sync and async incident endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Number of reports to submit per endpoint (default: 200)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Maximum number of in-flight requests (default: 50)',
+        )
+        parser.add_argument(
+            '--simulated-latency-ms',
+            type=int,
+            default=50,
+            help='Latency added to reverse geocoding, 0 to disable (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        latency = options['simulated_latency_ms'] / 1000
+
+        def slow_reverse_geocode(latitude, longitude):
+            time.sleep(latency)
+            return f"{latitude:.4f}, {longitude:.4f}"
+
+        self.stdout.write(
+            f"Submitting {options['requests']} report(s) per endpoint with "
+            f"concurrency {options['concurrency']} and "
+            f"{options['simulated_latency_ms']} ms simulated geocoding latency...\n"
+        )
+
+        try:
+            # Authentication is skipped so only request handling is measured
+            with override_settings(DEBUG=True, AUTH0_DOMAIN='', ALLOWED_HOSTS=['testserver']), \
+                    patch('alerts.models.Alert.reverse_geocode', side_effect=slow_reverse_geocode):
+                for name, path in ENDPOINTS:
+                    result = asyncio.run(
+                        self.run_endpoint(path, options['requests'], options['concurrency'])
+                    )
+                    self.report(name, path, result)
+        finally:
+            deleted, _ = Incident.objects.filter(title=BENCHMARK_TITLE).delete()
+            self.stdout.write(f'Removed {deleted} benchmark object(s)')
+
+    async def run_endpoint(self, path, total, concurrency):
+        """Submit reports concurrently and collect latencies."""
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        failures = 0
+
+        async def submit(i):
+            nonlocal failures
+            payload = {
+                'category': 'theft',
+                'latitude': 37.7749 + (i % 100) * 0.001,
+                'longitude': -122.4194,
+                'title': BENCHMARK_TITLE,
+            }
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(path, payload, content_type='application/json')
+                latencies.append(time.perf_counter() - started)
+            if response.status_code != 201:
+                failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(submit(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+        return {
+            'elapsed': elapsed,
+            'latencies': sorted(latencies),
+            'failures': failures,
+        }
+
+    def report(self, name, path, result):
+        latencies = result['latencies']
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] if latencies else 0
+        throughput = len(latencies) / result['elapsed'] if result['elapsed'] else 0
+
+        self.stdout.write(f'{name} ({path})')
+        self.stdout.write(f"  Total time:  {result['elapsed']:.2f} s")
+        self.stdout.write(f'  Throughput:  {throughput:.1f} req/s')
+        if latencies:
+            self.stdout.write(f'  Median:      {statistics.median(latencies) * 1000:.1f} ms')
+            self.stdout.write(f'  p95:         {p95 * 1000:.1f} ms')
+        if result['failures']:
+            self.stdout.write(self.style.ERROR(f"  Failures:    {result['failures']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ {len(latencies)} report(s) created'))
+        self.stdout.write('')
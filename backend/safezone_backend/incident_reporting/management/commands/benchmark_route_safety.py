@@ -0,0 +1,135 @@
+"""
+Django management command to benchmark route safety scoring.
+
+Builds a synthetic set of recent incidents around a city-sized area and a
+long random-walk route through it, then times score_route() against the
+grid index and against a baseline that tests every incident against every
+segment. The baseline is quadratic, so it only scores the first
+--baseline-segments segments and its time is extrapolated to the full
+route. Nothing is written to the database.
+
+Usage:
+    python manage.py benchmark_route_safety [--points 2000] [--incidents 50000]
+                                            [--corridor 100] [--baseline-segments 50]
+"""
+
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from alerts.models import Alert
+from incident_reporting.routes import score_route
+from safezone_backend.geo_utils import PointGridIndex
+
+# Synthetic incidents are spread over about 40 x 40 km
+CENTER = (5.6037, -0.1870)
+SPREAD_DEGREES = 0.2
+
+
+class FlatIndex:
+    """Index stand-in whose box query returns every incident."""
+
+    def __init__(self, points):
+        self.points = points
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        return self.points
+
+
+class Command(BaseCommand):
+    help = 'Benchmark route safety scoring with the grid index against a brute-force baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--points',
+            type=int,
+            default=2000,
+            help='Number of points in the route (default: 2000)',
+        )
+        parser.add_argument(
+            '--incidents',
+            type=int,
+            default=50000,
+            help='Number of synthetic recent incidents (default: 50000)',
+        )
+        parser.add_argument(
+            '--corridor',
+            type=float,
+            default=100,
+            help='Corridor width in meters (default: 100)',
+        )
+        parser.add_argument(
+            '--baseline-segments',
+            type=int,
+            default=50,
+            help='Segments scored by the brute-force baseline (default: 50)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Random seed (default: 1)',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        window_hours = getattr(settings, 'ROUTE_RISK_WINDOW_HOURS', 168)
+        categories = list(Alert.SEVERITY_MAP)
+
+        started = time.perf_counter()
+        grid = PointGridIndex(getattr(settings, 'ROUTE_INDEX_CELL_SIZE', 0.01))
+        flat = []
+        for incident_id in range(options['incidents']):
+            latitude = CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+            longitude = CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+            value = (
+                rng.choice(categories),
+                now - timedelta(hours=rng.uniform(0, window_hours)),
+            )
+            grid.insert(incident_id, latitude, longitude, value)
+            flat.append((incident_id, latitude, longitude, value))
+        build_seconds = time.perf_counter() - started
+
+        # Random walk with steps of up to about 50 m
+        points = [CENTER]
+        for _ in range(options['points'] - 1):
+            latitude, longitude = points[-1]
+            points.append((
+                latitude + rng.uniform(-0.0005, 0.0005),
+                longitude + rng.uniform(-0.00045, 0.00055),
+            ))
+
+        self.stdout.write(
+            f"Scoring a {len(points)}-point route against {len(grid)} incident(s) "
+            f"with a {options['corridor']:g} m corridor "
+            f"(index built in {build_seconds * 1000:.0f} ms)...\n"
+        )
+
+        started = time.perf_counter()
+        result = score_route(grid, points, options['corridor'], now=now)
+        indexed_seconds = time.perf_counter() - started
+
+        baseline_points = points[:options['baseline_segments'] + 1]
+        baseline_segments = len(baseline_points) - 1
+        started = time.perf_counter()
+        score_route(FlatIndex(flat), baseline_points, options['corridor'], now=now)
+        baseline_seconds = (time.perf_counter() - started) * (len(points) - 1) / baseline_segments
+
+        self.stdout.write(f"Route length: {result['length_m'] / 1000:.1f} km")
+        self.stdout.write(
+            f"Incidents in corridor: {result['incident_count']}, "
+            f"total risk: {result['total_risk']:.2f}"
+        )
+        self.stdout.write(f"Grid index:  {indexed_seconds * 1000:.1f} ms")
+        self.stdout.write(
+            f"Brute force: {baseline_seconds * 1000:.1f} ms "
+            f"(extrapolated from {baseline_segments} segment(s))"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Grid index is {baseline_seconds / indexed_seconds:.0f}x faster'
+        ))
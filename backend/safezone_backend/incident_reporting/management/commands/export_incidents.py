@@ -0,0 +1,86 @@
+"""
+Django management command to stream incidents as NDJSON or CSV.
+
+Usage:
+    python manage.py export_incidents [--format ndjson|csv] [--output FILE]
+                                      [--since DATE] [--until DATE]
+                                      [--category CATEGORY ...]
+                                      [--bbox MIN_LAT,MIN_LON,MAX_LAT,MAX_LON]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from incident_reporting.exports import (
+    EXPORT_FORMATS,
+    export_incidents,
+    parse_bbox,
+    parse_timestamp,
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream incidents as NDJSON or CSV with constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=sorted(EXPORT_FORMATS),
+            default='ndjson',
+            help='Output format (default: ndjson)',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write to (default: stdout)',
+        )
+        parser.add_argument(
+            '--since',
+            help='Only export incidents reported at or after this ISO 8601 date or datetime',
+        )
+        parser.add_argument(
+            '--until',
+            help='Only export incidents reported before this ISO 8601 date or datetime',
+        )
+        parser.add_argument(
+            '--category',
+            action='append',
+            help='Only export this category (repeatable)',
+        )
+        parser.add_argument(
+            '--bbox',
+            help='Only export incidents inside MIN_LAT,MIN_LON,MAX_LAT,MAX_LON',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows fetched per database query (default: INCIDENT_EXPORT_CHUNK_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            lines = export_incidents(
+                options['format'],
+                chunk_size=options['chunk_size'],
+                since=parse_timestamp(options['since']) if options['since'] else None,
+                until=parse_timestamp(options['until']) if options['until'] else None,
+                categories=options['category'],
+                bbox=parse_bbox(options['bbox']) if options['bbox'] else None,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        count = 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for line in lines:
+                output.write(line)
+                count += 1
+
+        # The CSV header is not an incident
+        if options['format'] == 'csv':
+            count = max(count - 1, 0)
+        self.stderr.write(
+            self.style.SUCCESS(f"✓ Exported {count} incident(s) to {options['output']}")
+        )
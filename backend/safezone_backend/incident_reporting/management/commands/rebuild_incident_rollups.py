@@ -0,0 +1,20 @@
+"""
+Django management command to recompute the incident rollups.
+
+Rollups are maintained incrementally; run this after changing
+INCIDENT_ROLLUP_PRECISION or to repair drift from incidents edited in place.
+
+Usage:
+    python manage.py rebuild_incident_rollups
+"""
+
+from django.core.management.base import BaseCommand
+from incident_reporting.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute incident counts per geohash cell, hour and category'
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {rows} incident rollup rows'))
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-19 08:36
+
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    """Count the existing incidents in the new rollup table."""
+    from incident_reporting.rollups import rebuild_rollups
+
+    rebuild_rollups(
+        incident_model=apps.get_model('incident_reporting', 'Incident'),
+        rollup_model=apps.get_model('incident_reporting', 'IncidentRollup'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('incident_reporting', '0002_incident_reporter_device_id_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('geohash', models.CharField(max_length=12)),
+                ('hour', models.DateTimeField(help_text='Start of the hour the incidents were reported in')),
+                ('category', models.CharField(choices=[('accident', 'Accident'), ('fire', 'Fire'), ('theft', 'Theft'), ('suspicious', 'Suspicious Activity'), ('lighting', 'Lighting Issue'), ('assault', 'Assault'), ('vandalism', 'Vandalism'), ('harassment', 'Harassment'), ('roadHazard', 'Road Hazard'), ('animalDanger', 'Animal Danger'), ('medicalEmergency', 'Medical Emergency'), ('naturalDisaster', 'Natural Disaster'), ('powerOutage', 'Power Outage'), ('waterIssue', 'Water Issue'), ('noise', 'Noise Complaint'), ('trespassing', 'Trespassing'), ('drugActivity', 'Drug Activity'), ('weaponSighting', 'Weapon Sighting')], max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='incident_re_hour_e7bbc7_idx'), models.Index(fields=['latitude', 'longitude'], name='incident_re_latitud_5a9cea_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='incidentrollup',
+            constraint=models.UniqueConstraint(fields=('geohash', 'hour', 'category'), name='unique_incident_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
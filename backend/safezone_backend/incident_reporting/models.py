@@ -45,3 +45,32 @@ class Incident(models.Model):
 
     def __str__(self):
         return f"{self.category} - {self.title}"
+
+
+class IncidentRollup(models.Model):
+    """
+    Incident counts per geohash cell, hour and category.
+
+    Maintained incrementally from incident creates and deletes (see
+    rollups.py), so statistics and heatmaps never scan Incident.
+    """
+
+    geohash = models.CharField(max_length=12)
+    hour = models.DateTimeField(help_text='Start of the hour the incidents were reported in')
+    category = models.CharField(max_length=50, choices=Incident.CATEGORY_CHOICES)
+    count = models.IntegerField(default=0)
+    # Centre of the geohash cell, for bounding box filters
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['geohash', 'hour', 'category'], name='unique_incident_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+            models.Index(fields=['latitude', 'longitude']),
+        ]
+
+    def __str__(self):
+        return f"{self.geohash} {self.hour:%Y-%m-%d %H:00} {self.category}: {self.count}"
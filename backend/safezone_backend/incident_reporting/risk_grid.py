@@ -0,0 +1,342 @@
+"""
+Area risk grid with time decay.
+
+The world is divided into cells of RISK_GRID_CELL_SIZE degrees, grouped
+into square regions of RISK_GRID_REGION_CELLS x RISK_GRID_REGION_CELLS
+cells. Only regions that have seen incidents are allocated. Each region
+keeps its cell values in a flat array of doubles plus a 2D Fenwick tree
+over the same values, so:
+
+- the risk of the cell containing a point is a single array read, and
+- the total risk of a bounding box is O(log^2 n) per region it overlaps,
+  independent of the number of cells or incidents inside it.
+
+An incident adds severity weight (from the severity its alert gets, see
+Alert.SEVERITY_MAP) x (1 + RISK_GRID_CONFIRMATION_WEIGHT x confirmations)
+to its cell, decaying by half every RISK_GRID_HALF_LIFE_HOURS. Values are
+stored with forward decay: a weight reported at time t is stored as
+weight x 2 ** ((t - epoch) / half-life) and reads multiply by
+2 ** ((epoch - now) / half-life). Decay therefore never touches stored
+values, and a new incident or confirmation updates one cell and its
+Fenwick path.
+
+Each worker keeps one grid, rebuilt from the incidents of the last
+RISK_GRID_WINDOW_HOURS when older than RISK_GRID_MAX_AGE seconds (which
+also picks up edits, deletes and changes from other workers) and updated
+from incident and confirmation signals in between.
+"""
+import logging
+import threading
+import time
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from safezone_backend.geo_utils import grid_shape
+
+from .routes import severity_weight
+
+logger = logging.getLogger(__name__)
+
+# Rebase stored values before the forward decay factor grows past 2 ** 64
+MAX_DECAY_EXPONENT = 64
+
+
+class RiskRegion:
+    """Square block of grid cells with a Fenwick tree for range sums."""
+
+    def __init__(self, size):
+        self.size = size
+        self.cells = array('d', bytes(8 * size * size))
+        # 1-based tree; row and column 0 are unused
+        self.tree = array('d', bytes(8 * (size + 1) * (size + 1)))
+
+    def add(self, row, column, value):
+        """Add value to a cell."""
+        size = self.size
+        self.cells[row * size + column] += value
+        i = row + 1
+        while i <= size:
+            j = column + 1
+            offset = i * (size + 1)
+            while j <= size:
+                self.tree[offset + j] += value
+                j += j & -j
+            i += i & -i
+
+    def cell(self, row, column):
+        return self.cells[row * self.size + column]
+
+    def _prefix(self, row, column):
+        """Sum of the cells in rows [0, row) and columns [0, column)."""
+        total = 0.0
+        i = row
+        while i > 0:
+            j = column
+            offset = i * (self.size + 1)
+            while j > 0:
+                total += self.tree[offset + j]
+                j -= j & -j
+            i -= i & -i
+        return total
+
+    def range_sum(self, min_row, min_column, max_row, max_column):
+        """Sum of the cells in an inclusive block."""
+        return (
+            self._prefix(max_row + 1, max_column + 1)
+            - self._prefix(min_row, max_column + 1)
+            - self._prefix(max_row + 1, min_column)
+            + self._prefix(min_row, min_column)
+        )
+
+    def scale(self, factor):
+        """Multiply every cell by factor."""
+        for values in (self.cells, self.tree):
+            for i in range(len(values)):
+                values[i] *= factor
+
+
+class RiskGrid:
+    """Decaying risk values over a global grid of array-backed regions."""
+
+    def __init__(self, cell_size=None, region_cells=None, half_life_hours=None, epoch=None):
+        region_cells = region_cells or getattr(settings, 'RISK_GRID_REGION_CELLS', 100)
+        self.cell_size = cell_size or getattr(settings, 'RISK_GRID_CELL_SIZE', 0.005)
+        self.region_cells = region_cells
+        self.half_life_hours = half_life_hours or getattr(settings, 'RISK_GRID_HALF_LIFE_HOURS', 24)
+        self.epoch = epoch or timezone.now()
+        self.rows, self.columns = grid_shape(self.cell_size)
+        self.regions = {}
+        self._lock = threading.RLock()
+
+    def _decay_exponent(self, timestamp):
+        return (timestamp - self.epoch).total_seconds() / 3600 / self.half_life_hours
+
+    def _cell(self, latitude, longitude):
+        """Return the global (row, column) of the cell containing a point."""
+        row = min(max(int((latitude + 90) // self.cell_size), 0), self.rows - 1)
+        column = min(max(int((longitude + 180) // self.cell_size), 0), self.columns - 1)
+        return row, column
+
+    def cell_bounds(self, row, column):
+        """Return (min_lat, min_lon, max_lat, max_lon) of a cell."""
+        min_lat = row * self.cell_size - 90
+        min_lon = column * self.cell_size - 180
+        return (
+            round(min_lat, 9),
+            round(min_lon, 9),
+            round(min(min_lat + self.cell_size, 90), 9),
+            round(min(min_lon + self.cell_size, 180), 9),
+        )
+
+    def add(self, latitude, longitude, weight, timestamp):
+        """Add a weight reported at timestamp to the cell containing a point."""
+        with self._lock:
+            exponent = self._decay_exponent(timestamp)
+            if exponent > MAX_DECAY_EXPONENT:
+                self._rebase(timestamp)
+                exponent = 0.0
+            row, column = self._cell(latitude, longitude)
+            size = self.region_cells
+            key = (row // size, column // size)
+            region = self.regions.get(key)
+            if region is None:
+                region = self.regions[key] = RiskRegion(size)
+            region.add(row % size, column % size, weight * 2 ** exponent)
+
+    def _rebase(self, epoch):
+        """Move the epoch forward, rescaling stored values to match."""
+        factor = 2 ** -self._decay_exponent(epoch)
+        for region in self.regions.values():
+            region.scale(factor)
+        self.epoch = epoch
+        logger.info(f"Rebased risk grid to {epoch.isoformat()}")
+
+    def _now_factor(self, now):
+        return 2 ** -self._decay_exponent(now or timezone.now())
+
+    def risk_at(self, latitude, longitude, now=None):
+        """
+        Return the current risk of the cell containing a point.
+
+        Returns:
+            Tuple ((row, column), risk)
+        """
+        row, column = self._cell(latitude, longitude)
+        size = self.region_cells
+        region = self.regions.get((row // size, column // size))
+        value = region.cell(row % size, column % size) if region is not None else 0.0
+        return (row, column), value * self._now_factor(now)
+
+    def bbox_risk(self, min_lat, min_lon, max_lat, max_lon, now=None):
+        """
+        Return the current total risk of the cells overlapping a bounding box.
+
+        Returns:
+            Tuple (total risk, number of cells)
+        """
+        min_row, min_column = self._cell(min_lat, min_lon)
+        max_row, max_column = self._cell(max_lat, max_lon)
+        size = self.region_cells
+        region_rows = range(min_row // size, max_row // size + 1)
+        region_columns = range(min_column // size, max_column // size + 1)
+
+        total = 0.0
+        with self._lock:
+            if len(region_rows) * len(region_columns) > len(self.regions):
+                keys = [
+                    key for key in self.regions
+                    if key[0] in region_rows and key[1] in region_columns
+                ]
+            else:
+                keys = [
+                    (region_row, region_column)
+                    for region_row in region_rows
+                    for region_column in region_columns
+                    if (region_row, region_column) in self.regions
+                ]
+            for region_row, region_column in keys:
+                base_row, base_column = region_row * size, region_column * size
+                total += self.regions[(region_row, region_column)].range_sum(
+                    max(min_row - base_row, 0),
+                    max(min_column - base_column, 0),
+                    min(max_row - base_row, size - 1),
+                    min(max_column - base_column, size - 1),
+                )
+
+        cells = (max_row - min_row + 1) * (max_column - min_column + 1)
+        # Float cancellation in the range sums can leave tiny negative totals
+        return max(total, 0.0) * self._now_factor(now), cells
+
+    @property
+    def memory_bytes(self):
+        """Approximate memory used by the allocated regions."""
+        return sum(
+            region.cells.itemsize * (len(region.cells) + len(region.tree))
+            for region in self.regions.values()
+        )
+
+
+def incident_risk_weight(category, confirmations):
+    """Return the undecayed risk of an incident with the given confirmations."""
+    confirmation_weight = getattr(settings, 'RISK_GRID_CONFIRMATION_WEIGHT', 0.5)
+    return severity_weight(category) * (1 + confirmation_weight * confirmations)
+
+
+class IncidentRiskGrid:
+    """Per-worker risk grid built from recent incidents."""
+
+    def __init__(self):
+        self.grid = RiskGrid()
+        self.built_at = None
+        self.last_rebuild_seconds = None
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def is_stale(self):
+        """Check whether the grid should be rebuilt from the database."""
+        if not self.is_built:
+            return True
+        max_age = getattr(settings, 'RISK_GRID_MAX_AGE', 300)
+        return time.monotonic() - self.built_at > max_age
+
+    def rebuild(self):
+        """Recompute the grid from the incidents of the risk window."""
+        from django.db.models import Count
+        from .models import Incident
+
+        started = time.perf_counter()
+        now = timezone.now()
+        window = timedelta(hours=getattr(settings, 'RISK_GRID_WINDOW_HOURS', 720))
+        rows = (
+            Incident.objects.filter(timestamp__gte=now - window)
+            .annotate(confirmation_count=Count('confirmations'))
+            .values_list('latitude', 'longitude', 'category', 'timestamp', 'confirmation_count')
+        )
+
+        grid = RiskGrid(epoch=now)
+        incidents = 0
+        for latitude, longitude, category, timestamp, confirmations in rows.iterator(chunk_size=2000):
+            grid.add(latitude, longitude, incident_risk_weight(category, confirmations), timestamp)
+            incidents += 1
+
+        self.grid = grid
+        self.built_at = time.monotonic()
+        self.last_rebuild_seconds = time.perf_counter() - started
+        logger.info(
+            f"Rebuilt risk grid: {incidents} incidents in {len(grid.regions)} region(s), "
+            f"{grid.memory_bytes // 1024} KiB ({self.last_rebuild_seconds * 1000:.1f} ms)"
+        )
+
+    def add_incident(self, incident):
+        """Add a newly reported incident."""
+        self.grid.add(
+            incident.latitude,
+            incident.longitude,
+            incident_risk_weight(incident.category, 0),
+            incident.timestamp,
+        )
+
+    def add_confirmation(self, incident):
+        """Raise an incident's risk by one confirmation, decayed from the report time."""
+        confirmation_weight = getattr(settings, 'RISK_GRID_CONFIRMATION_WEIGHT', 0.5)
+        self.grid.add(
+            incident.latitude,
+            incident.longitude,
+            severity_weight(incident.category) * confirmation_weight,
+            incident.timestamp,
+        )
+
+    def point(self, latitude, longitude, now=None):
+        """Return the current risk of the cell containing a point."""
+        (row, column), risk = self.grid.risk_at(latitude, longitude, now)
+        return {
+            'cell': list(self.grid.cell_bounds(row, column)),
+            'risk': round(risk, 4),
+        }
+
+    def area(self, bbox, now=None):
+        """Return the current total and mean cell risk inside a bounding box."""
+        risk, cells = self.grid.bbox_risk(*bbox, now=now)
+        return {
+            'risk': round(risk, 4),
+            'cells': cells,
+            'mean_risk': round(risk / cells, 6),
+        }
+
+
+# Per-worker grid instance
+_risk_grid = None
+_grid_lock = threading.Lock()
+
+
+def get_risk_grid():
+    """Get the worker's risk grid, building it if missing or stale."""
+    global _risk_grid
+    with _grid_lock:
+        if _risk_grid is None:
+            _risk_grid = IncidentRiskGrid()
+        grid = _risk_grid
+
+    if grid.is_stale():
+        grid.rebuild()
+    return grid
+
+
+def peek_risk_grid():
+    """Return the worker's grid only if it has already been built."""
+    grid = _risk_grid
+    if grid is not None and grid.is_built:
+        return grid
+    return None
+
+
+def reset_risk_grid():
+    """Discard the worker's grid so it is rebuilt on next use."""
+    global _risk_grid
+    with _grid_lock:
+        _risk_grid = None
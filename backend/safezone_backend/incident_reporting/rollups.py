@@ -0,0 +1,300 @@
+"""
+Spatio-temporal rollups of incident counts.
+
+IncidentRollup holds the number of incidents per (geohash cell at
+INCIDENT_ROLLUP_PRECISION, hour, category). Incident creates and deletes
+queue +1 / -1 deltas from model signals; deltas are buffered for the
+duration of the surrounding transaction and applied on commit with one
+statement per touched rollup row, so deleting a batch of incidents costs
+a handful of grouped updates rather than one per incident. Each savepoint
+gets its own buffer, so deltas queued inside a rolled-back savepoint are
+dropped with it. Bulk inserts bypass signals and call record_incidents()
+directly; bulk coordinate updates call move_rollup_counts().
+
+Incidents edited in place keep the rollup of their original report.
+rebuild_rollups() (`python manage.py rebuild_incident_rollups`) recomputes
+the table from scratch, e.g. after changing the precision.
+"""
+import logging
+import threading
+import weakref
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from safezone_backend.geo_utils import geohash_bounds, geohash_encode
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+
+def rollup_precision():
+    return getattr(settings, 'INCIDENT_ROLLUP_PRECISION', 6)
+
+
+def rollup_key(latitude, longitude, timestamp, category, precision=None):
+    """Return the (geohash, hour, category) rollup an incident is counted in."""
+    geohash = geohash_encode(latitude, longitude, precision or rollup_precision())
+    hour = timestamp.replace(minute=0, second=0, microsecond=0)
+    return geohash, hour, category
+
+
+def geohash_center(geohash):
+    """Return the (latitude, longitude) centre of a geohash cell."""
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+
+def apply_rollup_deltas(deltas, rollup_model=None):
+    """
+    Add count deltas to rollup rows.
+
+    Missing rows are created first, then each row is updated in place, so
+    concurrent writers never overwrite each other's counts. Rows whose
+    count drops to zero are deleted.
+
+    Args:
+        deltas: Mapping of (geohash, hour, category) to a count delta
+        rollup_model: Rollup model (default: IncidentRollup); migrations
+            pass their historical model
+    """
+    if rollup_model is None:
+        from .models import IncidentRollup as rollup_model
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        rollup_model.objects.bulk_create(
+            [
+                rollup_model(
+                    geohash=geohash,
+                    hour=hour,
+                    category=category,
+                    count=0,
+                    latitude=latitude,
+                    longitude=longitude,
+                )
+                for (geohash, hour, category), delta in deltas.items()
+                if delta > 0
+                for latitude, longitude in [geohash_center(geohash)]
+            ],
+            ignore_conflicts=True,
+        )
+        for (geohash, hour, category), delta in deltas.items():
+            rollup_model.objects.filter(geohash=geohash, hour=hour, category=category).update(
+                count=F('count') + delta
+            )
+        emptied_hours = {hour for (_, hour, _), delta in deltas.items() if delta < 0}
+        if emptied_hours:
+            rollup_model.objects.filter(hour__in=emptied_hours, count__lte=0).delete()
+
+
+def record_incidents(incidents, sign=1):
+    """Count (or with sign=-1, uncount) incidents in the rollups immediately."""
+    deltas = Counter()
+    for incident in incidents:
+        deltas[rollup_key(incident.latitude, incident.longitude, incident.timestamp, incident.category)] += sign
+    apply_rollup_deltas(deltas)
+
+
+def move_rollup_counts(incidents, new_locations):
+    """
+    Move incidents to the rollups of their new coordinates immediately.
+
+    QuerySet.update() bypasses the signals, so code that changes incident
+    coordinates in bulk calls this in the same transaction; otherwise a
+    later delete would uncount the incident from the wrong cell.
+
+    Args:
+        incidents: Iterable of (id, latitude, longitude, timestamp, category)
+            as they were before the update
+        new_locations: Mapping of incident id to (latitude, longitude) after
+            the update
+    """
+    deltas = Counter()
+    for incident_id, latitude, longitude, timestamp, category in incidents:
+        if incident_id not in new_locations:
+            continue
+        old_key = rollup_key(latitude, longitude, timestamp, category)
+        new_key = rollup_key(*new_locations[incident_id], timestamp, category)
+        if old_key != new_key:
+            deltas[old_key] -= 1
+            deltas[new_key] += 1
+    apply_rollup_deltas(deltas)
+
+
+class _PendingDeltas:
+    """Deltas buffered in one savepoint, applied when the transaction commits."""
+
+    def __init__(self):
+        self.deltas = Counter()
+        self.applied = False
+
+    def __call__(self):
+        self.applied = True
+        apply_rollup_deltas(self.deltas)
+
+
+def queue_rollup_delta(incident, delta):
+    """
+    Count an incident change once the surrounding transaction commits.
+
+    Deltas from the same savepoint are merged and applied together.
+    """
+    key = rollup_key(incident.latitude, incident.longitude, incident.timestamp, incident.category)
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        apply_rollup_deltas({key: delta})
+        return
+
+    buffers = getattr(_pending, 'buffers', None)
+    if buffers is None:
+        # Only the on_commit queue holds buffers strongly, so a buffer
+        # disappears here once it has been applied or rolled back
+        buffers = _pending.buffers = weakref.WeakValueDictionary()
+    savepoint = tuple(sid for sid in connection.savepoint_ids if sid)
+    buffer = buffers.get(savepoint)
+    if buffer is None or buffer.applied:
+        buffer = buffers[savepoint] = _PendingDeltas()
+        transaction.on_commit(buffer)
+
+    buffer.deltas[key] += delta
+
+
+def rebuild_rollups(incident_model=None, rollup_model=None, chunk_size=2000):
+    """
+    Recompute every rollup row from the incidents table.
+
+    Returns:
+        Number of rollup rows written
+    """
+    if incident_model is None:
+        from .models import Incident as incident_model
+    if rollup_model is None:
+        from .models import IncidentRollup as rollup_model
+
+    precision = rollup_precision()
+    counts = Counter()
+    rows = incident_model.objects.values_list('latitude', 'longitude', 'timestamp', 'category')
+    for latitude, longitude, timestamp, category in rows.iterator(chunk_size=chunk_size):
+        counts[rollup_key(latitude, longitude, timestamp, category, precision)] += 1
+
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        rollup_model.objects.bulk_create(
+            (
+                rollup_model(
+                    geohash=geohash,
+                    hour=hour,
+                    category=category,
+                    count=count,
+                    latitude=latitude,
+                    longitude=longitude,
+                )
+                for (geohash, hour, category), count in counts.items()
+                for latitude, longitude in [geohash_center(geohash)]
+            ),
+            batch_size=chunk_size,
+        )
+    logger.info(f"Rebuilt {len(counts)} incident rollup rows")
+    return len(counts)
+
+
+def filter_rollups(since=None, until=None, categories=None, bbox=None):
+    """
+    Build the queryset of rollup rows matching statistics filters.
+
+    Time bounds apply at hour resolution and the bounding box to cell
+    centres, so results are exact to one rollup cell and hour.
+
+    Args:
+        since: Include the hour containing this datetime and later hours
+        until: Only include hours starting before this datetime
+        categories: Only include these categories
+        bbox: Tuple (min_lat, min_lon, max_lat, max_lon)
+    """
+    from .models import IncidentRollup
+
+    queryset = IncidentRollup.objects.all()
+    if since:
+        queryset = queryset.filter(hour__gte=since.replace(minute=0, second=0, microsecond=0))
+    if until:
+        queryset = queryset.filter(hour__lt=until)
+    if categories:
+        queryset = queryset.filter(category__in=categories)
+    if bbox:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        queryset = queryset.filter(
+            latitude__gte=min_lat,
+            latitude__lte=max_lat,
+            longitude__gte=min_lon,
+            longitude__lte=max_lon,
+        )
+    return queryset
+
+
+def incident_stats(queryset, interval='day'):
+    """
+    Summarize rollup rows as totals by category and a time series.
+
+    Args:
+        queryset: Rollup rows from filter_rollups()
+        interval: 'hour' or 'day' buckets for the series
+
+    Returns:
+        Dictionary with total, by_category and series
+    """
+    from django.db.models import Sum
+    from django.db.models.functions import TruncDay
+
+    by_category = {
+        row['category']: row['count']
+        for row in queryset.values('category').annotate(count=Sum('count')).order_by('category')
+    }
+
+    bucket = F('hour') if interval == 'hour' else TruncDay('hour')
+    series = queryset.values(bucket=bucket).annotate(count=Sum('count')).order_by('bucket')
+
+    return {
+        'total': sum(by_category.values()),
+        'by_category': by_category,
+        'series': [{'start': row['bucket'], 'count': row['count']} for row in series],
+    }
+
+
+def incident_heatmap(queryset, precision, limit):
+    """
+    Aggregate rollup rows into coarser geohash cells.
+
+    Args:
+        queryset: Rollup rows from filter_rollups()
+        precision: Geohash length of the heatmap cells (at most the rollup precision)
+        limit: Maximum number of cells, busiest first
+
+    Returns:
+        List of dictionaries with geohash, latitude, longitude and count
+    """
+    from django.db.models import Sum
+    from django.db.models.functions import Substr
+
+    rows = (
+        queryset.annotate(cell=Substr('geohash', 1, precision))
+        .values('cell')
+        .annotate(count=Sum('count'))
+        .order_by('-count', 'cell')[:limit]
+    )
+    cells = []
+    for row in rows:
+        latitude, longitude = geohash_center(row['cell'])
+        cells.append({
+            'geohash': row['cell'],
+            'latitude': latitude,
+            'longitude': longitude,
+            'count': row['count'],
+        })
+    return cells
@@ -0,0 +1,344 @@
+"""
+Route safety scoring against recent incidents.
+
+A route is a polyline of (latitude, longitude) points. Every incident
+reported in the last ROUTE_RISK_WINDOW_HOURS within corridor_meters of
+the route is assigned to its closest segment and adds
+
+    severity weight x 0.5 ** (age in hours / ROUTE_RISK_HALF_LIFE_HOURS)
+
+to that segment's risk score, where the severity is the one Alert uses
+for the incident category.
+
+Recent incidents are kept in a per-worker PointGridIndex, rebuilt when
+older than ROUTE_INDEX_MAX_AGE seconds and updated from incident signals.
+Each segment only looks at the grid cells under its bounding box widened
+by the corridor, so scoring a route costs time proportional to its
+length and the incidents near it, not to segments x incidents.
+"""
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from safezone_backend.geo_utils import METERS_PER_DEGREE, PointGridIndex
+
+logger = logging.getLogger(__name__)
+
+# Risk contributed by one fresh incident of each alert severity
+SEVERITY_WEIGHTS = {
+    'high': 3.0,
+    'medium': 2.0,
+    'low': 1.0,
+    'info': 0.5,
+}
+
+
+def decode_polyline(encoded, precision=5, max_points=None):
+    """
+    Decode a polyline in the Google encoded polyline format.
+
+    Args:
+        encoded: Encoded polyline string
+        precision: Number of decimal places encoded
+        max_points: Stop with an error after this many points, before the
+            rest of the string is decoded
+
+    Returns:
+        List of (latitude, longitude) tuples
+
+    Raises:
+        ValueError: If the string is not a valid encoded polyline or has more
+            than max_points points
+    """
+    points = []
+    index = latitude = longitude = 0
+    factor = 10 ** precision
+
+    while index < len(encoded):
+        if max_points is not None and len(points) >= max_points:
+            raise ValueError(f'A route can have at most {max_points} points')
+        deltas = []
+        for _ in range(2):
+            result = shift = 0
+            while True:
+                if index >= len(encoded):
+                    raise ValueError('Truncated encoded polyline')
+                byte = ord(encoded[index]) - 63
+                index += 1
+                if not 0 <= byte < 64:
+                    raise ValueError('Invalid character in encoded polyline')
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        latitude += deltas[0]
+        longitude += deltas[1]
+        points.append((latitude / factor, longitude / factor))
+
+    return points
+
+
+def parse_route_points(data, max_points):
+    """
+    Read route points from a request body.
+
+    Args:
+        data: Dictionary with either points, a list of [latitude, longitude]
+            pairs, or polyline, a Google encoded polyline
+        max_points: Maximum number of points accepted
+
+    Returns:
+        List of (latitude, longitude) tuples
+
+    Raises:
+        ValueError: If the route is missing, malformed, too long or crosses
+            the antimeridian
+    """
+    if data.get('polyline'):
+        if not isinstance(data['polyline'], str):
+            raise ValueError('polyline must be an encoded polyline string')
+        points = decode_polyline(data['polyline'], max_points=max_points)
+    elif data.get('points'):
+        if not isinstance(data['points'], list):
+            raise ValueError('points must be a list of [latitude, longitude] pairs')
+        points = []
+        for point in data['points']:
+            if not isinstance(point, (list, tuple)) or len(point) != 2:
+                raise ValueError('points must be a list of [latitude, longitude] pairs')
+            try:
+                points.append((float(point[0]), float(point[1])))
+            except (TypeError, ValueError):
+                raise ValueError('points must be a list of [latitude, longitude] pairs')
+    else:
+        raise ValueError('points or polyline is required')
+
+    if len(points) < 2:
+        raise ValueError('A route needs at least two points')
+    if len(points) > max_points:
+        raise ValueError(f'A route can have at most {max_points} points')
+    for latitude, longitude in points:
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError('Route points must be valid coordinates')
+    # Segment boxes and distances assume longitudes do not wrap
+    for start, end in zip(points, points[1:]):
+        if abs(end[1] - start[1]) > 180:
+            raise ValueError('Route segments cannot cross the antimeridian')
+    return points
+
+
+def severity_weight(category):
+    """Return the risk of a fresh incident, from the severity of its alert."""
+    from alerts.models import Alert
+
+    return SEVERITY_WEIGHTS[Alert.SEVERITY_MAP.get(category, 'info')]
+
+
+def incident_weight(category, timestamp, now, half_life_hours):
+    """Return the risk an incident adds given its severity and age."""
+    age_hours = max((now - timestamp).total_seconds() / 3600, 0.0)
+    return severity_weight(category) * 0.5 ** (age_hours / half_life_hours)
+
+
+def _segment_distance_m(latitude, longitude, start, end):
+    """
+    Distance in meters from a point to a segment, and the position along it.
+
+    Uses an equirectangular projection around the segment, which is
+    accurate to well under a percent at corridor distances.
+    """
+    scale = METERS_PER_DEGREE * math.cos(math.radians((start[0] + end[0]) / 2))
+    ax, ay = start[1] * scale, start[0] * METERS_PER_DEGREE
+    bx, by = end[1] * scale, end[0] * METERS_PER_DEGREE
+    px, py = longitude * scale, latitude * METERS_PER_DEGREE
+
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if not length_sq else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy)), t
+
+
+def segment_length_m(start, end):
+    """Length of a segment in meters."""
+    distance, _ = _segment_distance_m(end[0], end[1], start, start)
+    return distance
+
+
+def score_route(index, points, corridor_meters, now=None, half_life_hours=None):
+    """
+    Score each segment of a route by the recent incidents around it.
+
+    Args:
+        index: PointGridIndex of incidents with (category, timestamp) values
+        points: List of (latitude, longitude) route points, at least two
+        corridor_meters: Maximum distance from the route to count an incident
+        now: Reference time for recency (default: now)
+        half_life_hours: Hours after which an incident counts half
+            (default: ROUTE_RISK_HALF_LIFE_HOURS)
+
+    Returns:
+        Dictionary with per-segment scores, route totals and the matched
+        incidents, nearest segment first
+    """
+    now = now or timezone.now()
+    if half_life_hours is None:
+        half_life_hours = getattr(settings, 'ROUTE_RISK_HALF_LIFE_HOURS', 24)
+
+    lat_margin = corridor_meters / METERS_PER_DEGREE
+    # Closest (distance, segment, position) per incident
+    matches = {}
+    candidates = {}
+
+    for segment, (start, end) in enumerate(zip(points, points[1:])):
+        widest = min(max(abs(start[0]), abs(end[0])) + lat_margin, 89.9)
+        lon_margin = corridor_meters / (METERS_PER_DEGREE * math.cos(math.radians(widest)))
+        for key, latitude, longitude, value in index.within_bbox(
+            min(start[0], end[0]) - lat_margin,
+            min(start[1], end[1]) - lon_margin,
+            max(start[0], end[0]) + lat_margin,
+            max(start[1], end[1]) + lon_margin,
+        ):
+            distance, position = _segment_distance_m(latitude, longitude, start, end)
+            if distance > corridor_meters:
+                continue
+            best = matches.get(key)
+            if best is None or distance < best[0]:
+                matches[key] = (distance, segment, position)
+                candidates[key] = (latitude, longitude, value)
+
+    segments = [
+        {
+            'index': segment,
+            'start': list(start),
+            'end': list(end),
+            'length_m': round(segment_length_m(start, end), 1),
+            'incident_count': 0,
+            'risk_score': 0.0,
+        }
+        for segment, (start, end) in enumerate(zip(points, points[1:]))
+    ]
+
+    incidents = []
+    for key, (distance, segment, position) in matches.items():
+        latitude, longitude, (category, timestamp) = candidates[key]
+        weight = incident_weight(category, timestamp, now, half_life_hours)
+        segments[segment]['incident_count'] += 1
+        segments[segment]['risk_score'] += weight
+        incidents.append({
+            'id': key,
+            'category': category,
+            'latitude': latitude,
+            'longitude': longitude,
+            'timestamp': timestamp,
+            'segment': segment,
+            'distance_m': round(distance, 1),
+            'risk': round(weight, 4),
+            '_order': (segment, position),
+        })
+
+    incidents.sort(key=lambda incident: incident.pop('_order'))
+    for segment in segments:
+        segment['risk_score'] = round(segment['risk_score'], 4)
+
+    total_length = sum(segment['length_m'] for segment in segments)
+    total_risk = sum(segment['risk_score'] for segment in segments)
+    return {
+        'length_m': round(total_length, 1),
+        'total_risk': round(total_risk, 4),
+        'risk_per_km': round(total_risk / (total_length / 1000), 4) if total_length else 0.0,
+        'max_segment_risk': max(segment['risk_score'] for segment in segments),
+        'incident_count': len(incidents),
+        'segments': segments,
+        'incidents': incidents,
+    }
+
+
+class RecentIncidentIndex:
+    """Grid index of the incidents reported in the risk window."""
+
+    def __init__(self, cell_size=None):
+        self.cell_size = cell_size or getattr(settings, 'ROUTE_INDEX_CELL_SIZE', 0.01)
+        self.grid = PointGridIndex(self.cell_size)
+        self.built_at = None
+        self.last_rebuild_seconds = None
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def is_stale(self):
+        """Check whether the index should be rebuilt from the database."""
+        if not self.is_built:
+            return True
+        max_age = getattr(settings, 'ROUTE_INDEX_MAX_AGE', 60)
+        return time.monotonic() - self.built_at > max_age
+
+    def rebuild(self):
+        """Reload the incidents of the risk window."""
+        from .models import Incident
+
+        started = time.perf_counter()
+        window = timedelta(hours=getattr(settings, 'ROUTE_RISK_WINDOW_HOURS', 168))
+        rows = Incident.objects.filter(timestamp__gte=timezone.now() - window).values_list(
+            'id', 'latitude', 'longitude', 'category', 'timestamp',
+        )
+
+        grid = PointGridIndex(self.cell_size)
+        for incident_id, latitude, longitude, category, timestamp in rows.iterator(chunk_size=2000):
+            grid.insert(incident_id, latitude, longitude, (category, timestamp))
+
+        self.grid = grid
+        self.built_at = time.monotonic()
+        self.last_rebuild_seconds = time.perf_counter() - started
+        logger.info(
+            f"Rebuilt route risk index: {len(grid)} incidents "
+            f"({self.last_rebuild_seconds * 1000:.1f} ms)"
+        )
+
+    def add_incident(self, incident):
+        """Add a newly reported incident."""
+        self.grid.insert(
+            incident.id, incident.latitude, incident.longitude, (incident.category, incident.timestamp),
+        )
+
+    def remove_incident(self, incident_id):
+        """Drop a deleted incident."""
+        self.grid.remove(incident_id)
+
+
+# Per-worker index instance
+_route_index = None
+_index_lock = threading.Lock()
+
+
+def get_route_index():
+    """Get the worker's recent incident index, building it if missing or stale."""
+    global _route_index
+    with _index_lock:
+        if _route_index is None:
+            _route_index = RecentIncidentIndex()
+        index = _route_index
+
+    if index.is_stale():
+        index.rebuild()
+    return index
+
+
+def peek_route_index():
+    """Return the worker's index only if it has already been built."""
+    index = _route_index
+    if index is not None and index.is_built:
+        return index
+    return None
+
+
+def reset_route_index():
+    """Discard the worker's index so it is rebuilt on next use."""
+    global _route_index
+    with _index_lock:
+        _route_index = None
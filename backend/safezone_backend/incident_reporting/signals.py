@@ -0,0 +1,95 @@
+"""
+Signal handlers keeping the per-worker incident cluster and route risk
+indexes, the area risk grid and the incident rollups in sync.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .clustering import peek_incident_cluster_index
+from .models import Incident
+from .risk_grid import peek_risk_grid
+from .rollups import queue_rollup_delta
+from .routes import peek_route_index
+
+
+@receiver(post_save, sender=Incident)
+def add_to_incident_cluster_index(sender, instance, created, **kwargs):
+    """Add a new incident to the cluster index once the transaction commits."""
+    if not created:
+        # Edits are picked up by the periodic rebuild
+        return
+
+    def apply():
+        index = peek_incident_cluster_index()
+        if index is not None:
+            index.add_incident(instance)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=Incident)
+def add_to_route_index(sender, instance, created, **kwargs):
+    """Add a new incident to the route risk index once the transaction commits."""
+    if not created:
+        return
+
+    def apply():
+        index = peek_route_index()
+        if index is not None:
+            index.add_incident(instance)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Incident)
+def remove_from_route_index(sender, instance, **kwargs):
+    """Drop a deleted incident from the route risk index once the transaction commits."""
+    index = peek_route_index()
+    if index is None:
+        # Nothing to update; keeps batch deletes free of per-row callbacks
+        return
+    incident_id = instance.id
+    transaction.on_commit(lambda: index.remove_incident(incident_id))
+
+
+@receiver(post_save, sender=Incident)
+def add_to_risk_grid(sender, instance, created, **kwargs):
+    """Add a new incident to the risk grid once the transaction commits."""
+    if not created:
+        return
+
+    def apply():
+        grid = peek_risk_grid()
+        if grid is not None:
+            grid.add_incident(instance)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender='scoring.IncidentConfirmation')
+def add_confirmation_to_risk_grid(sender, instance, created, **kwargs):
+    """Raise the risk of a confirmed incident once the transaction commits."""
+    if not created:
+        return
+    incident = instance.incident
+
+    def apply():
+        grid = peek_risk_grid()
+        if grid is not None:
+            grid.add_confirmation(incident)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_save, sender=Incident)
+def count_incident_in_rollups(sender, instance, created, **kwargs):
+    """Count a new incident in the rollups."""
+    if created:
+        queue_rollup_delta(instance, 1)
+
+
+@receiver(post_delete, sender=Incident)
+def uncount_incident_in_rollups(sender, instance, **kwargs):
+    """Remove a deleted incident from the rollups."""
+    queue_rollup_delta(instance, -1)
@@ -1,8 +1,18 @@
-from django.test import TestCase, override_settings
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Incident
+from .clustering import get_incident_cluster_index, reset_incident_cluster_index
+from .models import Incident, IncidentRollup
+from .risk_grid import RiskRegion, RiskGrid, reset_risk_grid
+from .rollups import rebuild_rollups
+from .routes import decode_polyline, reset_route_index
 from alerts.models import Alert
+from scoring.models import IncidentConfirmation
 
 
 @override_settings(DEBUG=True, AUTH0_DOMAIN='')
@@ -114,3 +124,765 @@ class IncidentAlertGenerationTestCase(TestCase):
                 expected_severity,
                 f"Alert severity for {category} should be {expected_severity}"
             )
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='')
+@patch('alerts.models.Alert.reverse_geocode', return_value='Test Street')
+class IncidentIngestTestCase(TransactionTestCase):
+    """Test the async incident ingest endpoint."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.incident_data = {
+            'category': 'theft',
+            'latitude': 37.7749,
+            'longitude': -122.4194,
+            'title': 'Async Theft Incident',
+            'description': 'Test description',
+        }
+    
+    def test_ingest_creates_incident_and_alert(self, mock_geocode):
+        """Test that ingesting an incident runs the same side effects as the DRF view."""
+        response = self.client.post('/api/incidents/ingest/', self.incident_data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['title'], 'Async Theft Incident')
+        
+        incident = Incident.objects.get(id=response.json()['id'])
+        alert = Alert.objects.get(incident=incident)
+        self.assertEqual(alert.severity, 'high')
+        self.assertEqual(alert.location, 'Test Street')
+    
+    def test_ingest_awards_reporter_points(self, mock_geocode):
+        """Test that the reporter is tracked and scored."""
+        from scoring.models import UserProfile, hash_device_id
+        
+        data = dict(self.incident_data, device_id='async-reporter')
+        response = self.client.post('/api/incidents/ingest/', data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        device_hash = hash_device_id('async-reporter')
+        incident = Incident.objects.get(id=response.json()['id'])
+        self.assertEqual(incident.reporter_device_id_hash, device_hash)
+        profile = UserProfile.objects.get(device_id_hash=device_hash)
+        self.assertEqual(profile.reports_count, 1)
+    
+    def test_ingest_broadcasts_incident(self, mock_geocode):
+        """Test that the incident is published to the incidents group."""
+        with patch('incident_reporting.views.apublish_incident') as mock_publish:
+            response = self.client.post('/api/incidents/ingest/', self.incident_data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        event = mock_publish.call_args[0][0]
+        self.assertEqual(event['type'], 'incident_update')
+        self.assertEqual(event['incident']['id'], response.json()['id'])
+    
+    def test_ingest_rejects_invalid_data(self, mock_geocode):
+        """Test that validation errors are returned without creating an incident."""
+        data = dict(self.incident_data, category='not-a-category')
+        response = self.client.post('/api/incidents/ingest/', data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('category', response.json())
+        self.assertEqual(Incident.objects.count(), 0)
+    
+    def test_ingest_rejects_malformed_json(self, mock_geocode):
+        """Test that a body that is not JSON is rejected."""
+        response = self.client.post(
+            '/api/incidents/ingest/', 'not json', content_type='application/json',
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    @override_settings(DEBUG=False, AUTH0_DOMAIN='example.auth0.com')
+    def test_ingest_requires_authentication(self, mock_geocode):
+        """Test that unauthenticated requests are rejected outside development."""
+        response = self.client.post('/api/incidents/ingest/', self.incident_data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(Incident.objects.count(), 0)
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='', INCIDENT_BULK_MAX_ITEMS=5)
+class IncidentBulkCreateTestCase(TestCase):
+    """Test the bulk incident endpoint."""
+    
+    def setUp(self):
+        self.client = APIClient()
+    
+    def _incident(self, **overrides):
+        data = {
+            'category': 'theft',
+            'latitude': 37.7749,
+            'longitude': -122.4194,
+            'title': 'Bulk Theft Incident',
+        }
+        data.update(overrides)
+        return data
+    
+    def test_bulk_create_reports_per_item_status(self):
+        """Test that valid items are created and invalid ones reported by index."""
+        payload = [
+            self._incident(title='First'),
+            self._incident(latitude=120),
+            self._incident(category='lighting', title='Third'),
+        ]
+        
+        response = self.client.post('/api/incidents/bulk/', payload, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 1)
+        
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'invalid', 'created'])
+        self.assertIn('latitude', results[1]['errors'])
+        self.assertEqual(Incident.objects.get(id=results[0]['id']).title, 'First')
+        self.assertEqual(Incident.objects.get(id=results[2]['id']).category, 'lighting')
+    
+    def test_bulk_create_generates_alerts_without_geocoding(self):
+        """Test that every created incident gets an alert in one batch."""
+        payload = [self._incident(), self._incident(category='powerOutage')]
+        
+        with patch('alerts.models.Alert.reverse_geocode') as mock_geocode:
+            response = self.client.post('/api/incidents/bulk/', payload, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_geocode.assert_not_called()
+        
+        severities = sorted(Alert.objects.values_list('severity', flat=True))
+        self.assertEqual(severities, ['high', 'info'])
+        self.assertEqual(Alert.objects.first().location, '37.774900, -122.419400')
+    
+    def test_bulk_create_awards_points_per_reporter(self):
+        """Test that scoring is aggregated per reporter."""
+        from scoring.models import UserProfile, hash_device_id
+        
+        payload = [
+            self._incident(device_id='bulk-reporter'),
+            self._incident(device_id='bulk-reporter'),
+            self._incident(device_id='other-reporter'),
+            self._incident(),
+        ]
+        
+        response = self.client.post('/api/incidents/bulk/', payload, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        profile = UserProfile.objects.get(device_id_hash=hash_device_id('bulk-reporter'))
+        self.assertEqual(profile.reports_count, 2)
+        self.assertEqual(profile.total_points, 24)
+        self.assertEqual(
+            UserProfile.objects.get(device_id_hash=hash_device_id('other-reporter')).reports_count,
+            1,
+        )
+        self.assertEqual(
+            Incident.objects.filter(reporter_device_id_hash=hash_device_id('bulk-reporter')).count(),
+            2,
+        )
+    
+    def test_bulk_create_broadcasts_one_frame(self):
+        """Test that the batch is published as a single WebSocket event."""
+        payload = [self._incident(), self._incident(), self._incident()]
+        
+        with patch('incident_reporting.utils.apublish_incident') as mock_publish:
+            response = self.client.post('/api/incidents/bulk/', payload, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mock_publish.assert_called_once()
+        event = mock_publish.call_args[0][0]
+        self.assertEqual(event['type'], 'incident_bulk_update')
+        self.assertEqual(len(event['incidents']), 3)
+    
+    def test_bulk_create_rejects_invalid_payloads(self):
+        """Test that non-list, empty, oversized and all-invalid batches are rejected."""
+        for payload in [self._incident(), [], [self._incident()] * 6, [self._incident(latitude=120)]]:
+            response = self.client.post('/api/incidents/bulk/', payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        self.assertEqual(Incident.objects.count(), 0)
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='')
+class IncidentExportTestCase(TestCase):
+    """Test streaming incident exports."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.theft = Incident.objects.create(
+            category='theft', latitude=37.7749, longitude=-122.4194, title='Theft',
+        )
+        self.fire = Incident.objects.create(
+            category='fire', latitude=40.7128, longitude=-74.0060, title='Fire',
+            description='Line one\nline two',
+        )
+        self.old = Incident.objects.create(
+            category='theft', latitude=37.7750, longitude=-122.4195, title='Old theft',
+        )
+        Incident.objects.filter(id=self.old.id).update(timestamp='2020-01-01T00:00:00Z')
+    
+    def _ndjson(self, response):
+        import json
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    
+    def test_ndjson_export_streams_all_incidents(self):
+        """Test that every incident is exported as one JSON line."""
+        response = self.client.get('/api/incidents/export/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        
+        rows = self._ndjson(response)
+        self.assertEqual([row['id'] for row in rows], [self.theft.id, self.fire.id, self.old.id])
+        self.assertEqual(rows[1]['description'], 'Line one\nline two')
+        self.assertNotIn('reporter_device_id_hash', rows[0])
+    
+    def test_export_filters(self):
+        """Test filtering by time range, category and bounding box."""
+        response = self.client.get('/api/incidents/export/', {'since': '2021-01-01'})
+        self.assertEqual([row['id'] for row in self._ndjson(response)], [self.theft.id, self.fire.id])
+        
+        response = self.client.get('/api/incidents/export/', {'until': '2021-01-01'})
+        self.assertEqual([row['id'] for row in self._ndjson(response)], [self.old.id])
+        
+        response = self.client.get('/api/incidents/export/', {'category': 'fire,lighting'})
+        self.assertEqual([row['id'] for row in self._ndjson(response)], [self.fire.id])
+        
+        response = self.client.get('/api/incidents/export/', {'bbox': '37,-123,38,-122'})
+        self.assertEqual([row['id'] for row in self._ndjson(response)], [self.theft.id, self.old.id])
+    
+    def test_csv_export(self):
+        """Test that CSV exports have a header and quote multi-line fields."""
+        import csv
+        import io
+        
+        response = self.client.get('/api/incidents/export/', {'format': 'csv'})
+        
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1]['description'], 'Line one\nline two')
+        self.assertEqual(rows[0]['category'], 'theft')
+    
+    def test_csv_export_escapes_formulas(self):
+        """Test that text cells starting with a formula character are quoted."""
+        import csv
+        import io
+        
+        Incident.objects.filter(id=self.theft.id).update(title='=HYPERLINK("http://x")', description='@SUM(A1)')
+        Incident.objects.filter(id=self.fire.id).update(title='-5 degrees', description='+1 witness')
+        
+        response = self.client.get('/api/incidents/export/', {'format': 'csv'})
+        
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0]['title'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(rows[0]['description'], "'@SUM(A1)")
+        self.assertEqual(rows[1]['title'], "'-5 degrees")
+        self.assertEqual(rows[1]['description'], "'+1 witness")
+        self.assertEqual(rows[2]['latitude'], str(self.old.latitude))
+    
+    def test_invalid_parameters_rejected(self):
+        """Test that bad formats, dates and bounding boxes return 400."""
+        for params in [{'format': 'xml'}, {'since': 'yesterday'}, {'bbox': '1,2,3'}, {'bbox': '5,0,1,1'}]:
+            response = self.client.get('/api/incidents/export/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    @override_settings(DEBUG=False, AUTH0_DOMAIN='example.auth0.com')
+    def test_export_requires_admin(self):
+        """Test that only administrators can export outside development."""
+        from django.contrib.auth.models import User
+        
+        response = self.client.get('/api/incidents/export/')
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+        
+        user = User.objects.create_user('analyst', password='secret')
+        self.client.force_login(user)
+        response = self.client.get('/api/incidents/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        user.is_staff = True
+        user.save()
+        response = self.client.get('/api/incidents/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_export_command(self):
+        """Test the export_incidents management command."""
+        import io
+        from django.core.management import call_command
+        
+        out = io.StringIO()
+        call_command('export_incidents', category=['theft'], since='2021-01-01', stdout=out)
+        
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn(f'"id": {self.theft.id}', lines[0])
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='')
+class IncidentClusterTestCase(TestCase):
+    """Test the clustered incidents endpoint."""
+    
+    def setUp(self):
+        reset_incident_cluster_index()
+        self.client = APIClient()
+        # Three incidents in central Accra, one in Kumasi
+        self.accra = [
+            self._create('theft', 5.5600, -0.2050),
+            self._create('theft', 5.5610, -0.2040),
+            self._create('assault', 5.5620, -0.2060),
+        ]
+        self.kumasi = self._create('harassment', 6.6885, -1.6244)
+        self.bbox = '4.5,-3.0,11.0,1.5'
+    
+    def tearDown(self):
+        reset_incident_cluster_index()
+    
+    def _create(self, category, latitude, longitude):
+        return Incident.objects.create(
+            category=category,
+            latitude=latitude,
+            longitude=longitude,
+            title=f'{category} report',
+        )
+    
+    def test_low_zoom_groups_nearby_incidents(self):
+        """Test that nearby incidents form one cluster with counts by category."""
+        response = self.client.get('/api/incidents/clusters/', {'bbox': self.bbox, 'zoom': 8})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        clusters = sorted(response.data['clusters'], key=lambda c: -c['count'])
+        self.assertEqual(len(clusters), 2)
+        self.assertEqual(clusters[0]['count'], 3)
+        self.assertEqual(clusters[0]['categories'], {'theft': 2, 'assault': 1})
+        self.assertAlmostEqual(clusters[0]['latitude'], 5.561, places=3)
+        self.assertEqual(clusters[0]['bounds'], [5.5600, -0.2060, 5.5620, -0.2040])
+        self.assertEqual(clusters[1]['incident_id'], self.kumasi.id)
+        self.assertTrue(clusters[0]['id'].startswith('8/'))
+    
+    def test_high_zoom_splits_clusters_hierarchically(self):
+        """Test that clusters split at higher zooms into cells nested in the parent."""
+        index = get_incident_cluster_index()
+        parent = index.clusters((5.0, -1.0, 6.0, 0.0), 8)[0]
+        children = index.clusters((5.0, -1.0, 6.0, 0.0), 16)
+        
+        self.assertEqual(len(children), 3)
+        _, parent_x, parent_y = (int(part) for part in parent['id'].split('/'))
+        for child in children:
+            _, x, y = (int(part) for part in child['id'].split('/'))
+            self.assertEqual((x >> 8, y >> 8), (parent_x, parent_y))
+    
+    def test_window_limit_and_new_incidents(self):
+        """Test the recent window, the result cap and incremental updates."""
+        Incident.objects.filter(pk=self.kumasi.pk).update(timestamp=timezone.now() - timedelta(days=30))
+        response = self.client.get('/api/incidents/clusters/', {'bbox': self.bbox, 'zoom': 16})
+        self.assertEqual(response.data['count'], 3)
+        
+        with override_settings(CLUSTER_MAX_RESULTS=2):
+            response = self.client.get('/api/incidents/clusters/', {'bbox': self.bbox, 'zoom': 16})
+        self.assertEqual(response.data['count'], 2)
+        self.assertTrue(response.data['truncated'])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create('theft', 10.0, 1.0)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/incidents/clusters/', {'bbox': self.bbox, 'zoom': 16})
+        self.assertEqual(response.data['count'], 4)
+    
+    def test_bulk_created_incidents_update_index(self):
+        """Test that the bulk endpoint adds its incidents to a built index."""
+        get_incident_cluster_index()
+        items = [
+            {'category': 'theft', 'latitude': 10.0, 'longitude': 1.0, 'title': 'First'},
+            {'category': 'fire', 'latitude': 10.5, 'longitude': 1.2, 'title': 'Second'},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/incidents/bulk/', items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/incidents/clusters/', {'bbox': self.bbox, 'zoom': 16})
+        self.assertEqual(response.data['count'], 6)
+    
+    def test_invalid_parameters(self):
+        """Test that missing or malformed parameters are rejected."""
+        for params in [{'zoom': 5}, {'bbox': self.bbox, 'zoom': 'x'}, {'bbox': '1,2,3', 'zoom': 5}]:
+            response = self.client.get('/api/incidents/clusters/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='', INCIDENT_ROLLUP_PRECISION=6)
+class IncidentRollupTestCase(TestCase):
+    """Test the incrementally maintained incident rollups and their endpoints."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now().replace(minute=30, second=0, microsecond=0)
+    
+    def _create(self, category, latitude=5.5600, longitude=-0.2050, hours_ago=0):
+        incident = Incident.objects.create(
+            category=category,
+            latitude=latitude,
+            longitude=longitude,
+            title=f'{category} report',
+        )
+        timestamp = self.now - timedelta(hours=hours_ago)
+        Incident.objects.filter(pk=incident.pk).update(timestamp=timestamp)
+        incident.timestamp = timestamp
+        return incident
+    
+    def _rollup_counts(self):
+        return sorted(
+            (rollup.category, rollup.hour, rollup.count)
+            for rollup in IncidentRollup.objects.all()
+        )
+    
+    def test_rollups_follow_creates_and_deletes(self):
+        """Test that creates and deletes in one transaction are applied together."""
+        with self.captureOnCommitCallbacks(execute=True):
+            Incident.objects.create(category='theft', latitude=5.56, longitude=-0.205, title='A')
+            Incident.objects.create(category='theft', latitude=5.56, longitude=-0.205, title='B')
+            assault = Incident.objects.create(category='assault', latitude=5.56, longitude=-0.205, title='C')
+        
+        self.assertEqual(
+            {rollup.category: rollup.count for rollup in IncidentRollup.objects.all()},
+            {'theft': 2, 'assault': 1},
+        )
+        rollup = IncidentRollup.objects.get(category='theft')
+        self.assertEqual(len(rollup.geohash), 6)
+        self.assertEqual(rollup.hour.minute, 0)
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            assault.delete()
+            Incident.objects.filter(category='theft').delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(IncidentRollup.objects.exists())
+    
+    def test_rolled_back_savepoint_drops_its_deltas(self):
+        """Test that incidents created in a rolled-back savepoint are not counted."""
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Incident.objects.create(category='theft', latitude=5.56, longitude=-0.205, title='A')
+                try:
+                    with transaction.atomic():
+                        Incident.objects.create(category='theft', latitude=5.56, longitude=-0.205, title='B')
+                        Incident.objects.create(category='fire', latitude=5.56, longitude=-0.205, title='C')
+                        raise ValueError
+                except ValueError:
+                    pass
+                with transaction.atomic():
+                    Incident.objects.create(category='assault', latitude=5.56, longitude=-0.205, title='D')
+        
+        self.assertEqual(
+            {rollup.category: rollup.count for rollup in IncidentRollup.objects.all()},
+            {'theft': 1, 'assault': 1},
+        )
+    
+    def test_rebuild_matches_incremental_rollups(self):
+        """Test that a rebuild reproduces the incrementally maintained counts."""
+        with self.captureOnCommitCallbacks(execute=True):
+            for category, hours_ago in [('theft', 0), ('theft', 0), ('theft', 2), ('fire', 30)]:
+                incident = Incident.objects.create(
+                    category=category, latitude=5.56, longitude=-0.205, title=category,
+                )
+                Incident.objects.filter(pk=incident.pk).update(
+                    timestamp=self.now - timedelta(hours=hours_ago)
+                )
+        # The signals counted the creation time; rebuild from the stored timestamps
+        rebuild_rollups()
+        rebuilt = self._rollup_counts()
+        
+        self.assertEqual(sum(count for _, _, count in rebuilt), 4)
+        self.assertEqual(len(rebuilt), 3)
+    
+    def test_bulk_create_updates_rollups(self):
+        """Test that the bulk endpoint counts its incidents without signals."""
+        items = [
+            {'category': 'theft', 'latitude': 5.56, 'longitude': -0.205, 'title': f'Item {i}'}
+            for i in range(3)
+        ]
+        response = self.client.post('/api/incidents/bulk/', items, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IncidentRollup.objects.get().count, 3)
+    
+    def test_stats_and_heatmap_read_only_rollups(self):
+        """Test area and time range statistics and heatmap cells."""
+        self._create('theft', hours_ago=1)
+        self._create('theft', hours_ago=1)
+        self._create('assault', hours_ago=30)
+        self._create('theft', latitude=6.6885, longitude=-1.6244, hours_ago=1)
+        rebuild_rollups()
+        
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/incidents/stats/', {'bbox': '5.0,-1.0,6.0,0.0'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['by_category'], {'assault': 1, 'theft': 2})
+        self.assertEqual(len(response.data['series']), 2)
+        
+        since = (self.now - timedelta(hours=2)).isoformat()
+        response = self.client.get(
+            '/api/incidents/stats/', {'since': since, 'category': 'theft', 'interval': 'hour'}
+        )
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['series'], [{'start': self.now.replace(minute=0) - timedelta(hours=1), 'count': 3}])
+        
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/incidents/heatmap/', {'precision': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cells = response.data['cells']
+        self.assertEqual([cell['count'] for cell in cells], [3, 1])
+        self.assertEqual(len(cells[0]['geohash']), 3)
+        
+        for params in [{'precision': 9}, {'bbox': '1,2'}, {'interval': 'week'}]:
+            url = '/api/incidents/stats/' if 'interval' in params else '/api/incidents/heatmap/'
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(DEBUG=True, AUTH0_DOMAIN='', ROUTE_RISK_HALF_LIFE_HOURS=24)
+class IncidentRouteSafetyTestCase(TestCase):
+    """Test route safety scoring against recent incidents."""
+    
+    def setUp(self):
+        reset_route_index()
+        self.client = APIClient()
+        # An east-west route of two segments of about 1.1 km each
+        self.points = [[5.56, -0.21], [5.56, -0.20], [5.56, -0.19]]
+        self.theft = self._create('theft', 5.5601, -0.2050)
+        self.harassment = self._create('harassment', 5.5596, -0.1950)
+        self.vandalism = self._create('vandalism', 5.5630, -0.1950)
+        self.old = self._create('theft', 5.5600, -0.2040, hours_ago=24 * 30)
+    
+    def tearDown(self):
+        reset_route_index()
+    
+    def _create(self, category, latitude, longitude, hours_ago=0):
+        incident = Incident.objects.create(
+            category=category,
+            latitude=latitude,
+            longitude=longitude,
+            title=f'{category} report',
+        )
+        Incident.objects.filter(pk=incident.pk).update(timestamp=timezone.now() - timedelta(hours=hours_ago))
+        return incident
+    
+    def _score(self, **data):
+        return self.client.post('/api/incidents/route-safety/', {'points': self.points, **data}, format='json')
+    
+    def test_scores_segments_by_severity(self):
+        """Test that incidents in the corridor are assigned to their segment and weighted by severity."""
+        response = self._score()
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([i['id'] for i in response.data['incidents']], [self.theft.id, self.harassment.id])
+        self.assertEqual([i['segment'] for i in response.data['incidents']], [0, 1])
+        self.assertAlmostEqual(response.data['incidents'][0]['distance_m'], 11.1, delta=0.5)
+        segments = response.data['segments']
+        self.assertEqual([s['incident_count'] for s in segments], [1, 1])
+        self.assertAlmostEqual(segments[0]['risk_score'], 3.0, places=2)
+        self.assertAlmostEqual(segments[1]['risk_score'], 2.0, places=2)
+        self.assertAlmostEqual(segments[0]['length_m'], 1108, delta=5)
+        self.assertAlmostEqual(response.data['total_risk'], 5.0, places=2)
+        self.assertEqual(response.data['max_segment_risk'], segments[0]['risk_score'])
+    
+    def test_corridor_and_recency(self):
+        """Test that a wider corridor adds incidents and older incidents count less."""
+        Incident.objects.filter(pk=self.harassment.pk).update(timestamp=timezone.now() - timedelta(hours=24))
+        reset_route_index()
+        
+        response = self._score(corridor_m=500)
+        
+        self.assertEqual(response.data['incident_count'], 3)
+        self.assertEqual(response.data['segments'][1]['incident_count'], 2)
+        # Harassment at one half-life (1.0) plus fresh vandalism (2.0)
+        self.assertAlmostEqual(response.data['segments'][1]['risk_score'], 3.0, places=2)
+    
+    def test_new_and_deleted_incidents_update_index(self):
+        """Test that the index follows creates and deletes without querying the database."""
+        self._score()
+        with self.captureOnCommitCallbacks(execute=True):
+            added = Incident.objects.create(category='fire', latitude=5.5600, longitude=-0.2080, title='fire')
+            self.theft.delete()
+        
+        with self.assertNumQueries(0):
+            response = self._score()
+        self.assertEqual([i['id'] for i in response.data['incidents']], [added.id, self.harassment.id])
+    
+    def test_bulk_created_incidents_update_index(self):
+        """Test that the bulk endpoint adds its incidents to a built index."""
+        self._score()
+        items = [{'category': 'fire', 'latitude': 5.5600, 'longitude': -0.2080, 'title': 'fire'}]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/incidents/bulk/', items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        added_id = response.data['results'][0]['id']
+        
+        with self.assertNumQueries(0):
+            response = self._score()
+        self.assertEqual(
+            [i['id'] for i in response.data['incidents']],
+            [added_id, self.theft.id, self.harassment.id],
+        )
+    
+    @override_settings(DEBUG=False, AUTH0_DOMAIN='example.auth0.com')
+    def test_production_permissions(self):
+        """Test that scoring needs authentication outside development while reads stay open."""
+        response = self._score()
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+        
+        response = self.client.get('/api/incidents/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_encoded_polyline(self):
+        """Test that routes can be sent as encoded polylines."""
+        self.assertEqual(
+            decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@'),
+            [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)],
+        )
+        response = self.client.post(
+            '/api/incidents/route-safety/', {'polyline': '_}|`@n_h@?o}@?o}@'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['segments']), 2)
+        self.assertEqual(response.data['incident_count'], 2)
+    
+    def test_invalid_routes(self):
+        """Test that malformed routes and corridors are rejected."""
+        for data in [
+            {},
+            {'points': [[5.56, -0.21]]},
+            {'points': [[5.56, -0.21], [95, 0]]},
+            {'points': [[5.56], [5.57, -0.2]]},
+            {'polyline': '_p~iF~ps|U_'},
+            {'points': self.points, 'corridor_m': 5000},
+            {'points': self.points, 'corridor_m': 'wide'},
+        ]:
+            response = self.client.post('/api/incidents/route-safety/', data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+        
+        with override_settings(ROUTE_MAX_POINTS=2):
+            response = self._score()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_long_polyline_rejected_while_decoding(self):
+        """Test that decoding stops as soon as a polyline has too many points."""
+        with self.assertRaisesMessage(ValueError, 'at most 2 points'):
+            decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@' + '?' * 100000, max_points=2)
+        
+        with override_settings(ROUTE_MAX_POINTS=2):
+            response = self.client.post(
+                '/api/incidents/route-safety/', {'polyline': '_}|`@n_h@?o}@?o}@'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('at most 2 points', response.data['error'])
+    
+    def test_antimeridian_segments_rejected(self):
+        """Test that a segment wrapping around the antimeridian is rejected explicitly."""
+        response = self.client.post(
+            '/api/incidents/route-safety/', {'points': [[-16.8, 179.9], [-16.8, -179.9]]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('antimeridian', response.data['error'])
+
+
+@override_settings(
+    DEBUG=True,
+    AUTH0_DOMAIN='',
+    RISK_GRID_CELL_SIZE=0.01,
+    RISK_GRID_HALF_LIFE_HOURS=24,
+    RISK_GRID_CONFIRMATION_WEIGHT=0.5,
+)
+class IncidentRiskGridTestCase(TestCase):
+    """Test the decayed area risk grid and its endpoint."""
+    
+    def setUp(self):
+        reset_risk_grid()
+        self.client = APIClient()
+        self.theft = self._create('theft', 5.5651, -0.2051)
+        self._create('harassment', 5.5655, -0.2055, hours_ago=24)
+        self._create('fire', 6.6885, -1.6244)
+        self._create('theft', 5.5651, -0.2051, hours_ago=24 * 60)
+    
+    def tearDown(self):
+        reset_risk_grid()
+    
+    def _create(self, category, latitude, longitude, hours_ago=0):
+        incident = Incident.objects.create(
+            category=category,
+            latitude=latitude,
+            longitude=longitude,
+            title=f'{category} report',
+        )
+        Incident.objects.filter(pk=incident.pk).update(timestamp=timezone.now() - timedelta(hours=hours_ago))
+        return incident
+    
+    def _risk(self, **params):
+        return self.client.get('/api/incidents/risk/', params)
+    
+    def test_point_risk_decays_by_severity_and_age(self):
+        """Test that a cell sums its incidents by severity, halved per half-life."""
+        response = self._risk(latitude=5.565, longitude=-0.205)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Fresh theft (3.0) plus harassment one half-life old (2.0 / 2)
+        self.assertAlmostEqual(response.data['risk'], 4.0, places=2)
+        self.assertEqual(response.data['cell'], [5.56, -0.21, 5.57, -0.2])
+        
+        response = self._risk(latitude=5.575, longitude=-0.205)
+        self.assertEqual(response.data['risk'], 0)
+    
+    def test_bbox_risk(self):
+        """Test that an area sums the risk of every cell it overlaps."""
+        response = self._risk(bbox='5.505,-0.295,5.595,-0.105')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertAlmostEqual(response.data['risk'], 4.0, places=2)
+        self.assertEqual(response.data['cells'], 10 * 20)
+        
+        response = self._risk(bbox='4.5,-3.0,11.0,1.5')
+        self.assertAlmostEqual(response.data['risk'], 7.0, places=2)
+    
+    def test_incidents_and_confirmations_update_grid(self):
+        """Test that new incidents and confirmations are applied without querying the database."""
+        self._risk(latitude=5.565, longitude=-0.205)
+        with self.captureOnCommitCallbacks(execute=True):
+            Incident.objects.create(category='vandalism', latitude=5.5652, longitude=-0.2052, title='vandalism')
+            IncidentConfirmation.objects.create(incident=self.theft, device_id='device-1')
+        
+        with self.assertNumQueries(0):
+            response = self._risk(latitude=5.565, longitude=-0.205)
+        # Vandalism (2.0) and one confirmation of the theft (3.0 x 0.5)
+        self.assertAlmostEqual(response.data['risk'], 7.5, places=2)
+        
+        reset_risk_grid()
+        response = self._risk(latitude=5.565, longitude=-0.205)
+        self.assertAlmostEqual(response.data['risk'], 7.5, places=2)
+    
+    def test_region_sums_match_cells(self):
+        """Test Fenwick range sums across regions against summing cells directly."""
+        grid = RiskGrid(cell_size=1.0, region_cells=8, half_life_hours=24)
+        now = grid.epoch
+        points = [(lat + 0.5, lon + 0.5) for lat in range(-20, 20, 3) for lon in range(-20, 20, 7)]
+        for index, (latitude, longitude) in enumerate(points):
+            grid.add(latitude, longitude, index + 1, now)
+        
+        for bbox in [(-20, -20, 19, 19), (-4.5, -6.5, 10.5, 3.5), (0, 0, 0.5, 0.5)]:
+            expected = sum(
+                index + 1 for index, (latitude, longitude) in enumerate(points)
+                if bbox[0] // 1 <= latitude // 1 <= bbox[2] // 1 and bbox[1] // 1 <= longitude // 1 <= bbox[3] // 1
+            )
+            risk, _ = grid.bbox_risk(*bbox, now=now)
+            self.assertAlmostEqual(risk, expected, places=6)
+        
+        region = RiskRegion(4)
+        region.add(1, 2, 5.0)
+        region.scale(0.5)
+        self.assertEqual(region.cell(1, 2), 2.5)
+        self.assertEqual(region.range_sum(0, 0, 3, 3), 2.5)
+    
+    def test_invalid_parameters(self):
+        """Test that missing or malformed parameters are rejected."""
+        for params in [{}, {'latitude': 5.5}, {'latitude': 'x', 'longitude': 0}, {'latitude': 95, 'longitude': 0}, {'bbox': '1,2,3'}]:
+            response = self._risk(**params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
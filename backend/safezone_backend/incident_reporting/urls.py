@@ -1,7 +1,26 @@
 from django.urls import path
-from .views import IncidentListCreateView, IncidentRetrieveView
+from .views import (
+    IncidentListCreateView,
+    IncidentRetrieveView,
+    IncidentIngestView,
+    IncidentBulkCreateView,
+    IncidentClusterView,
+    IncidentHeatmapView,
+    IncidentRiskView,
+    IncidentRouteSafetyView,
+    IncidentStatsView,
+    IncidentExportView,
+)
 
 urlpatterns = [
     path('incidents/', IncidentListCreateView.as_view(), name='incident-list-create'),
+    path('incidents/clusters/', IncidentClusterView.as_view(), name='incident-clusters'),
+    path('incidents/stats/', IncidentStatsView.as_view(), name='incident-stats'),
+    path('incidents/heatmap/', IncidentHeatmapView.as_view(), name='incident-heatmap'),
+    path('incidents/route-safety/', IncidentRouteSafetyView.as_view(), name='incident-route-safety'),
+    path('incidents/risk/', IncidentRiskView.as_view(), name='incident-risk'),
+    path('incidents/export/', IncidentExportView.as_view(), name='incident-export'),
+    path('incidents/bulk/', IncidentBulkCreateView.as_view(), name='incident-bulk-create'),
+    path('incidents/ingest/', IncidentIngestView.as_view(), name='incident-ingest'),
     path('incidents/<int:id>/', IncidentRetrieveView.as_view(), name='incident-detail'),
 ]
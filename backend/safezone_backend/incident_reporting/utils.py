@@ -0,0 +1,173 @@
+"""
+Side effects run when a new incident is reported.
+
+Shared by the synchronous DRF create view and the async ingest endpoint.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from alerts.models import Alert
+from .serializers import IncidentSerializer
+
+logger = logging.getLogger(__name__)
+
+INCIDENTS_GROUP = 'incidents'
+
+
+def award_report_points(incident, device_id, device_id_hash):
+    """Award scoring points to the reporter of an incident."""
+    from scoring.models import UserProfile
+
+    try:
+        profile, _ = UserProfile.objects.get_or_create(
+            device_id_hash=device_id_hash,
+            defaults={'device_id': device_id}
+        )
+        scoring_result = profile.add_report_points(incident)
+        logger.info(f"Awarded {scoring_result['points_earned']} points to user for incident {incident.id}")
+    except Exception as e:
+        logger.error(f"Failed to award points for incident {incident.id}: {e}")
+
+
+def process_new_incident(incident, device_id=None, device_id_hash=None):
+    """
+    Run the blocking side effects of a newly reported incident.
+
+    Awards reporter points, generates the alert (including reverse
+    geocoding) and sends push notifications. Failures are logged and never
+    propagate, so they cannot fail the report itself.
+    """
+    # Award scoring points if device_id provided
+    if device_id:
+        award_report_points(incident, device_id, device_id_hash)
+
+    # Generate alert for the reported incident
+    try:
+        Alert.generate_alert_from_incident(incident)
+        logger.info(f"Generated alert for incident {incident.id}")
+    except Exception as e:
+        # Don't fail the request if alert generation fails
+        logger.error(f"Failed to generate alert for incident {incident.id}: {e}")
+
+    # Trigger push notifications to users with matching safe zones
+    try:
+        from push_notifications.utils import send_incident_notifications
+        send_incident_notifications(incident)
+    except Exception as e:
+        # Don't fail the request if notifications fail
+        logger.error(f"Failed to send notifications for incident {incident.id}: {e}")
+
+
+def process_new_incidents(reports):
+    """
+    Run the side effects of a batch of new incidents with grouped queries.
+    
+    Reporter points are awarded with one bulk insert and update, alerts are
+    created with one bulk insert and notifications resolve device tokens for
+    the whole batch at once. Alerts use the incident coordinates as location
+    rather than reverse geocoding every item.
+    
+    Args:
+        reports: List of (incident, device_id) tuples; device_id may be None
+    """
+    from scoring.models import UserProfile
+    from push_notifications.utils import send_bulk_incident_notifications
+    
+    incidents = [incident for incident, _ in reports]
+    
+    try:
+        points = UserProfile.add_bulk_report_points(
+            (device_id, incident) for incident, device_id in reports if device_id
+        )
+        if points:
+            logger.info(f"Awarded {sum(points.values())} points to {len(points)} user(s) for bulk report")
+    except Exception as e:
+        logger.error(f"Failed to award points for bulk report of {len(incidents)} incident(s): {e}")
+    
+    try:
+        Alert.objects.bulk_create([
+            Alert.build_alert_from_incident(incident, geocode=False)
+            for incident in incidents
+        ])
+        logger.info(f"Generated alerts for {len(incidents)} incident(s)")
+    except Exception as e:
+        logger.error(f"Failed to generate alerts for bulk report of {len(incidents)} incident(s): {e}")
+    
+    try:
+        # bulk_create skips the signals that maintain the rollups
+        from .rollups import record_incidents
+        record_incidents(incidents)
+    except Exception as e:
+        logger.error(f"Failed to update rollups for bulk report of {len(incidents)} incident(s): {e}")
+    
+    # bulk_create also skips the signals that feed the cluster and route
+    # indexes and the risk grid
+    from .clustering import peek_incident_cluster_index
+    from .risk_grid import peek_risk_grid
+    from .routes import peek_route_index
+    
+    def add_to_cluster_index():
+        index = peek_incident_cluster_index()
+        if index is not None:
+            for incident in incidents:
+                index.add_incident(incident)
+    
+    transaction.on_commit(add_to_cluster_index)
+    
+    def add_to_route_index():
+        index = peek_route_index()
+        if index is not None:
+            for incident in incidents:
+                index.add_incident(incident)
+    
+    transaction.on_commit(add_to_route_index)
+    
+    def add_to_risk_grid():
+        grid = peek_risk_grid()
+        if grid is not None:
+            for incident in incidents:
+                grid.add_incident(incident)
+    
+    transaction.on_commit(add_to_risk_grid)
+    
+    try:
+        send_bulk_incident_notifications(incidents)
+    except Exception as e:
+        logger.error(f"Failed to send notifications for bulk report of {len(incidents)} incident(s): {e}")
+
+
+def build_incident_event(incident):
+    """Build the channel layer event announcing an incident."""
+    return {
+        'type': 'incident_update',
+        'incident': IncidentSerializer(incident).data,
+    }
+
+
+async def apublish_incident(incident_event):
+    """Publish an incident event to WebSocket subscribers."""
+    channel_layer = get_channel_layer()
+    await channel_layer.group_send(INCIDENTS_GROUP, incident_event)
+
+
+def publish_incident(incident):
+    """Broadcast a new incident via WebSocket from synchronous code."""
+    try:
+        async_to_sync(apublish_incident)(build_incident_event(incident))
+    except Exception as e:
+        # Don't fail the request if WebSocket broadcast fails
+        logger.error(f"Failed to broadcast incident {incident.id} via WebSocket: {e}")
+
+
+def publish_incidents(incidents):
+    """Broadcast a batch of new incidents as a single WebSocket frame."""
+    try:
+        async_to_sync(apublish_incident)({
+            'type': 'incident_bulk_update',
+            'incidents': IncidentSerializer(incidents, many=True).data,
+        })
+    except Exception as e:
+        logger.error(f"Failed to broadcast {len(incidents)} incident(s) via WebSocket: {e}")
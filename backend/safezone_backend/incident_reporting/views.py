@@ -1,21 +1,39 @@
 from rest_framework import generics, status
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils.decorators import method_decorator
+from django.views import View
 from django.views.decorators.csrf import csrf_exempt
+from authentication.auth0 import Auth0Authentication
+from authentication.permissions import DevAllowAnyAdminMixin, DevAllowAnyMixin
+from scoring.models import hash_device_id
+from . import exports, rollups, routes
+from .clustering import get_incident_cluster_index
 from .models import Incident
+from .risk_grid import get_risk_grid
+from .routes import get_route_index
 from .serializers import IncidentSerializer, IncidentCreateSerializer
-from alerts.models import Alert
+from .utils import (
+    apublish_incident,
+    build_incident_event,
+    process_new_incident,
+    process_new_incidents,
+    publish_incident,
+    publish_incidents,
+)
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class IncidentListCreateView(generics.ListCreateAPIView):
+class IncidentListCreateView(DevAllowAnyMixin, generics.ListCreateAPIView):
     """
     List all incidents or create a new incident.
     
@@ -24,14 +42,6 @@ class IncidentListCreateView(generics.ListCreateAPIView):
     """
     queryset = Incident.objects.all().order_by('-timestamp')
     
-    def get_permissions(self):
-        """
-        Use AllowAny in development without Auth0, otherwise require auth for writes.
-        """
-        if settings.DEBUG and not settings.AUTH0_DOMAIN:
-            return [AllowAny()]
-        return [IsAuthenticatedOrReadOnly()]
-    
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return IncidentCreateSerializer
@@ -60,59 +70,404 @@ class IncidentListCreateView(generics.ListCreateAPIView):
         device_id = serializer.validated_data.pop('device_id', None)
         
         # Calculate and save the reporter's device_id_hash
-        device_id_hash = None
-        if device_id:
-            from scoring.models import hash_device_id, UserProfile
-            device_id_hash = hash_device_id(device_id)
+        device_id_hash = hash_device_id(device_id) if device_id else None
         
         # Save the incident with reporter tracking
         incident = serializer.save(reporter_device_id_hash=device_id_hash)
         
-        # Award scoring points if device_id provided
-        if device_id:
-            try:
-                profile, _ = UserProfile.objects.get_or_create(
-                    device_id_hash=device_id_hash,
-                    defaults={'device_id': device_id}
-                )
-                scoring_result = profile.add_report_points(incident)
-                logger.info(f"Awarded {scoring_result['points_earned']} points to user for incident {incident.id}")
-            except Exception as e:
-                logger.error(f"Failed to award points for incident {incident.id}: {e}")
-        
-        # Generate alert for the reported incident
+        # Award points, generate the alert and notify matching safe zones
+        process_new_incident(incident, device_id, device_id_hash)
+        
+        # Broadcast the new incident via WebSocket
+        publish_incident(incident)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class IncidentBulkCreateView(DevAllowAnyMixin, generics.GenericAPIView):
+    """
+    Create many incidents in one request.
+    
+    POST: Accepts a list of incident reports (up to INCIDENT_BULK_MAX_ITEMS).
+    Valid items are inserted together and invalid items are reported by
+    index, so one bad item does not reject the whole batch. Scoring, alert
+    generation and notifications run once for the batch and subscribers
+    receive a single WebSocket frame.
+    """
+    serializer_class = IncidentCreateSerializer
+    
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Request body must be a non-empty list of incidents'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        max_items = getattr(settings, 'INCIDENT_BULK_MAX_ITEMS', 500)
+        if len(items) > max_items:
+            return Response(
+                {'error': f'At most {max_items} incidents can be submitted per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = self.get_serializer(data=items, many=True)
+        if serializer.is_valid():
+            errors = [{}] * len(items)
+            validated = list(serializer.validated_data)
+        else:
+            # A list serializer drops all data on any error; revalidate the valid items
+            errors = serializer.errors
+            validated = [
+                serializer.child.run_validation(item) if not item_errors else None
+                for item, item_errors in zip(items, errors)
+            ]
+        
+        reports = []
+        for data in validated:
+            if data is None:
+                continue
+            data = dict(data)
+            device_id = data.pop('device_id', None)
+            incident = Incident(
+                reporter_device_id_hash=hash_device_id(device_id) if device_id else None,
+                **data
+            )
+            reports.append((incident, device_id))
+        
+        if reports:
+            Incident.objects.bulk_create([incident for incident, _ in reports])
+            process_new_incidents(reports)
+            publish_incidents([incident for incident, _ in reports])
+        
+        created = iter(reports)
+        results = []
+        for index, item_errors in enumerate(errors):
+            if item_errors:
+                results.append({'index': index, 'status': 'invalid', 'errors': item_errors})
+            else:
+                incident, _ = next(created)
+                results.append({'index': index, 'status': 'created', 'id': incident.id})
+        
+        return Response(
+            {
+                'created': len(reports),
+                'failed': len(items) - len(reports),
+                'results': results,
+            },
+            status=status.HTTP_201_CREATED if reports else status.HTTP_400_BAD_REQUEST
+        )
+
+
+class IncidentClusterView(DevAllowAnyMixin, generics.GenericAPIView):
+    """
+    Cluster recent incidents for the map at a zoom level.
+    
+    GET: Returns the clusters of incidents reported in the last
+    CLUSTER_WINDOW_HOURS inside a bounding box. Query parameters:
+    - bbox (required): min_lat,min_lon,max_lat,max_lon of the visible map
+    - zoom (required): Map zoom level (0 and up)
+    
+    Each cluster has an id (zoom/x/y), centroid, count, counts by category
+    and the bounds of its incidents; single-incident clusters also carry
+    incident_id. At most CLUSTER_MAX_RESULTS clusters are returned, largest
+    first, with truncated set when some were left out.
+    """
+    
+    def get(self, request):
+        params = request.query_params
+        if 'bbox' not in params or 'zoom' not in params:
+            return Response(
+                {'error': 'bbox and zoom are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         try:
-            Alert.generate_alert_from_incident(incident)
-            logger.info(f"Generated alert for incident {incident.id}")
-        except Exception as e:
-            # Don't fail the request if alert generation fails
-            logger.error(f"Failed to generate alert for incident {incident.id}: {e}")
+            bbox = exports.parse_bbox(params['bbox'])
+            zoom = int(params['zoom'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if zoom < 0:
+            return Response({'error': 'zoom must not be negative'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Trigger push notifications to users with matching safe zones
+        limit = getattr(settings, 'CLUSTER_MAX_RESULTS', 1000)
+        # Fetch one extra cluster to tell whether any were left out
+        clusters = get_incident_cluster_index().clusters(bbox, zoom, limit=limit + 1)
+        
+        return Response({
+            'zoom': zoom,
+            'count': min(len(clusters), limit),
+            'truncated': len(clusters) > limit,
+            'clusters': clusters[:limit],
+        })
+
+
+class IncidentStatsView(DevAllowAnyMixin, generics.GenericAPIView):
+    """
+    Incident statistics for an area and time range, read from the rollups.
+    
+    GET: Returns the total, counts by category and a time series. Query
+    parameters (all optional):
+    - since, until: ISO 8601 date or datetime bounds, at hour resolution
+    - category: Comma-separated categories
+    - bbox: min_lat,min_lon,max_lat,max_lon
+    - interval: hour or day (default) buckets for the series
+    """
+    
+    def get_rollups(self, params):
+        """Build the rollup queryset for the request filters."""
+        return rollups.filter_rollups(
+            since=exports.parse_timestamp(params['since']) if params.get('since') else None,
+            until=exports.parse_timestamp(params['until']) if params.get('until') else None,
+            categories=[c for c in params.get('category', '').split(',') if c],
+            bbox=exports.parse_bbox(params['bbox']) if params.get('bbox') else None,
+        )
+    
+    def get(self, request):
+        params = request.query_params
+        interval = params.get('interval', 'day')
+        if interval not in ('hour', 'day'):
+            return Response({'error': 'interval must be hour or day'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            from push_notifications.utils import send_incident_notifications
-            send_incident_notifications(incident)
-        except Exception as e:
-            # Don't fail the request if notifications fail
-            logger.error(f"Failed to send notifications for incident {incident.id}: {e}")
+            queryset = self.get_rollups(params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Broadcast the new incident via WebSocket
+        return Response(rollups.incident_stats(queryset, interval))
+
+
+class IncidentHeatmapView(IncidentStatsView):
+    """
+    Incident heatmap grid for an area and time range, read from the rollups.
+    
+    GET: Returns geohash cells with their centre and incident count,
+    busiest first. Accepts the filters of the statistics endpoint plus:
+    - precision: Geohash length of the cells, 1 to INCIDENT_ROLLUP_PRECISION
+      (default: INCIDENT_ROLLUP_PRECISION)
+    At most INCIDENT_HEATMAP_MAX_CELLS cells are returned.
+    """
+    
+    def get(self, request):
+        params = request.query_params
+        max_precision = rollups.rollup_precision()
+        try:
+            precision = int(params.get('precision', max_precision))
+            queryset = self.get_rollups(params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= precision <= max_precision:
+            return Response(
+                {'error': f'precision must be between 1 and {max_precision}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        limit = getattr(settings, 'INCIDENT_HEATMAP_MAX_CELLS', 5000)
+        cells = rollups.incident_heatmap(queryset, precision, limit)
+        return Response({
+            'precision': precision,
+            'count': len(cells),
+            'cells': cells,
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class IncidentRouteSafetyView(DevAllowAnyMixin, generics.GenericAPIView):
+    """
+    Score a route by the recent incidents along it.
+    
+    POST: Accepts a route as either points, a list of [latitude, longitude]
+    pairs, or polyline, a Google encoded polyline (up to ROUTE_MAX_POINTS
+    points), and an optional corridor_m (default ROUTE_CORRIDOR_METERS, at
+    most ROUTE_MAX_CORRIDOR_METERS). Returns the incidents reported in the
+    last ROUTE_RISK_WINDOW_HOURS within the corridor, each assigned to its
+    closest segment, and a risk score per segment weighted by alert
+    severity and decayed by age (see routes.score_route).
+    """
+    
+    def post(self, request):
+        data = request.data
+        if not isinstance(data, dict):
+            return Response({'error': 'Request body must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+    
+        max_corridor = getattr(settings, 'ROUTE_MAX_CORRIDOR_METERS', 1000)
         try:
-            channel_layer = get_channel_layer()
-            incident_data = IncidentSerializer(incident).data
-            async_to_sync(channel_layer.group_send)(
-                'incidents',
-                {
-                    'type': 'incident_update',
-                    'incident': incident_data
-                }
+            points = routes.parse_route_points(data, getattr(settings, 'ROUTE_MAX_POINTS', 5000))
+            corridor = float(data.get('corridor_m', getattr(settings, 'ROUTE_CORRIDOR_METERS', 100)))
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < corridor <= max_corridor:
+            return Response(
+                {'error': f'corridor_m must be greater than 0 and at most {max_corridor}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+    
+        result = routes.score_route(get_route_index().grid, points, corridor)
+        result['corridor_m'] = corridor
+        return Response(result)
+
+
+class IncidentRiskView(DevAllowAnyMixin, generics.GenericAPIView):
+    """
+    Current incident risk from the precomputed area risk grid.
+    
+    GET: Returns the decayed risk of the grid cell containing a point, or
+    the total and mean cell risk of an area. Query parameters (one of):
+    - latitude, longitude: Point to look up
+    - bbox: min_lat,min_lon,max_lat,max_lon of the area
+    
+    Risk is the sum over incidents in the cell(s) of severity weight x
+    confirmation bonus, halved every RISK_GRID_HALF_LIFE_HOURS (see
+    risk_grid). Lookups do not query the database.
+    """
+    
+    def get(self, request):
+        params = request.query_params
+        try:
+            if params.get('bbox'):
+                bbox = exports.parse_bbox(params['bbox'])
+                return Response({'bbox': list(bbox), **get_risk_grid().area(bbox)})
+            if 'latitude' in params and 'longitude' in params:
+                latitude = float(params['latitude'])
+                longitude = float(params['longitude'])
+                if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                    raise ValueError('latitude and longitude must be valid coordinates')
+                return Response({
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    **get_risk_grid().point(latitude, longitude),
+                })
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(
+            {'error': 'latitude and longitude, or bbox, are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+class IncidentExportView(DevAllowAnyAdminMixin, generics.GenericAPIView):
+    """
+    Stream incidents for analytics (admin only).
+    
+    GET: Streams all matching incidents as NDJSON (default) or CSV with
+    constant memory. Query parameters:
+    - format: ndjson or csv
+    - since, until: ISO 8601 date or datetime bounds on the report time
+    - category: Comma-separated categories
+    - bbox: min_lat,min_lon,max_lat,max_lon
+    """
+    authentication_classes = [Auth0Authentication, SessionAuthentication]
+    
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= selects the export format, not a DRF renderer
+        return super().perform_content_negotiation(request, force=True)
+    
+    def get(self, request):
+        params = request.query_params
+        export_format = params.get('format', 'ndjson')
+        
+        try:
+            lines = exports.export_incidents(
+                export_format,
+                since=exports.parse_timestamp(params['since']) if params.get('since') else None,
+                until=exports.parse_timestamp(params['until']) if params.get('until') else None,
+                categories=[c for c in params.get('category', '').split(',') if c],
+                bbox=exports.parse_bbox(params['bbox']) if params.get('bbox') else None,
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        content = exports.batch_lines(lines)
+        if isinstance(request._request, ASGIRequest):
+            # Daphne would otherwise buffer the whole synchronous iterator
+            content = exports.aiterate(content)
+        
+        response = StreamingHttpResponse(
+            content,
+            content_type=exports.EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="incidents.{export_format}"'
+        return response
+
+
+class IncidentIngestView(View):
+    """
+    Async endpoint for submitting incident reports.
+    
+    POST: Creates a new incident report, like POST /api/incidents/, without
+    holding an ASGI worker thread for the duration of the request. The
+    incident is inserted with the async ORM, blocking side effects (scoring,
+    alert geocoding, push notifications) run in a worker thread pool and the
+    WebSocket broadcast is awaited directly on the event loop.
+    """
+    http_method_names = ['post', 'options']
+    
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token authenticated like the DRF views; csrf_exempt() cannot wrap async views in Django 4.2
+        view.csrf_exempt = True
+        return view
+    
+    @staticmethod
+    def authenticate(request):
+        """
+        Apply the same rules as DevAllowAnyMixin.
+        
+        Returns:
+            None if the request may proceed, otherwise an error message
+        """
+        if settings.DEBUG and not settings.AUTH0_DOMAIN:
+            return None
+        
+        try:
+            result = Auth0Authentication().authenticate(request)
+        except AuthenticationFailed as e:
+            return str(e.detail)
+        if result is None:
+            return 'Authentication credentials were not provided.'
+        return None
+    
+    async def post(self, request):
+        auth_error = await sync_to_async(self.authenticate)(request)
+        if auth_error:
+            return JsonResponse({'detail': auth_error}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        try:
+            payload = json.loads(request.body or b'{}')
+        except (ValueError, UnicodeDecodeError):
+            return JsonResponse(
+                {'error': 'Request body must be valid JSON'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        # Field validation is CPU-only and safe to run on the event loop
+        serializer = IncidentCreateSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        validated_data = dict(serializer.validated_data)
+        device_id = validated_data.pop('device_id', None)
+        device_id_hash = hash_device_id(device_id) if device_id else None
+        
+        incident = await Incident.objects.acreate(
+            reporter_device_id_hash=device_id_hash,
+            **validated_data,
+        )
+        
+        # Scoring, geocoding and FCM calls block; keep them off the event loop
+        await sync_to_async(process_new_incident, thread_sensitive=False)(
+            incident, device_id, device_id_hash,
+        )
+        
+        incident_event = build_incident_event(incident)
+        try:
+            await apublish_incident(incident_event)
         except Exception as e:
-            # Don't fail the request if WebSocket broadcast fails
             logger.error(f"Failed to broadcast incident {incident.id} via WebSocket: {e}")
+        
+        return JsonResponse(incident_event['incident'], status=status.HTTP_201_CREATED)
 
 
-class IncidentRetrieveView(generics.RetrieveAPIView):
+class IncidentRetrieveView(DevAllowAnyMixin, generics.RetrieveAPIView):
     """
     Retrieve a specific incident by ID.
     
@@ -121,13 +476,3 @@ class IncidentRetrieveView(generics.RetrieveAPIView):
     queryset = Incident.objects.all()
     serializer_class = IncidentSerializer
     lookup_field = 'id'
-    
-    def get_permissions(self):
-        """
-        Use AllowAny in development without Auth0, otherwise require auth for writes.
-        """
-        if settings.DEBUG and not settings.AUTH0_DOMAIN:
-            return [AllowAny()]
-        return [AllowAny()] # TODO: Change to IsAuthenticatedOrReadOnly() after testing
-
-
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import NotificationLog
+from .models import NotificationLog, TopicSubscription
 
 
 @admin.register(NotificationLog)
@@ -16,3 +16,16 @@ class NotificationLogAdmin(admin.ModelAdmin):
     search_fields = ['device_id', 'incident__title']
     readonly_fields = ['sent_at']
 
+
+
+@admin.register(TopicSubscription)
+class TopicSubscriptionAdmin(admin.ModelAdmin):
+    """Admin configuration for TopicSubscription model."""
+    
+    list_display = [
+        'topic',
+        'device_id_hash',
+        'created_at',
+    ]
+    search_fields = ['topic', 'device_id_hash']
+    readonly_fields = ['created_at']
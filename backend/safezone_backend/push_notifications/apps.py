@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PushNotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'push_notifications'
+
+    def ready(self):
+        # Keep the safe zone index in sync with SafeZone changes
+        from . import signals  # noqa: F401
@@ -0,0 +1,42 @@
+"""
+Django management command to resync geohash cell topic subscriptions.
+
+Subscriptions are not updated when zones, devices or preferences are
+saved, so run this periodically (e.g. every few minutes from cron) when
+NOTIFICATION_TOPICS_ENABLED is set. FCM calls are batched per topic.
+
+Usage:
+    python manage.py sync_notification_topics
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from user_settings.models import SafeZone
+from push_notifications.models import TopicSubscription
+from push_notifications.topics import sync_topics
+
+
+class Command(BaseCommand):
+    help = 'Subscribe every device to the cell topics covering its safe zones'
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'NOTIFICATION_TOPICS_ENABLED', False):
+            self.stdout.write(self.style.WARNING('NOTIFICATION_TOPICS_ENABLED is off; nothing to sync'))
+            return
+
+        device_id_hashes = set(
+            SafeZone.objects.values_list('device_id_hash', flat=True)
+        ) | set(
+            TopicSubscription.objects.values_list('device_id_hash', flat=True)
+        )
+        device_id_hashes.discard('')
+
+        self.stdout.write(f'Syncing topic subscriptions for {len(device_id_hashes)} device(s)...')
+
+        result = sync_topics(device_id_hashes)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {result['subscribed']} subscription(s) added, {result['unsubscribed']} removed"
+            )
+        )
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-19 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('push_notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id_hash', models.CharField(db_index=True, max_length=64)),
+                ('topic', models.CharField(max_length=100)),
+                ('token_hash', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['topic'],
+                'unique_together': {('device_id_hash', 'topic')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-19 12:00
+
+from django.db import migrations
+
+
+def partition_notification_log(apps, schema_editor):
+    """Partition notification logs by month when enabled on PostgreSQL."""
+    from safezone_backend import partitioning
+
+    connection = schema_editor.connection
+    if not partitioning.partitioning_enabled(connection):
+        return
+
+    table = apps.get_model('push_notifications', 'NotificationLog')._meta.db_table
+    if not partitioning.is_partitioned(table, connection):
+        partitioning.partition_table(table, 'sent_at', connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('push_notifications', '0002_topicsubscription'),
+    ]
+
+    operations = [
+        # The partitioned table has the same columns, so there is nothing to undo
+        migrations.RunPython(partition_notification_log, migrations.RunPython.noop),
+    ]
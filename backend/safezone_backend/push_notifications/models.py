@@ -21,3 +21,20 @@ class NotificationLog(models.Model):
     def __str__(self):
         return f"Notification for incident {self.incident_id} to {self.device_id}"
 
+
+
+class TopicSubscription(models.Model):
+    """Model to track which geohash cell topics a device is subscribed to."""
+    
+    device_id_hash = models.CharField(max_length=64, db_index=True)
+    topic = models.CharField(max_length=100)
+    # Hash of the FCM token that was subscribed, to resubscribe after token rotation
+    token_hash = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['topic']
+        unique_together = ['device_id_hash', 'topic']
+
+    def __str__(self):
+        return f"Subscription to {self.topic} (hash: {self.device_id_hash[:8]}...)"
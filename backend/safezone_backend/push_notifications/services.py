@@ -3,12 +3,83 @@ Firebase Cloud Messaging service for sending push notifications.
 """
 import os
 import logging
+import threading
+import time
+from collections import Counter
 from typing import List, Optional
 import firebase_admin
-from firebase_admin import credentials, messaging
+from django.conf import settings
+from django.utils.module_loading import import_string
+from firebase_admin import credentials, exceptions, messaging
 
 logger = logging.getLogger(__name__)
 
+# Delivery error classes derived from FCM error codes
+ERROR_UNREGISTERED = 'unregistered'
+ERROR_INVALID_ARGUMENT = 'invalid_argument'
+ERROR_QUOTA = 'quota'
+ERROR_TRANSIENT = 'transient'
+ERROR_OTHER = 'other'
+
+# Tokens failing with these errors will never succeed and should be deactivated
+DEAD_TOKEN_ERRORS = {ERROR_UNREGISTERED, ERROR_INVALID_ARGUMENT}
+# Sends failing with these errors are retried with exponential backoff
+RETRYABLE_ERRORS = {ERROR_QUOTA, ERROR_TRANSIENT}
+
+
+def classify_send_error(error):
+    """
+    Classify an exception raised by messaging.send() by its FCM error code.
+    
+    Args:
+        error: Exception raised while sending a message
+        
+    Returns:
+        One of the ERROR_* constants
+    """
+    if isinstance(error, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+        return ERROR_UNREGISTERED
+    if isinstance(error, exceptions.InvalidArgumentError):
+        return ERROR_INVALID_ARGUMENT
+    if isinstance(error, (messaging.QuotaExceededError, exceptions.ResourceExhaustedError)):
+        return ERROR_QUOTA
+    if isinstance(error, (
+        exceptions.UnavailableError,
+        exceptions.InternalError,
+        exceptions.DeadlineExceededError,
+        exceptions.UnknownError,
+        ConnectionError,
+        TimeoutError,
+    )):
+        return ERROR_TRANSIENT
+    return ERROR_OTHER
+
+
+class DeliveryStats:
+    """Thread-safe counters describing push notification delivery."""
+    
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+    
+    def increment(self, name, amount=1):
+        if amount:
+            with self._lock:
+                self._counts[name] += amount
+    
+    def snapshot(self):
+        """Return a copy of all counters."""
+        with self._lock:
+            return dict(self._counts)
+    
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+# Per-worker delivery counters (sends, retries, failures by class, pruned tokens)
+delivery_stats = DeliveryStats()
+
 
 class FirebaseMessagingService:
     """Service for sending push notifications via Firebase Cloud Messaging."""
@@ -43,6 +114,7 @@ class FirebaseMessagingService:
         cls,
         fcm_tokens: List[str],
         incident_data: dict,
+        retry_budget: Optional[float] = None,
     ) -> dict:
         """
         Send incident notification to multiple devices.
@@ -50,9 +122,19 @@ class FirebaseMessagingService:
         Args:
             fcm_tokens: List of FCM registration tokens
             incident_data: Dictionary containing incident details
+            retry_budget: Total seconds this call may spend backing off
+                (default: FCM_RETRY_BUDGET)
             
+        Transient and quota failures are retried with exponential backoff
+        (FCM_MAX_RETRIES, FCM_RETRY_BASE_DELAY, FCM_RETRY_MAX_DELAY). Sends
+        run on the incident request path, so backoff stops once the next
+        delay would exceed the retry budget and the remaining tokens are
+        reported as failed. Failures are classified by FCM error code so
+        callers can prune dead tokens.
+        
         Returns:
-            Dictionary with success count and failed tokens
+            Dictionary with success count, failed tokens, dead tokens
+            (unregistered or invalid) and the error class of each failed token
         """
         if not cls._initialized:
             cls.initialize()
@@ -86,54 +168,118 @@ class FirebaseMessagingService:
         }
         
         success_count = 0
-        failed_tokens = []
-        
-        # Send to each device
-        for token in fcm_tokens:
-            try:
-                message = messaging.Message(
-                    notification=notification,
-                    data=data,
-                    token=token,
-                    android=messaging.AndroidConfig(
-                        priority='high',
-                        notification=messaging.AndroidNotification(
-                            icon='ic_notification',
-                            color='#FF3B30',
-                            sound='default',
-                        ),
-                    ),
-                    apns=messaging.APNSConfig(
-                        payload=messaging.APNSPayload(
-                            aps=messaging.Aps(
-                                sound='default',
-                                badge=1,
-                            ),
-                        ),
-                    ),
+        token_errors = {}
+        
+        max_attempts = 1 + getattr(settings, 'FCM_MAX_RETRIES', 3)
+        base_delay = getattr(settings, 'FCM_RETRY_BASE_DELAY', 0.5)
+        max_delay = getattr(settings, 'FCM_RETRY_MAX_DELAY', 8.0)
+        if retry_budget is None:
+            retry_budget = getattr(settings, 'FCM_RETRY_BUDGET', 1.0)
+        slept = 0.0
+        
+        pending = list(fcm_tokens)
+        for attempt in range(max_attempts):
+            if attempt:
+                # Back off once per round rather than once per token
+                delay = min(base_delay * (2 ** (attempt - 1)), max_delay)
+                if slept + delay > retry_budget:
+                    logger.warning(
+                        f"Retry budget of {retry_budget:.2f}s exhausted; "
+                        f"giving up on {len(pending)} notification(s)"
+                    )
+                    delivery_stats.increment('retry_budget_exhausted', len(pending))
+                    break
+                slept += delay
+                logger.info(
+                    f"Retrying {len(pending)} notification(s) in {delay:.2f}s "
+                    f"(attempt {attempt + 1}/{max_attempts})"
                 )
-                
-                response = messaging.send(message)
-                logger.info(f"Successfully sent notification: {response}")
-                success_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to send notification to {token[:20]}...: {e}")
-                failed_tokens.append(token)
+                delivery_stats.increment('retried', len(pending))
+                time.sleep(delay)
+            
+            retry = []
+            for token in pending:
+                try:
+                    message = cls._build_message(notification, data, token)
+                    response = messaging.send(message)
+                    logger.info(f"Successfully sent notification: {response}")
+                    success_count += 1
+                    token_errors.pop(token, None)
+                    
+                except Exception as e:
+                    error_class = classify_send_error(e)
+                    token_errors[token] = error_class
+                    logger.error(
+                        f"Failed to send notification to {token[:20]}... "
+                        f"({error_class}): {e}"
+                    )
+                    if error_class in RETRYABLE_ERRORS:
+                        retry.append(token)
+            
+            pending = retry
+            if not pending:
+                break
+        
+        failed_tokens = list(token_errors)
+        dead_tokens = [
+            token for token, error_class in token_errors.items()
+            if error_class in DEAD_TOKEN_ERRORS
+        ]
+        error_counts = Counter(token_errors.values())
+        
+        delivery_stats.increment('sent', success_count)
+        for error_class, count in error_counts.items():
+            delivery_stats.increment(f'failed_{error_class}', count)
         
         return {
             'success': success_count,
             'failed': len(failed_tokens),
             'failed_tokens': failed_tokens,
+            'dead_tokens': dead_tokens,
+            'token_errors': token_errors,
+            'error_counts': dict(error_counts),
         }
     
+    @staticmethod
+    def _build_message(notification, data, token):
+        """Build the FCM message sent to a single device."""
+        return messaging.Message(
+            notification=notification,
+            data=data,
+            token=token,
+            android=messaging.AndroidConfig(
+                priority='high',
+                notification=messaging.AndroidNotification(
+                    icon='ic_notification',
+                    color='#FF3B30',
+                    sound='default',
+                ),
+            ),
+            apns=messaging.APNSConfig(
+                payload=messaging.APNSPayload(
+                    aps=messaging.Aps(
+                        sound='default',
+                        badge=1,
+                    ),
+                ),
+            ),
+        )
+    
+    @classmethod
+    def get_delivery_stats(cls) -> dict:
+        """Return this worker's delivery counters."""
+        return delivery_stats.snapshot()
+    
     @classmethod
     def send_to_topic(cls, topic: str, incident_data: dict) -> bool:
         """
-        Send notification to a topic (for future use).
+        Send notification to a topic.
+        
+        Used for broadcast mode, where every device subscribed to a geohash
+        cell topic receives the incident in a single send.
         
         Args:
-            topic: Topic name (e.g., 'incidents_nearby')
+            topic: Topic name (e.g., 'cell_9q8yy')
             incident_data: Dictionary containing incident details
             
         Returns:
@@ -157,6 +303,9 @@ class FirebaseMessagingService:
                 data={
                     'incident_id': str(incident_data.get('id', '')),
                     'category': category,
+                    'latitude': str(incident_data.get('latitude', '')),
+                    'longitude': str(incident_data.get('longitude', '')),
+                    'timestamp': incident_data.get('timestamp', ''),
                     'type': 'incident_alert',
                 },
                 topic=topic,
@@ -164,8 +313,76 @@ class FirebaseMessagingService:
             
             response = messaging.send(message)
             logger.info(f"Successfully sent to topic {topic}: {response}")
+            delivery_stats.increment('topic_sends')
             return True
             
         except Exception as e:
             logger.error(f"Failed to send to topic {topic}: {e}")
+            delivery_stats.increment('failed_topic_sends')
             return False
+    
+    @classmethod
+    def subscribe_to_topic(cls, fcm_tokens: List[str], topic: str) -> List[str]:
+        """
+        Subscribe devices to a topic.
+        
+        Args:
+            fcm_tokens: FCM registration tokens to subscribe
+            topic: Topic name
+            
+        Returns:
+            Tokens that were subscribed successfully
+        """
+        return cls._manage_topic(messaging.subscribe_to_topic, fcm_tokens, topic)
+    
+    @classmethod
+    def unsubscribe_from_topic(cls, fcm_tokens: List[str], topic: str) -> List[str]:
+        """
+        Unsubscribe devices from a topic.
+        
+        Args:
+            fcm_tokens: FCM registration tokens to unsubscribe
+            topic: Topic name
+            
+        Returns:
+            Tokens that were unsubscribed successfully
+        """
+        return cls._manage_topic(messaging.unsubscribe_from_topic, fcm_tokens, topic)
+    
+    @classmethod
+    def _manage_topic(cls, operation, fcm_tokens, topic):
+        """Run a topic management call and return the tokens it succeeded for."""
+        if not cls._initialized:
+            cls.initialize()
+        
+        if not cls._initialized or not fcm_tokens:
+            return []
+        
+        try:
+            response = operation(list(fcm_tokens), topic)
+        except Exception as e:
+            logger.error(f"Topic management for {topic} failed: {e}")
+            return []
+        
+        failed_indexes = {error.index for error in response.errors}
+        for error in response.errors:
+            logger.warning(f"Topic management for {topic} failed for one token: {error.reason}")
+        return [
+            token for index, token in enumerate(fcm_tokens)
+            if index not in failed_indexes
+        ]
+
+
+def get_messaging_service():
+    """
+    Return the messaging service class configured by PUSH_MESSAGING_SERVICE.
+    
+    Defaults to FirebaseMessagingService; tests and offline tooling can point
+    it at push_notifications.testing.FakeMessagingService.
+    """
+    path = getattr(
+        settings,
+        'PUSH_MESSAGING_SERVICE',
+        'push_notifications.services.FirebaseMessagingService',
+    )
+    return import_string(path)
@@ -0,0 +1,36 @@
+"""
+Signal handlers keeping the per-worker safe zone index in sync with user
+settings. Cell topic subscriptions are synced by the
+sync_notification_topics command instead, off the request path.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from user_settings.models import SafeZone
+from .spatial_index import peek_safe_zone_index
+
+
+@receiver(post_save, sender=SafeZone)
+def update_safe_zone_index(sender, instance, **kwargs):
+    """Apply a saved safe zone to the index once the transaction commits."""
+    def apply():
+        index = peek_safe_zone_index()
+        if index is not None:
+            index.update_zone(instance)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=SafeZone)
+def remove_from_safe_zone_index(sender, instance, **kwargs):
+    """Drop a deleted safe zone from the index once the transaction commits."""
+    zone_id = instance.id
+
+    def apply():
+        index = peek_safe_zone_index()
+        if index is not None:
+            index.remove_zone(zone_id)
+
+    transaction.on_commit(apply)
+
@@ -0,0 +1,237 @@
+"""
+In-memory spatial index of active safe zones for notification targeting.
+
+Each worker keeps an inverted index from geohash cells to the safe zones
+whose circle overlaps that cell. Matching an incident is a single cell
+lookup followed by exact distance checks on the few zones in that cell,
+instead of evaluating every safe zone in the database.
+
+Zones whose circle would cover more than SAFE_ZONE_INDEX_MAX_CELLS cells
+(radii past the API limit can still arrive through the admin or bulk
+loads) are kept in a separate list that every match checks directly, so
+one huge zone cannot expand into millions of cells.
+
+The index is rebuilt lazily on first use (and when it is older than
+SAFE_ZONE_INDEX_MAX_AGE seconds, so workers pick up changes made by other
+processes) and updated incrementally from SafeZone save/delete signals.
+"""
+import logging
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from alerts.utils import haversine_distance
+from safezone_backend.geo_utils import (
+    bounding_box,
+    geohash_cell_count,
+    geohash_cells_covering,
+    geohash_encode,
+)
+
+logger = logging.getLogger(__name__)
+
+ZoneEntry = namedtuple(
+    'ZoneEntry',
+    ['zone_id', 'device_id_hash', 'radius', 'latitude', 'longitude'],
+)
+
+
+class SafeZoneIndex:
+    """Inverted index from geohash cells to active safe zones."""
+
+    def __init__(self, precision=None):
+        self.precision = precision or getattr(settings, 'SAFE_ZONE_INDEX_PRECISION', 5)
+        self.max_cells = getattr(settings, 'SAFE_ZONE_INDEX_MAX_CELLS', 1024)
+        self._cells = {}
+        self._zone_cells = {}
+        self._large_zones = {}
+        self._lock = threading.RLock()
+        self.built_at = None
+        self.last_rebuild_seconds = None
+        self.rebuild_count = 0
+        self.incremental_updates = 0
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def is_stale(self):
+        """Check whether the index should be rebuilt from the database."""
+        if not self.is_built:
+            return True
+        max_age = getattr(settings, 'SAFE_ZONE_INDEX_MAX_AGE', 300)
+        return time.monotonic() - self.built_at > max_age
+
+    def rebuild(self):
+        """Rebuild the whole index from active safe zones."""
+        from user_settings.models import SafeZone
+
+        started = time.perf_counter()
+        rows = SafeZone.objects.filter(is_active=True).values_list(
+            'id', 'device_id_hash', 'radius', 'latitude', 'longitude',
+        )
+
+        cells = {}
+        zone_cells = {}
+        large_zones = {}
+        for row in rows.iterator(chunk_size=2000):
+            entry = ZoneEntry(*row)
+            zone_cells[entry.zone_id] = self._insert(cells, large_zones, entry)
+
+        with self._lock:
+            self._cells = cells
+            self._zone_cells = zone_cells
+            self._large_zones = large_zones
+            self.built_at = time.monotonic()
+            self.last_rebuild_seconds = time.perf_counter() - started
+            self.rebuild_count += 1
+
+        logger.info(
+            f"Rebuilt safe zone index: {len(zone_cells)} zones in "
+            f"{len(cells)} cells ({self.last_rebuild_seconds * 1000:.1f} ms)"
+        )
+
+    def _insert(self, cells, large_zones, entry):
+        """Add an entry to every cell its circle overlaps, or to the large zones."""
+        box = bounding_box(entry.latitude, entry.longitude, entry.radius)
+        if geohash_cell_count(*box, self.precision) > self.max_cells:
+            large_zones[entry.zone_id] = entry
+            return ()
+
+        covered = tuple(geohash_cells_covering(*box, self.precision))
+        for cell in covered:
+            cells.setdefault(cell, {})[entry.zone_id] = entry
+        return covered
+
+    def _remove(self, zone_id):
+        """Remove a zone from all of its cells."""
+        self._large_zones.pop(zone_id, None)
+        for cell in self._zone_cells.pop(zone_id, ()):
+            bucket = self._cells.get(cell)
+            if bucket is None:
+                continue
+            bucket.pop(zone_id, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def update_zone(self, zone):
+        """Insert, move or drop a single safe zone after it was saved."""
+        with self._lock:
+            self._remove(zone.id)
+            if zone.is_active:
+                entry = ZoneEntry(
+                    zone.id, zone.device_id_hash, zone.radius,
+                    zone.latitude, zone.longitude,
+                )
+                self._zone_cells[zone.id] = self._insert(
+                    self._cells, self._large_zones, entry,
+                )
+            self.incremental_updates += 1
+
+    def remove_zone(self, zone_id):
+        """Drop a single safe zone after it was deleted."""
+        with self._lock:
+            self._remove(zone_id)
+            self.incremental_updates += 1
+
+    def match(self, latitude, longitude):
+        """
+        Find the safe zones containing a point.
+
+        Returns:
+            List of ZoneEntry tuples whose circle contains the point
+        """
+        cell = geohash_encode(latitude, longitude, self.precision)
+        with self._lock:
+            candidates = list(self._cells.get(cell, {}).values())
+            candidates.extend(self._large_zones.values())
+
+        return [
+            entry for entry in candidates
+            if haversine_distance(
+                longitude, latitude, entry.longitude, entry.latitude,
+            ) * 1000 <= entry.radius
+        ]
+
+    def memory_usage(self):
+        """Estimate the memory held by the index in bytes."""
+        with self._lock:
+            total = (
+                sys.getsizeof(self._cells) + sys.getsizeof(self._zone_cells)
+                + sys.getsizeof(self._large_zones)
+            )
+            for cell, bucket in self._cells.items():
+                total += sys.getsizeof(cell) + sys.getsizeof(bucket)
+            for cells in self._zone_cells.values():
+                total += sys.getsizeof(cells)
+            # Entries are shared between cells; count each one once
+            total += sum(
+                sys.getsizeof(entry) + sys.getsizeof(entry.device_id_hash)
+                for entry in {
+                    entry for bucket in self._cells.values()
+                    for entry in bucket.values()
+                } | set(self._large_zones.values())
+            )
+        return total
+
+    def stats(self):
+        """Return size, memory and rebuild timing information."""
+        with self._lock:
+            zones = len(self._zone_cells)
+            cells = len(self._cells)
+            entries = sum(len(bucket) for bucket in self._cells.values())
+            large_zones = len(self._large_zones)
+        return {
+            'precision': self.precision,
+            'zones': zones,
+            'cells': cells,
+            'cell_entries': entries,
+            'large_zones': large_zones,
+            'memory_bytes': self.memory_usage(),
+            'last_rebuild_ms': (
+                round(self.last_rebuild_seconds * 1000, 3)
+                if self.last_rebuild_seconds is not None else None
+            ),
+            'rebuild_count': self.rebuild_count,
+            'incremental_updates': self.incremental_updates,
+            'age_seconds': (
+                round(time.monotonic() - self.built_at, 3)
+                if self.built_at is not None else None
+            ),
+        }
+
+
+# Per-worker index instance
+_safe_zone_index = None
+_index_lock = threading.Lock()
+
+
+def get_safe_zone_index():
+    """Get the worker's safe zone index, building it if missing or stale."""
+    global _safe_zone_index
+    with _index_lock:
+        if _safe_zone_index is None:
+            _safe_zone_index = SafeZoneIndex()
+        index = _safe_zone_index
+
+    if index.is_stale():
+        index.rebuild()
+    return index
+
+
+def peek_safe_zone_index():
+    """Return the worker's index only if it has already been built."""
+    index = _safe_zone_index
+    if index is not None and index.is_built:
+        return index
+    return None
+
+
+def reset_safe_zone_index():
+    """Discard the worker's index so it is rebuilt on next use."""
+    global _safe_zone_index
+    with _index_lock:
+        _safe_zone_index = None
@@ -0,0 +1,82 @@
+"""
+In-memory messaging service for exercising push notification flows offline.
+
+Point PUSH_MESSAGING_SERVICE at
+'push_notifications.testing.FakeMessagingService' to record sends and
+topic subscriptions instead of calling Firebase.
+"""
+from collections import Counter, defaultdict
+from typing import List
+
+
+class FakeMessagingService:
+    """Drop-in replacement for FirebaseMessagingService that records calls."""
+
+    # Tokens for which every send fails with the given error class
+    failing_tokens = {}
+
+    sent_tokens = []
+    topic_sends = []
+    subscriptions = defaultdict(set)
+    calls = Counter()
+
+    @classmethod
+    def reset(cls):
+        """Forget all recorded calls and subscriptions."""
+        cls.failing_tokens = {}
+        cls.sent_tokens = []
+        cls.topic_sends = []
+        cls.subscriptions = defaultdict(set)
+        cls.calls = Counter()
+
+    @classmethod
+    def send_incident_notification(cls, fcm_tokens: List[str], incident_data: dict) -> dict:
+        cls.calls['send_incident_notification'] += 1
+        token_errors = {}
+        for token in fcm_tokens:
+            if token in cls.failing_tokens:
+                token_errors[token] = cls.failing_tokens[token]
+            else:
+                cls.sent_tokens.append((incident_data.get('id'), token))
+
+        from .services import DEAD_TOKEN_ERRORS
+        return {
+            'success': len(fcm_tokens) - len(token_errors),
+            'failed': len(token_errors),
+            'failed_tokens': list(token_errors),
+            'dead_tokens': [
+                token for token, error_class in token_errors.items()
+                if error_class in DEAD_TOKEN_ERRORS
+            ],
+            'token_errors': token_errors,
+            'error_counts': dict(Counter(token_errors.values())),
+        }
+
+    @classmethod
+    def send_to_topic(cls, topic: str, incident_data: dict) -> bool:
+        cls.calls['send_to_topic'] += 1
+        cls.topic_sends.append((incident_data.get('id'), topic))
+        return True
+
+    @classmethod
+    def subscribe_to_topic(cls, fcm_tokens: List[str], topic: str) -> List[str]:
+        cls.calls['subscribe_to_topic'] += 1
+        cls.subscriptions[topic].update(fcm_tokens)
+        return list(fcm_tokens)
+
+    @classmethod
+    def unsubscribe_from_topic(cls, fcm_tokens: List[str], topic: str) -> List[str]:
+        cls.calls['unsubscribe_from_topic'] += 1
+        cls.subscriptions[topic].difference_update(fcm_tokens)
+        if not cls.subscriptions[topic]:
+            del cls.subscriptions[topic]
+        return list(fcm_tokens)
+
+    @classmethod
+    def subscribers(cls, topic: str) -> set:
+        """Return the tokens currently subscribed to a topic."""
+        return set(cls.subscriptions.get(topic, set()))
+
+    @classmethod
+    def get_delivery_stats(cls) -> dict:
+        return dict(cls.calls)
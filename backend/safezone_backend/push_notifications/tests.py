@@ -1,3 +1,792 @@
-from django.test import TestCase
+import hashlib
+import math
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from incident_reporting.models import Incident
+
+from user_settings.models import SafeZone, UserDevice, UserPreferences, hash_device_id
+from alerts.utils import haversine_distance
+from safezone_backend.geo_utils import (
+    bounding_box,
+    geohash_encode,
+    geohash_bounds,
+    geohash_cell_count,
+    geohash_cell_size,
+    geohash_cells_covering,
+    geohash_cells_for_radius,
+)
+from .spatial_index import (
+    SafeZoneIndex,
+    get_safe_zone_index,
+    reset_safe_zone_index,
+)
+from firebase_admin import exceptions as firebase_exceptions, messaging
+
+from .models import NotificationLog, TopicSubscription
+from .services import (
+    FirebaseMessagingService,
+    classify_send_error,
+    delivery_stats,
+    ERROR_INVALID_ARGUMENT,
+    ERROR_OTHER,
+    ERROR_QUOTA,
+    ERROR_TRANSIENT,
+    ERROR_UNREGISTERED,
+)
+from .testing import FakeMessagingService
+from .topics import desired_topics, sync_device_topics, topic_for_location
+from .utils import (
+    get_devices_to_notify,
+    iter_device_tokens,
+    send_bulk_incident_notifications,
+    send_incident_notifications,
+)
+
+
+class GeohashTestCase(TestCase):
+    """Tests for the geohash helpers used by the safe zone index."""
+
+    def test_encode_known_value(self):
+        """Test encoding against a well-known geohash."""
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_bounds_contain_point(self):
+        """Test that a cell's bounds contain the encoded point."""
+        min_lat, min_lon, max_lat, max_lon = geohash_bounds(
+            geohash_encode(37.7749, -122.4194, 6)
+        )
+        self.assertTrue(min_lat <= 37.7749 <= max_lat)
+        self.assertTrue(min_lon <= -122.4194 <= max_lon)
+
+    def test_radius_cover_includes_nearby_points(self):
+        """Test that the covering cells include points inside the circle."""
+        cells = geohash_cells_for_radius(37.7749, -122.4194, 3000, 5)
+        for lat, lon in [(37.7749, -122.4194), (37.80, -122.4194), (37.7749, -122.385)]:
+            self.assertIn(geohash_encode(lat, lon, 5), cells)
+
+    def test_radius_cover_wraps_antimeridian(self):
+        """Test that circles crossing the antimeridian cover both sides."""
+        cells = geohash_cells_for_radius(0.0, 179.99, 5000, 5)
+        self.assertIn(geohash_encode(0.0, 179.99, 5), cells)
+        self.assertIn(geohash_encode(0.0, -179.99, 5), cells)
+
+
+class SafeZoneIndexTestCase(TestCase):
+    """Tests for the in-memory safe zone index."""
+
+    def setUp(self):
+        reset_safe_zone_index()
+        self.home = SafeZone.objects.create(
+            device_id='device-home',
+            name='Home',
+            latitude=37.7749,
+            longitude=-122.4194,
+            radius=1000,
+            zone_type='home',
+        )
+        self.far = SafeZone.objects.create(
+            device_id='device-far',
+            name='NYC',
+            latitude=40.7128,
+            longitude=-74.0060,
+            radius=1000,
+        )
+        SafeZone.objects.create(
+            device_id='device-inactive',
+            name='Inactive',
+            latitude=37.7749,
+            longitude=-122.4194,
+            radius=1000,
+            is_active=False,
+        )
+
+    def tearDown(self):
+        reset_safe_zone_index()
+
+    def test_match_returns_only_containing_zones(self):
+        """Test that matching returns active zones containing the point."""
+        index = SafeZoneIndex()
+        index.rebuild()
+
+        matches = index.match(37.7750, -122.4195)
+        self.assertEqual([m.zone_id for m in matches], [self.home.id])
+        self.assertEqual(matches[0].device_id_hash, self.home.device_id_hash)
+
+        self.assertEqual(index.match(37.8500, -122.4194), [])
+
+    def test_match_agrees_with_contains_point(self):
+        """Test that index matching agrees with SafeZone.contains_point."""
+        index = SafeZoneIndex()
+        index.rebuild()
+
+        for lat, lon in [(37.7749, -122.4194), (37.7830, -122.4194), (37.7840, -122.4194)]:
+            expected = self.home.contains_point(lat, lon)
+            matched = any(m.zone_id == self.home.id for m in index.match(lat, lon))
+            self.assertEqual(matched, expected)
+
+    def test_match_at_exact_radius(self):
+        """Test that a point at the zone radius is matched across a cell edge."""
+        # Put the zone's northern edge just past a precision 5 cell boundary
+        radius = 5000
+        edge = math.degrees(radius / 6371000)
+        cell_lat, _ = geohash_cell_size(5)
+        boundary = math.ceil((37.7749 + 90) / cell_lat) * cell_lat - 90
+        zone = SafeZone.objects.create(
+            device_id='device-edge',
+            name='Edge',
+            latitude=boundary - edge + 1e-6,
+            longitude=-122.4194,
+            radius=radius,
+        )
+        index = SafeZoneIndex()
+        index.rebuild()
+
+        for latitude, longitude in [
+            (zone.latitude + edge * 0.999999, zone.longitude),
+            (zone.latitude - edge * 0.999999, zone.longitude),
+        ]:
+            self.assertLessEqual(
+                haversine_distance(longitude, latitude, zone.longitude, zone.latitude) * 1000, radius,
+            )
+            self.assertIn(zone.id, [m.zone_id for m in index.match(latitude, longitude)])
+
+        min_lat, min_lon, max_lat, max_lon = bounding_box(zone.latitude, zone.longitude, radius)
+        east = haversine_distance(max_lon, zone.latitude, zone.longitude, zone.latitude) * 1000
+        self.assertGreaterEqual(east, radius)
+
+    def test_signals_update_index_incrementally(self):
+        """Test that saving and deleting safe zones updates a built index."""
+        index = get_safe_zone_index()
+        rebuilds = index.rebuild_count
+
+        with self.captureOnCommitCallbacks(execute=True):
+            zone = SafeZone.objects.create(
+                device_id='device-new',
+                name='Work',
+                latitude=51.5074,
+                longitude=-0.1278,
+                radius=500,
+            )
+        self.assertEqual([m.zone_id for m in index.match(51.5074, -0.1278)], [zone.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            zone.latitude = 48.8566
+            zone.longitude = 2.3522
+            zone.save()
+        self.assertEqual(index.match(51.5074, -0.1278), [])
+        self.assertEqual([m.zone_id for m in index.match(48.8566, 2.3522)], [zone.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            zone.delete()
+        self.assertEqual(index.match(48.8566, 2.3522), [])
+
+        self.assertEqual(index.rebuild_count, rebuilds)
+        self.assertEqual(index.stats()['incremental_updates'], 3)
+
+    def test_stats_report_memory_and_timing(self):
+        """Test that index statistics expose memory usage and rebuild timing."""
+        index = get_safe_zone_index()
+        stats = index.stats()
+
+        self.assertEqual(stats['zones'], 2)
+        self.assertGreater(stats['cells'], 0)
+        self.assertGreater(stats['memory_bytes'], 0)
+        self.assertIsNotNone(stats['last_rebuild_ms'])
+        self.assertEqual(stats['rebuild_count'], 1)
+
+    def test_cell_count_estimate_covers_enumeration(self):
+        """Test that the cell count estimate never undercounts the covered cells."""
+        for latitude, longitude, radius in [
+            (37.7749, -122.4194, 1000),
+            (37.7749, -122.4194, 50000),
+            (64.1466, -21.9426, 20000),
+            (0.0, 179.99, 10000),
+        ]:
+            box = bounding_box(latitude, longitude, radius)
+            self.assertGreaterEqual(
+                geohash_cell_count(*box, 5), len(geohash_cells_covering(*box, 5)),
+            )
+
+    @override_settings(SAFE_ZONE_INDEX_MAX_CELLS=100)
+    def test_large_zones_bypass_cell_expansion(self):
+        """Test that zones over the cell cap are matched without being expanded into cells."""
+        index = get_safe_zone_index()
+        cells = index.stats()['cells']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            zone = SafeZone.objects.create(
+                device_id='device-huge',
+                name='Country',
+                latitude=39.8283,
+                longitude=-98.5795,
+                radius=2000000,
+            )
+        stats = index.stats()
+        self.assertEqual(stats['large_zones'], 1)
+        self.assertEqual(stats['cells'], cells)
+
+        # Chicago is ~1000 km from the zone centre, London is not in it
+        self.assertIn(zone.id, [m.zone_id for m in index.match(41.8781, -87.6298)])
+        self.assertNotIn(zone.id, [m.zone_id for m in index.match(51.5074, -0.1278)])
+
+        index.rebuild()
+        self.assertEqual(index.stats()['large_zones'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            zone.delete()
+        self.assertEqual(index.stats()['large_zones'], 0)
+        self.assertEqual(index.match(41.8781, -87.6298), [])
+
+    def test_get_devices_to_notify_uses_index(self):
+        """Test that device targeting resolves tokens for matching zones."""
+        UserDevice.objects.create(
+            device_id='device-home',
+            fcm_token='token-home',
+            platform='android',
+        )
+        UserDevice.objects.create(
+            device_id='device-far',
+            fcm_token='token-far',
+            platform='ios',
+        )
+
+        devices = get_devices_to_notify(37.7750, -122.4195)
+        self.assertEqual(devices, [('device-home', 'token-home')])
+
+
+class DeviceTokenResolutionTestCase(TestCase):
+    """Tests for resolving matched safe zones to FCM tokens."""
+
+    def setUp(self):
+        reset_safe_zone_index()
+        # Two overlapping zones for the same device
+        for name, radius in [('Home', 1000), ('Neighbourhood', 3000)]:
+            SafeZone.objects.create(
+                device_id='device-a',
+                name=name,
+                latitude=37.7749,
+                longitude=-122.4194,
+                radius=radius,
+            )
+        SafeZone.objects.create(
+            device_id='device-b',
+            name='Work',
+            latitude=37.7760,
+            longitude=-122.4180,
+            radius=1000,
+        )
+        SafeZone.objects.create(
+            device_id='device-inactive',
+            name='Old phone',
+            latitude=37.7749,
+            longitude=-122.4194,
+            radius=1000,
+        )
+        self.device_a = UserDevice.objects.create(device_id='device-a', fcm_token='token-a')
+        self.device_b = UserDevice.objects.create(device_id='device-b', fcm_token='token-b')
+        UserDevice.objects.create(
+            device_id='device-inactive',
+            fcm_token='token-inactive',
+            is_active=False,
+        )
+
+    def tearDown(self):
+        reset_safe_zone_index()
+
+    def test_overlapping_zones_deduplicated(self):
+        """Test that a device with several matching zones is notified once."""
+        devices = get_devices_to_notify(37.7749, -122.4194)
+        self.assertEqual(
+            sorted(devices),
+            [('device-a', 'token-a'), ('device-b', 'token-b')],
+        )
+
+    def test_tokens_resolved_in_chunks(self):
+        """Test that token resolution issues one query per chunk of hashes."""
+        hashes = [self.device_a.device_id_hash, self.device_b.device_id_hash]
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(iter_device_tokens(hashes))), 2)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(len(list(iter_device_tokens(hashes, chunk_size=1))), 2)
+
+    @override_settings(NOTIFICATION_SEND_BATCH_SIZE=1)
+    def test_notifications_sent_in_batches(self):
+        """Test that notifications are sent and logged batch by batch."""
+        get_safe_zone_index()
+        incident = Incident.objects.create(
+            category='theft',
+            latitude=37.7749,
+            longitude=-122.4194,
+            title='Phone snatched',
+        )
+
+        with patch('push_notifications.services.FirebaseMessagingService.send_incident_notification') as mock_send:
+            mock_send.side_effect = lambda fcm_tokens, incident_data: {
+                'success': len(fcm_tokens),
+                'failed': 0,
+                'failed_tokens': [],
+            }
+            send_incident_notifications(incident)
+
+        self.assertEqual(mock_send.call_count, 2)
+        sent = sorted(call.kwargs['fcm_tokens'][0] for call in mock_send.call_args_list)
+        self.assertEqual(sent, ['token-a', 'token-b'])
+        self.assertEqual(NotificationLog.objects.filter(incident=incident).count(), 2)
+
+
+class NotificationPreferencesTestCase(TestCase):
+    """Tests for honoring notification preferences during fan-out."""
+
+    def setUp(self):
+        reset_safe_zone_index()
+        self.device_ids = ['device-default', 'device-opted-in', 'device-no-push', 'device-no-proximity']
+        for device_id in self.device_ids:
+            SafeZone.objects.create(
+                device_id=device_id,
+                name='Home',
+                latitude=37.7749,
+                longitude=-122.4194,
+                radius=1000,
+            )
+            UserDevice.objects.create(device_id=device_id, fcm_token=f'token-{device_id}')
+
+        UserPreferences.objects.create(device_id='device-opted-in')
+        UserPreferences.objects.create(device_id='device-no-push', push_notifications=False)
+        UserPreferences.objects.create(device_id='device-no-proximity', proximity_alerts=False)
+
+    def tearDown(self):
+        reset_safe_zone_index()
+
+    def test_opted_out_devices_excluded(self):
+        """Test that devices that disabled alerts are not targeted."""
+        get_safe_zone_index()
+
+        with self.assertNumQueries(1):
+            devices = get_devices_to_notify(37.7749, -122.4194)
+
+        self.assertEqual(
+            sorted(device_id for device_id, _ in devices),
+            ['device-default', 'device-opted-in'],
+        )
+
+    def test_preferences_can_be_ignored(self):
+        """Test that preference filtering can be disabled explicitly."""
+        hashes = UserDevice.objects.values_list('device_id_hash', flat=True)
+        tokens = list(iter_device_tokens(hashes, respect_preferences=False))
+        self.assertEqual(len(tokens), 4)
+
+
+@patch.object(FirebaseMessagingService, '_initialized', True)
+class DeliveryResultTestCase(TestCase):
+    """Tests for FCM error classification, retries and dead token pruning."""
+
+    def setUp(self):
+        reset_safe_zone_index()
+        delivery_stats.reset()
+        self.incident_data = {'id': 1, 'category': 'theft', 'title': 'Test'}
+
+    def tearDown(self):
+        reset_safe_zone_index()
+
+    def test_classify_send_error(self):
+        """Test that FCM exceptions map to delivery error classes."""
+        cases = [
+            (messaging.UnregisteredError('gone'), ERROR_UNREGISTERED),
+            (firebase_exceptions.InvalidArgumentError('bad token'), ERROR_INVALID_ARGUMENT),
+            (messaging.QuotaExceededError('slow down'), ERROR_QUOTA),
+            (firebase_exceptions.UnavailableError('try later'), ERROR_TRANSIENT),
+            (firebase_exceptions.InternalError('oops'), ERROR_TRANSIENT),
+            (ValueError('unexpected'), ERROR_OTHER),
+        ]
+        for error, expected in cases:
+            self.assertEqual(classify_send_error(error), expected)
+
+    @patch('push_notifications.services.time.sleep')
+    @patch('push_notifications.services.messaging.send')
+    def test_transient_failures_retried_with_backoff(self, mock_send, mock_sleep):
+        """Test that transient failures are retried with exponential backoff."""
+        attempts = {'count': 0}
+
+        def send(message):
+            attempts['count'] += 1
+            if attempts['count'] < 3:
+                raise firebase_exceptions.UnavailableError('unavailable')
+            return 'message-id'
+
+        mock_send.side_effect = send
+
+        with override_settings(FCM_MAX_RETRIES=3, FCM_RETRY_BASE_DELAY=0.5, FCM_RETRY_BUDGET=2.0):
+            result = FirebaseMessagingService.send_incident_notification(
+                ['token-a'], self.incident_data,
+            )
+
+        self.assertEqual(result['success'], 1)
+        self.assertEqual(result['failed_tokens'], [])
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [0.5, 1.0])
+        self.assertEqual(delivery_stats.snapshot()['retried'], 2)
+
+    @patch('push_notifications.services.time.sleep')
+    @patch('push_notifications.services.messaging.send')
+    def test_backoff_stops_at_retry_budget(self, mock_send, mock_sleep):
+        """Test that retries stop once the next delay would exceed the budget."""
+        mock_send.side_effect = firebase_exceptions.UnavailableError('unavailable')
+
+        with override_settings(FCM_MAX_RETRIES=3, FCM_RETRY_BASE_DELAY=0.5, FCM_RETRY_BUDGET=1.0):
+            result = FirebaseMessagingService.send_incident_notification(
+                ['token-a'], self.incident_data,
+            )
+
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [0.5])
+        self.assertEqual(mock_send.call_count, 2)
+        self.assertEqual(result['failed_tokens'], ['token-a'])
+        self.assertEqual(delivery_stats.snapshot()['retry_budget_exhausted'], 1)
+
+    @patch('push_notifications.services.time.sleep')
+    @patch('push_notifications.services.messaging.send')
+    def test_dead_tokens_not_retried(self, mock_send, mock_sleep):
+        """Test that unregistered tokens fail immediately and are reported dead."""
+        mock_send.side_effect = messaging.UnregisteredError('gone')
+
+        result = FirebaseMessagingService.send_incident_notification(
+            ['token-a'], self.incident_data,
+        )
+
+        self.assertEqual(mock_send.call_count, 1)
+        mock_sleep.assert_not_called()
+        self.assertEqual(result['dead_tokens'], ['token-a'])
+        self.assertEqual(result['error_counts'], {ERROR_UNREGISTERED: 1})
+
+    @patch('push_notifications.services.time.sleep')
+    @patch('push_notifications.services.messaging.send')
+    def test_dead_tokens_deactivated_in_bulk(self, mock_send, mock_sleep):
+        """Test that devices with dead tokens are deactivated after sending."""
+        for device_id in ['device-ok', 'device-gone', 'device-invalid']:
+            SafeZone.objects.create(
+                device_id=device_id,
+                name='Home',
+                latitude=37.7749,
+                longitude=-122.4194,
+                radius=1000,
+            )
+            UserDevice.objects.create(device_id=device_id, fcm_token=f'token-{device_id}')
+
+        def send(message):
+            if message.token == 'token-device-gone':
+                raise messaging.UnregisteredError('gone')
+            if message.token == 'token-device-invalid':
+                raise firebase_exceptions.InvalidArgumentError('invalid')
+            return 'message-id'
+
+        mock_send.side_effect = send
+        incident = Incident.objects.create(
+            category='theft',
+            latitude=37.7749,
+            longitude=-122.4194,
+            title='Phone snatched',
+        )
+
+        send_incident_notifications(incident)
+
+        active = sorted(
+            d.device_id for d in UserDevice.objects.filter(is_active=True)
+        )
+        self.assertEqual(active, ['device-ok'])
+
+        stats = FirebaseMessagingService.get_delivery_stats()
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(stats['failed_unregistered'], 1)
+        self.assertEqual(stats['failed_invalid_argument'], 1)
+        self.assertEqual(stats['tokens_deactivated'], 2)
+
+        failed_log = NotificationLog.objects.get(fcm_token='token-device-gone')
+        self.assertFalse(failed_log.success)
+        self.assertIn(ERROR_UNREGISTERED, failed_log.error_message)
+
+        # Deactivated devices are no longer targeted
+        self.assertEqual(
+            [device_id for device_id, _ in get_devices_to_notify(37.7749, -122.4194)],
+            ['device-ok'],
+        )
+
+
+@override_settings(
+    PUSH_MESSAGING_SERVICE='push_notifications.testing.FakeMessagingService',
+    NOTIFICATION_TOPIC_PRECISION=5,
+    NOTIFICATION_TOPICS_ENABLED=True,
+)
+class TopicBroadcastTestCase(TestCase):
+    """Tests for cell topic subscriptions and dense-area broadcasts."""
+
+    def setUp(self):
+        reset_safe_zone_index()
+        FakeMessagingService.reset()
+
+    def tearDown(self):
+        reset_safe_zone_index()
+        FakeMessagingService.reset()
+
+    def _register(self, device_id, latitude=37.7749, longitude=-122.4194, radius=1000):
+        with self.captureOnCommitCallbacks(execute=True):
+            device = UserDevice.objects.create(device_id=device_id, fcm_token=f'token-{device_id}')
+            zone = SafeZone.objects.create(
+                device_id=device_id,
+                name='Home',
+                latitude=latitude,
+                longitude=longitude,
+                radius=radius,
+            )
+        return device, zone
+
+    def _sync(self):
+        call_command('sync_notification_topics', stdout=StringIO())
+
+    def test_saves_do_not_call_fcm(self):
+        """Test that saving zones, devices and preferences makes no topic calls."""
+        device, zone = self._register('device-a')
+        with self.captureOnCommitCallbacks(execute=True):
+            zone.radius = 2000
+            zone.save()
+            UserPreferences.objects.create(device_id='device-a', push_notifications=False)
+
+        self.assertEqual(dict(FakeMessagingService.calls), {})
+        self.assertFalse(TopicSubscription.objects.exists())
+
+    def test_subscriptions_follow_safe_zone_changes(self):
+        """Test subscription churn when a safe zone is created, moved and deleted."""
+        device, zone = self._register('device-a')
+        self._sync()
+        home_topic = topic_for_location(37.7749, -122.4194)
+
+        topics = desired_topics(device.device_id_hash)
+        self.assertIn(home_topic, topics)
+        self.assertEqual(
+            set(TopicSubscription.objects.values_list('topic', flat=True)),
+            topics,
+        )
+        self.assertIn('token-device-a', FakeMessagingService.subscribers(home_topic))
+
+        # Moving the zone swaps the subscriptions over
+        zone.latitude = 51.5074
+        zone.longitude = -0.1278
+        zone.save()
+        self._sync()
+
+        self.assertEqual(FakeMessagingService.subscribers(home_topic), set())
+        self.assertIn(
+            'token-device-a',
+            FakeMessagingService.subscribers(topic_for_location(51.5074, -0.1278)),
+        )
+
+        # Re-syncing an unchanged device makes no FCM calls
+        calls = dict(FakeMessagingService.calls)
+        self.assertEqual(
+            sync_device_topics(device.device_id_hash),
+            {'subscribed': 0, 'unsubscribed': 0},
+        )
+        self.assertEqual(dict(FakeMessagingService.calls), calls)
+
+        zone.delete()
+        self._sync()
+
+        self.assertFalse(TopicSubscription.objects.exists())
+        self.assertEqual(dict(FakeMessagingService.subscriptions), {})
+
+    def test_sync_batches_tokens_per_topic(self):
+        """Test that devices sharing a topic are subscribed in one call."""
+        for index in range(3):
+            self._register(f'device-{index}')
+        self._sync()
+
+        topics = desired_topics(UserDevice.objects.first().device_id_hash)
+        self.assertEqual(FakeMessagingService.calls['subscribe_to_topic'], len(topics))
+        self.assertEqual(TopicSubscription.objects.count(), 3 * len(topics))
+
+    def test_opt_out_and_token_rotation(self):
+        """Test that opting out unsubscribes and a new token is resubscribed."""
+        device, _ = self._register('device-a')
+        self._sync()
+        topic = topic_for_location(37.7749, -122.4194)
+
+        device.fcm_token = 'token-rotated'
+        device.save()
+        self._sync()
+
+        # The new token is subscribed; FCM expires the rotated-out token itself
+        self.assertIn('token-rotated', FakeMessagingService.subscribers(topic))
+        self.assertEqual(
+            TopicSubscription.objects.filter(topic=topic).values_list('token_hash', flat=True).get(),
+            hashlib.sha256(b'token-rotated').hexdigest(),
+        )
+
+        UserPreferences.objects.create(device_id='device-a', push_notifications=False)
+        self._sync()
+
+        self.assertNotIn('token-rotated', FakeMessagingService.subscribers(topic))
+        self.assertFalse(TopicSubscription.objects.exists())
+
+    def test_dense_area_uses_single_topic_send(self):
+        """Test that incidents matching many devices are broadcast once."""
+        for index in range(3):
+            self._register(f'device-{index}')
+        self._sync()
+        incident = Incident.objects.create(
+            category='fire',
+            latitude=37.7749,
+            longitude=-122.4194,
+            title='Building fire',
+        )
+
+        with override_settings(NOTIFICATION_TOPIC_THRESHOLD=2):
+            send_incident_notifications(incident)
+
+        self.assertEqual(
+            FakeMessagingService.topic_sends,
+            [(incident.id, topic_for_location(37.7749, -122.4194))],
+        )
+        self.assertEqual(FakeMessagingService.sent_tokens, [])
+        self.assertEqual(NotificationLog.objects.filter(incident=incident).count(), 1)
+
+        # Every subscribed device is reached by the topic
+        self.assertEqual(
+            len(FakeMessagingService.subscribers(topic_for_location(37.7749, -122.4194))),
+            3,
+        )
+
+    def test_broadcast_sends_directly_to_unsynced_devices(self):
+        """Test that matched devices not synced to the topic still get a direct send."""
+        for index in range(3):
+            self._register(f'device-{index}')
+        self._sync()
+        # Registered after the last sync; device-4 opted out as well
+        self._register('device-3')
+        self._register('device-4')
+        UserPreferences.objects.create(device_id='device-4', proximity_alerts=False)
+        incident = Incident.objects.create(
+            category='fire',
+            latitude=37.7749,
+            longitude=-122.4194,
+            title='Building fire',
+        )
+
+        with override_settings(NOTIFICATION_TOPIC_THRESHOLD=2):
+            send_incident_notifications(incident)
+
+        self.assertEqual(len(FakeMessagingService.topic_sends), 1)
+        self.assertEqual(FakeMessagingService.sent_tokens, [(incident.id, 'token-device-3')])
+        self.assertEqual(NotificationLog.objects.filter(incident=incident).count(), 2)
+
+    def test_broadcast_over_delivery_is_bounded(self):
+        """Test that subscribers outside the radius are within the documented bound."""
+        radius = 1000
+        # Zone centred 1.3 km north of the incident: outside its radius, but its
+        # bounding box reaches into the incident's cell
+        device, zone = self._register('device-near', latitude=37.7749 + 0.0117, radius=radius)
+        self._sync()
+        topic = topic_for_location(37.7749, -122.4194)
+        self.assertFalse(zone.contains_point(37.7749, -122.4194))
+        self.assertIn('token-device-near', FakeMessagingService.subscribers(topic))
+
+        cell_lat, cell_lon = geohash_cell_size(5)
+        cell_diagonal_m = haversine_distance(0, 37.7749, cell_lon, 37.7749 + cell_lat) * 1000
+        distance_m = haversine_distance(-122.4194, 37.7749, zone.longitude, zone.latitude) * 1000
+        self.assertLessEqual(distance_m, radius * math.sqrt(2) + cell_diagonal_m)
+
+    def test_sparse_area_sends_per_device(self):
+        """Test that incidents below the threshold are sent per device."""
+        self._register('device-a')
+        incident = Incident.objects.create(
+            category='fire',
+            latitude=37.7749,
+            longitude=-122.4194,
+            title='Building fire',
+        )
+
+        with override_settings(NOTIFICATION_TOPIC_THRESHOLD=2):
+            send_incident_notifications(incident)
+
+        self.assertEqual(FakeMessagingService.topic_sends, [])
+        self.assertEqual(FakeMessagingService.sent_tokens, [(incident.id, 'token-device-a')])
+
+
+@override_settings(
+    PUSH_MESSAGING_SERVICE='push_notifications.testing.FakeMessagingService',
+    NOTIFICATION_TOPICS_ENABLED=False,
+)
+class BulkNotificationTestCase(TestCase):
+    """Tests for notifying a batch of incidents."""
+
+    def setUp(self):
+        reset_safe_zone_index()
+        FakeMessagingService.reset()
+        for device_id, latitude in [('device-a', 37.7749), ('device-b', 37.7749), ('device-c', 40.7128)]:
+            SafeZone.objects.create(
+                device_id=device_id,
+                name='Home',
+                latitude=latitude,
+                longitude=-122.4194 if latitude == 37.7749 else -74.0060,
+                radius=1000,
+            )
+            UserDevice.objects.create(device_id=device_id, fcm_token=f'token-{device_id}')
+
+    def tearDown(self):
+        reset_safe_zone_index()
+        FakeMessagingService.reset()
+
+    def _incident(self, latitude, longitude):
+        return Incident.objects.create(
+            category='theft',
+            latitude=latitude,
+            longitude=longitude,
+            title='Theft',
+        )
+
+    def test_tokens_resolved_once_for_batch(self):
+        """Test that each incident reaches its own devices with one token query."""
+        incidents = [
+            self._incident(37.7749, -122.4194),
+            self._incident(37.7750, -122.4195),
+            self._incident(40.7128, -74.0060),
+            self._incident(0.0, 0.0),
+        ]
+        get_safe_zone_index()
+
+        # One token query and one log insert for the whole batch
+        with self.assertNumQueries(2):
+            summary = send_bulk_incident_notifications(incidents)
+
+        self.assertEqual(summary['incidents_notified'], 3)
+        self.assertEqual(summary['success'], 5)
+        self.assertEqual(
+            sorted(FakeMessagingService.sent_tokens),
+            sorted([
+                (incidents[0].id, 'token-device-a'),
+                (incidents[0].id, 'token-device-b'),
+                (incidents[1].id, 'token-device-a'),
+                (incidents[1].id, 'token-device-b'),
+                (incidents[2].id, 'token-device-c'),
+            ]),
+        )
+        self.assertEqual(NotificationLog.objects.count(), 5)
+
+    def test_dead_tokens_skipped_for_later_incidents(self):
+        """Test that a token found dead is not sent to again in the same batch."""
+        FakeMessagingService.failing_tokens = {'token-device-a': ERROR_UNREGISTERED}
+        incidents = [
+            self._incident(37.7749, -122.4194),
+            self._incident(37.7750, -122.4195),
+        ]
+
+        send_bulk_incident_notifications(incidents)
+
+        self.assertEqual(FakeMessagingService.calls['send_incident_notification'], 2)
+        self.assertFalse(UserDevice.objects.get(device_id_hash=hash_device_id('device-a')).is_active)
+        self.assertEqual(
+            NotificationLog.objects.filter(incident=incidents[1], fcm_token='token-device-a').count(),
+            0,
+        )
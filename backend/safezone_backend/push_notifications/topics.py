@@ -0,0 +1,219 @@
+"""
+Geohash cell topics for broadcasting incidents in dense areas.
+
+Each device is subscribed to the FCM topics of the geohash cells covering
+its active safe zones. When NOTIFICATION_TOPICS_ENABLED is set and an
+incident matches more devices than NOTIFICATION_TOPIC_THRESHOLD, a single
+send to the incident's cell topic replaces the per-device fan-out.
+
+Subscriptions are synced in batches by the sync_notification_topics
+command (run it periodically), never from request handlers, so saving a
+zone or preference does not wait on FCM.
+
+A broadcast cannot check each recipient's zone, so delivery differs from
+the per-device path in two bounded ways:
+
+- Over-delivery: a device is subscribed to every cell its zone's bounding
+  box touches, so it can receive incidents outside its radius, but never
+  further than radius x sqrt(2) plus one cell diagonal (about 6.9 km at
+  precision 5) from the zone centre. Zones moved away since the last sync
+  keep their old cells until the next run. The payload carries the
+  incident coordinates, so clients can drop such broadcasts.
+- Under-delivery: none. Matched devices without a synced subscription to
+  the incident's cell (new or moved zones, rotated tokens) are sent to
+  directly alongside the broadcast.
+"""
+import hashlib
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+
+from safezone_backend.geo_utils import geohash_encode, geohash_cells_for_radius
+from user_settings.models import SafeZone, UserDevice, UserPreferences
+from .models import TopicSubscription
+from .services import get_messaging_service
+
+logger = logging.getLogger(__name__)
+
+# FCM accepts at most 1000 tokens per topic management call
+FCM_TOPIC_BATCH_SIZE = 1000
+
+
+def _topic_precision():
+    return getattr(settings, 'NOTIFICATION_TOPIC_PRECISION', 5)
+
+
+def topic_for_cell(cell):
+    """Return the FCM topic name for a geohash cell."""
+    return f"{getattr(settings, 'NOTIFICATION_TOPIC_PREFIX', 'cell_')}{cell}"
+
+
+def topic_for_location(latitude, longitude):
+    """Return the FCM topic name of the cell containing a point."""
+    return topic_for_cell(geohash_encode(latitude, longitude, _topic_precision()))
+
+
+def _zone_topics(zones):
+    """Return the topics of the cells covering (latitude, longitude, radius) zones."""
+    topics = set()
+    for latitude, longitude, radius in zones:
+        for cell in geohash_cells_for_radius(latitude, longitude, radius, _topic_precision()):
+            topics.add(topic_for_cell(cell))
+    return topics
+
+
+def _opted_out(device_id_hashes):
+    """Return the hashes whose preferences disable push notifications or proximity alerts."""
+    return set(
+        UserPreferences.objects.filter(
+            device_id_hash__in=device_id_hashes,
+        ).filter(
+            Q(push_notifications=False) | Q(proximity_alerts=False)
+        ).values_list('device_id_hash', flat=True)
+    )
+
+
+def desired_topics(device_id_hash):
+    """
+    Compute the topics a device should be subscribed to.
+
+    Devices that opted out of push notifications or proximity alerts are not
+    subscribed to any topic, since broadcasts cannot filter per device.
+    """
+    if _opted_out([device_id_hash]):
+        return set()
+
+    return _zone_topics(
+        SafeZone.objects.filter(
+            device_id_hash=device_id_hash,
+            is_active=True,
+        ).values_list('latitude', 'longitude', 'radius')
+    )
+
+
+def subscribed_device_hashes(topic, device_id_hashes, chunk_size=FCM_TOPIC_BATCH_SIZE):
+    """Return the devices among device_id_hashes with a synced subscription to topic."""
+    hashes = sorted(device_id_hashes)
+    subscribed = set()
+    for start in range(0, len(hashes), chunk_size):
+        subscribed.update(
+            TopicSubscription.objects.filter(
+                topic=topic,
+                device_id_hash__in=hashes[start:start + chunk_size],
+            ).values_list('device_id_hash', flat=True)
+        )
+    return subscribed
+
+
+def sync_topics(device_id_hashes, chunk_size=FCM_TOPIC_BATCH_SIZE):
+    """
+    Bring devices' topic subscriptions in line with their safe zones.
+
+    Devices are processed in chunks of chunk_size with a handful of queries
+    per chunk. Only the difference between stored and desired subscriptions
+    is sent to FCM, with one subscribe or unsubscribe call per topic for the
+    whole chunk. A rotated FCM token is resubscribed to every desired topic.
+
+    Makes blocking FCM calls; run it from sync_notification_topics rather
+    than on the request path.
+
+    Returns:
+        Dictionary with the number of subscriptions added and removed
+    """
+    service = get_messaging_service()
+    hashes = sorted(set(device_id_hashes) - {''})
+    subscribed_total = 0
+    unsubscribed_total = 0
+
+    for start in range(0, len(hashes), chunk_size):
+        chunk = hashes[start:start + chunk_size]
+
+        devices = {
+            device_id_hash: fcm_token
+            for device_id_hash, fcm_token in UserDevice.objects.filter(
+                device_id_hash__in=chunk,
+                is_active=True,
+            ).exclude(fcm_token='').values_list('device_id_hash', 'fcm_token')
+        }
+        opted_out = _opted_out(chunk)
+        zones = defaultdict(list)
+        for device_id_hash, latitude, longitude, radius in SafeZone.objects.filter(
+            device_id_hash__in=chunk,
+            is_active=True,
+        ).values_list('device_id_hash', 'latitude', 'longitude', 'radius'):
+            zones[device_id_hash].append((latitude, longitude, radius))
+        current = defaultdict(dict)
+        for device_id_hash, topic, token_hash in TopicSubscription.objects.filter(
+            device_id_hash__in=chunk,
+        ).values_list('device_id_hash', 'topic', 'token_hash'):
+            current[device_id_hash][topic] = token_hash
+
+        # Token lists per topic for the whole chunk
+        to_subscribe = defaultdict(list)
+        to_unsubscribe = defaultdict(list)
+        stale = Q()
+        token_hashes = {}
+
+        for device_id_hash in chunk:
+            fcm_token = devices.get(device_id_hash)
+            token_hash = hashlib.sha256(fcm_token.encode()).hexdigest() if fcm_token else ''
+            token_hashes[fcm_token] = (device_id_hash, token_hash)
+            wanted = (
+                _zone_topics(zones[device_id_hash])
+                if fcm_token and device_id_hash not in opted_out else set()
+            )
+            subscriptions = current.get(device_id_hash, {})
+
+            to_remove = {
+                topic for topic, subscribed_hash in subscriptions.items()
+                if topic not in wanted or subscribed_hash != token_hash
+            }
+            for topic in to_remove:
+                # Only the current token is known; rotated-out tokens are expired by FCM
+                if fcm_token and subscriptions[topic] == token_hash:
+                    to_unsubscribe[topic].append(fcm_token)
+            if to_remove:
+                stale |= Q(device_id_hash=device_id_hash, topic__in=to_remove)
+                unsubscribed_total += len(to_remove)
+
+            for topic in wanted:
+                if topic not in subscriptions or topic in to_remove:
+                    to_subscribe[topic].append(fcm_token)
+
+        for topic, tokens in sorted(to_unsubscribe.items()):
+            service.unsubscribe_from_topic(tokens, topic)
+        if stale:
+            TopicSubscription.objects.filter(stale).delete()
+
+        created = []
+        for topic, tokens in sorted(to_subscribe.items()):
+            for fcm_token in service.subscribe_to_topic(tokens, topic):
+                device_id_hash, token_hash = token_hashes[fcm_token]
+                created.append(TopicSubscription(
+                    device_id_hash=device_id_hash,
+                    topic=topic,
+                    token_hash=token_hash,
+                ))
+        TopicSubscription.objects.bulk_create(created)
+        subscribed_total += len(created)
+
+    if subscribed_total or unsubscribed_total:
+        logger.info(
+            f"Synced topics for {len(hashes)} device(s): "
+            f"+{subscribed_total} -{unsubscribed_total}"
+        )
+    return {'subscribed': subscribed_total, 'unsubscribed': unsubscribed_total}
+
+
+def sync_device_topics(device_id_hash):
+    """Bring one device's topic subscriptions in line with its safe zones."""
+    return sync_topics([device_id_hash])
+
+
+def forget_device_topics(device_id_hashes):
+    """Drop stored subscriptions of devices whose tokens are dead."""
+    return TopicSubscription.objects.filter(
+        device_id_hash__in=device_id_hashes,
+    ).delete()[0]
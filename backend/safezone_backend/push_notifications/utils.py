@@ -2,127 +2,462 @@
 Utilities for filtering users based on safe zones and incident locations.
 """
 import logging
-from typing import List, Tuple
-from user_settings.models import UserDevice, SafeZone
+from typing import Iterable, Iterator, List, Set, Tuple
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from user_settings.models import UserDevice, UserPreferences
+from .spatial_index import get_safe_zone_index
 
 logger = logging.getLogger(__name__)
 
 
-def get_devices_to_notify(incident_latitude: float, incident_longitude: float) -> List[Tuple[str, str]]:
+def get_matching_device_hashes(incident_latitude: float, incident_longitude: float) -> Set[str]:
     """
-    Get list of device IDs and FCM tokens that should be notified about an incident.
+    Get the device ID hashes whose active safe zones contain an incident.
+    
+    Devices with several overlapping safe zones around the incident are
+    returned once.
+    
+    Args:
+        incident_latitude: Latitude of the incident
+        incident_longitude: Longitude of the incident
+        
+    Returns:
+        Set of device_id_hash values
+    """
+    matching_zones = get_safe_zone_index().match(
+        incident_latitude, incident_longitude,
+    )
+    
+    matching_device_hashes = {zone.device_id_hash for zone in matching_zones}
+    logger.info(
+        f"Incident within {len(matching_zones)} safe zone(s) "
+        f"for {len(matching_device_hashes)} device(s)"
+    )
+    return matching_device_hashes
+
+
+def _opted_out_preferences():
+    """Subquery matching preferences that disable incident push notifications."""
+    return UserPreferences.objects.filter(
+        device_id_hash=OuterRef('device_id_hash'),
+    ).filter(
+        Q(push_notifications=False) | Q(proximity_alerts=False)
+    )
+
+
+def _iter_token_rows(device_id_hashes, chunk_size=None, respect_preferences=True):
+    """
+    Yield (device_id_hash, device_id, fcm_token) rows of active devices.
+    
+    Runs one query on UserDevice.device_id_hash per chunk of hashes.
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'TOKEN_RESOLUTION_CHUNK_SIZE', 500)
+    
+    hashes = sorted(set(device_id_hashes))
+    
+    for start in range(0, len(hashes), chunk_size):
+        chunk = hashes[start:start + chunk_size]
+        queryset = UserDevice.objects.filter(
+            device_id_hash__in=chunk,
+            is_active=True,
+        )
+        if respect_preferences:
+            queryset = queryset.filter(~Exists(_opted_out_preferences()))
+        
+        yield from list(queryset.values_list('device_id_hash', 'device_id', 'fcm_token'))
+
+
+def iter_device_tokens(
+    device_id_hashes: Iterable[str],
+    chunk_size: int = None,
+    respect_preferences: bool = True,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Resolve device ID hashes to FCM tokens of active devices.
+    
+    Uses one indexed query on UserDevice.device_id_hash per chunk of hashes,
+    so only one chunk of rows is held in memory at a time. Tokens shared by
+    several device records are yielded once.
+    
+    Devices whose UserPreferences disable push notifications or proximity
+    alerts are excluded by a correlated subquery on device_id_hash in the
+    same query, so opt-outs cost no extra round trips. Devices without
+    stored preferences use the defaults (opted in).
+    
+    Args:
+        device_id_hashes: device_id_hash values to resolve
+        chunk_size: Number of hashes per query (default: TOKEN_RESOLUTION_CHUNK_SIZE)
+        respect_preferences: Skip devices that opted out of incident alerts
+        
+    Yields:
+        Tuples (device_id, fcm_token)
+    """
+    for _, device_id, fcm_token in _unique_token_rows(
+        _iter_token_rows(device_id_hashes, chunk_size, respect_preferences)
+    ):
+        yield device_id, fcm_token
+
+
+def _unique_token_rows(rows):
+    """Drop rows without a token or repeating an earlier row's token."""
+    seen_tokens = set()
+    for row in rows:
+        fcm_token = row[2]
+        if not fcm_token or fcm_token in seen_tokens:
+            continue
+        seen_tokens.add(fcm_token)
+        yield row
+
+
+def iter_devices_to_notify(incident_latitude: float, incident_longitude: float) -> Iterator[Tuple[str, str]]:
+    """
+    Stream device IDs and FCM tokens that should be notified about an incident.
     
     Only notifies users if:
     1. They have safe zones configured AND
-    2. The incident is within at least one of their active safe zones
+    2. The incident is within at least one of their active safe zones AND
+    3. They have not disabled push notifications or proximity alerts
     
     Args:
         incident_latitude: Latitude of the incident
         incident_longitude: Longitude of the incident
         
+    Yields:
+        Tuples (device_id, fcm_token) for devices to notify
+    """
+    try:
+        matching_device_hashes = get_matching_device_hashes(
+            incident_latitude, incident_longitude,
+        )
+    except Exception as e:
+        logger.error(f"Error filtering devices by safe zones: {e}")
+        return
+    
+    if not matching_device_hashes:
+        logger.info(
+            "No safe zones contain this incident location - "
+            "no notifications will be sent"
+        )
+        return
+    
+    yield from iter_device_tokens(matching_device_hashes)
+
+
+def get_devices_to_notify(incident_latitude: float, incident_longitude: float) -> List[Tuple[str, str]]:
+    """
+    Get list of device IDs and FCM tokens that should be notified about an incident.
+    
+    See iter_devices_to_notify(); prefer it when the result may be large.
+    
     Returns:
         List of tuples (device_id, fcm_token) for devices to notify
     """
-    devices_to_notify = []
-    
     try:
-        # Get all active safe zones
-        active_safe_zones = SafeZone.objects.filter(is_active=True)
-        
-        # Track which device IDs have matching safe zones
-        matching_device_ids = set()
-        
-        for safe_zone in active_safe_zones:
-            # Check if incident is within this safe zone
-            if safe_zone.contains_point(incident_latitude, incident_longitude):
-                matching_device_ids.add(safe_zone.device_id)
-                logger.info(
-                    f"Incident within safe zone '{safe_zone.name}' "
-                    f"for device {safe_zone.device_id}"
-                )
+        return list(iter_devices_to_notify(incident_latitude, incident_longitude))
+    except Exception as e:
+        logger.error(f"Error resolving devices to notify: {e}")
+        return []
+
+
+def deactivate_dead_tokens(devices: Iterable[Tuple[str, str, str]], dead_tokens: Iterable[str]) -> int:
+    """
+    Deactivate devices whose FCM tokens FCM reported as unregistered or invalid.
+    
+    Args:
+        devices: Tuples (device_id_hash, device_id, fcm_token) that were sent to
+        dead_tokens: Tokens classified as dead by the messaging service
         
-        # Get FCM tokens for matching devices
-        if matching_device_ids:
-            devices = UserDevice.objects.filter(
-                device_id__in=matching_device_ids,
-                is_active=True,
-            ).values_list('device_id', 'fcm_token')
-            
-            devices_to_notify = list(devices)
-            logger.info(
-                f"Found {len(devices_to_notify)} devices to notify "
-                f"based on safe zone matching"
-            )
-        else:
-            logger.info(
-                "No safe zones contain this incident location - "
-                "no notifications will be sent"
-            )
+    Returns:
+        Number of devices deactivated
+    """
+    from push_notifications.services import delivery_stats
     
-    except Exception as e:
-        logger.error(f"Error filtering devices by safe zones: {e}")
+    dead_tokens = set(dead_tokens)
+    dead_hashes = {
+        device_id_hash
+        for device_id_hash, _, fcm_token in devices
+        if fcm_token in dead_tokens
+    }
+    if not dead_hashes:
+        return 0
     
-    return devices_to_notify
+    # One UPDATE for the whole batch, keyed on the indexed hash column
+    deactivated = UserDevice.objects.filter(
+        device_id_hash__in=dead_hashes,
+        is_active=True,
+    ).update(is_active=False)
+    
+    delivery_stats.increment('tokens_deactivated', deactivated)
+    
+    # Dead tokens are dropped from FCM topics by FCM itself
+    from push_notifications.topics import forget_device_topics
+    forget_device_topics(dead_hashes)
+    logger.info(f"Deactivated {deactivated} device(s) with dead FCM tokens")
+    return deactivated
+
+
+def _batched(iterable, size):
+    """Yield lists of up to size items from an iterable."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _incident_payload(incident):
+    """Build the notification data sent for an incident."""
+    return {
+        'id': incident.id,
+        'category': incident.category,
+        'latitude': incident.latitude,
+        'longitude': incident.longitude,
+        'title': incident.title,
+        'description': incident.description or '',
+        'timestamp': incident.timestamp.isoformat(),
+    }
+
+
+def _exceeds_topic_threshold(device_count):
+    """
+    Check whether an incident should be broadcast to its cell topic.
+    
+    Compares the number of devices the safe zone index matched, without
+    further queries. Inactive and opted-out devices are not subscribed to
+    topics; they are left to the direct send, which filters them out.
+    """
+    threshold = getattr(settings, 'NOTIFICATION_TOPIC_THRESHOLD', 1000)
+    if not getattr(settings, 'NOTIFICATION_TOPICS_ENABLED', False) or not threshold:
+        return False
+    return device_count > threshold
+
+
+def _broadcast_to_topic(messaging_service, incident, incident_data, device_id_hashes):
+    """
+    Broadcast an incident to the FCM topic of its geohash cell.
+    
+    Returns:
+        Tuple (unsaved NotificationLog for the broadcast, hashes of the
+        matched devices not subscribed to the topic, which still need a
+        direct send)
+    """
+    from push_notifications.models import NotificationLog
+    from push_notifications.topics import subscribed_device_hashes, topic_for_location
+    
+    topic = topic_for_location(incident.latitude, incident.longitude)
+    unsynced = set(device_id_hashes) - subscribed_device_hashes(topic, device_id_hashes)
+    logger.info(
+        f"{len(device_id_hashes)} devices match incident {incident.id}; "
+        f"broadcasting to topic {topic} ({len(unsynced)} not subscribed yet)"
+    )
+    sent = messaging_service.send_to_topic(topic, incident_data)
+    log = NotificationLog(
+        incident=incident,
+        device_id=topic,
+        fcm_token='',
+        success=sent,
+        error_message=None if sent else "Failed to send to topic",
+    )
+    return log, unsynced
+
+
+def _send_batch(messaging_service, incident, incident_data, batch):
+    """
+    Send an incident to one batch of devices and prune dead tokens.
+    
+    Args:
+        batch: List of (device_id_hash, device_id, fcm_token) tuples
+        
+    Returns:
+        Tuple (send result, unsaved NotificationLog objects)
+    """
+    from push_notifications.models import NotificationLog
+    
+    fcm_tokens = [token for _, _, token in batch]
+    
+    logger.info(f"Sending notifications to {len(fcm_tokens)} devices")
+    result = messaging_service.send_incident_notification(
+        fcm_tokens=fcm_tokens,
+        incident_data=incident_data,
+    )
+    
+    # Stop sending to tokens FCM will never deliver to
+    if result.get('dead_tokens'):
+        deactivate_dead_tokens(batch, result['dead_tokens'])
+    
+    failed_tokens = set(result.get('failed_tokens', []))
+    token_errors = result.get('token_errors', {})
+    logs = [
+        NotificationLog(
+            incident=incident,
+            device_id=device_id,
+            fcm_token=fcm_token,
+            success=fcm_token not in failed_tokens,
+            error_message=(
+                None if fcm_token not in failed_tokens
+                else f"Failed to send ({token_errors.get(fcm_token, 'unknown')})"
+            ),
+        )
+        for _, device_id, fcm_token in batch
+    ]
+    return result, logs
 
 
 def send_incident_notifications(incident):
     """
     Send push notifications for a new incident to users with matching safe zones.
     
+    When more than NOTIFICATION_TOPIC_THRESHOLD devices match, the incident is
+    broadcast once to the FCM topic of its geohash cell instead of being sent
+    to each device; matched devices not subscribed to that topic yet are
+    still sent to directly (see push_notifications.topics).
+    
     Args:
         incident: Incident model instance
     """
-    from push_notifications.services import FirebaseMessagingService
+    from push_notifications.services import get_messaging_service
     from push_notifications.models import NotificationLog
     
     try:
-        # Get devices that should be notified
-        devices = get_devices_to_notify(incident.latitude, incident.longitude)
+        messaging_service = get_messaging_service()
+        incident_data = _incident_payload(incident)
         
-        if not devices:
+        matching_device_hashes = get_matching_device_hashes(
+            incident.latitude, incident.longitude,
+        )
+        if not matching_device_hashes:
             logger.info(
                 f"No users to notify for incident {incident.id} - "
                 f"either no safe zones configured or incident not within any safe zones"
             )
             return
         
-        # Extract FCM tokens
-        fcm_tokens = [token for _, token in devices]
-        
-        # Prepare incident data
-        incident_data = {
-            'id': incident.id,
-            'category': incident.category,
-            'latitude': incident.latitude,
-            'longitude': incident.longitude,
-            'title': incident.title,
-            'description': incident.description or '',
-            'timestamp': incident.timestamp.isoformat(),
-        }
-        
-        # Send notifications
-        logger.info(f"Sending notifications to {len(fcm_tokens)} devices")
-        result = FirebaseMessagingService.send_incident_notification(
-            fcm_tokens=fcm_tokens,
-            incident_data=incident_data,
-        )
-        
-        # Log notification results
-        for device_id, fcm_token in devices:
-            is_success = fcm_token not in result.get('failed_tokens', [])
-            
-            NotificationLog.objects.create(
-                incident=incident,
-                device_id=device_id,
-                fcm_token=fcm_token,
-                success=is_success,
-                error_message=None if is_success else "Failed to send",
+        # Broadcast to the cell topic in dense areas
+        if _exceeds_topic_threshold(len(matching_device_hashes)):
+            log, matching_device_hashes = _broadcast_to_topic(
+                messaging_service, incident, incident_data, matching_device_hashes,
             )
+            log.save()
+        
+        batch_size = getattr(settings, 'NOTIFICATION_SEND_BATCH_SIZE', 500)
+        devices = _unique_token_rows(_iter_token_rows(matching_device_hashes))
+        
+        total_success = 0
+        total_failed = 0
+        
+        # Send and log one batch at a time instead of materializing every device
+        for batch in _batched(devices, batch_size):
+            result, logs = _send_batch(messaging_service, incident, incident_data, batch)
+            total_success += result['success']
+            total_failed += result['failed']
+            NotificationLog.objects.bulk_create(logs)
         
         logger.info(
             f"Notification results for incident {incident.id}: "
-            f"{result['success']} successful, {result['failed']} failed"
+            f"{total_success} successful, {total_failed} failed"
         )
     
     except Exception as e:
         logger.error(f"Error sending incident notifications: {e}")
+
+
+def send_bulk_incident_notifications(incidents):
+    """
+    Send push notifications for a batch of new incidents.
+    
+    Safe zones are matched in memory for every incident, then the device
+    tokens of all matched devices are resolved together in chunked queries
+    instead of once per incident. Notification logs are written with one
+    bulk insert and tokens found dead while sending are skipped for the
+    remaining incidents.
+    
+    Args:
+        incidents: Iterable of Incident model instances
+        
+    Returns:
+        Dictionary with the number of incidents notified, topic broadcasts,
+        and successful and failed sends
+    """
+    from push_notifications.services import get_messaging_service
+    from push_notifications.models import NotificationLog
+    
+    summary = {'incidents_notified': 0, 'topic_broadcasts': 0, 'success': 0, 'failed': 0}
+    
+    try:
+        messaging_service = get_messaging_service()
+        index = get_safe_zone_index()
+        
+        matches = []
+        for incident in incidents:
+            device_id_hashes = {
+                zone.device_id_hash
+                for zone in index.match(incident.latitude, incident.longitude)
+            }
+            if device_id_hashes:
+                matches.append((incident, device_id_hashes))
+        
+        if not matches:
+            logger.info("No safe zones contain any incident in the batch - no notifications will be sent")
+            return summary
+        
+        logs = []
+        direct = []
+        notified = set()
+        for incident, device_id_hashes in matches:
+            if _exceeds_topic_threshold(len(device_id_hashes)):
+                log, device_id_hashes = _broadcast_to_topic(
+                    messaging_service, incident, _incident_payload(incident), device_id_hashes,
+                )
+                logs.append(log)
+                summary['topic_broadcasts'] += 1
+                notified.add(incident.id)
+            if device_id_hashes:
+                direct.append((incident, device_id_hashes))
+        
+        # Resolve tokens for every matched device at once
+        devices_by_hash = {}
+        for device_id_hash, device_id, fcm_token in _iter_token_rows(
+            set().union(*(hashes for _, hashes in direct)),
+        ):
+            if fcm_token:
+                devices_by_hash.setdefault(device_id_hash, []).append((device_id_hash, device_id, fcm_token))
+        
+        batch_size = getattr(settings, 'NOTIFICATION_SEND_BATCH_SIZE', 500)
+        dead_tokens = set()
+        
+        for incident, device_id_hashes in direct:
+            devices = {}
+            for device_id_hash in sorted(device_id_hashes):
+                for row in devices_by_hash.get(device_id_hash, ()):
+                    if row[2] not in dead_tokens:
+                        devices.setdefault(row[2], row)
+            if not devices:
+                continue
+            
+            incident_data = _incident_payload(incident)
+            notified.add(incident.id)
+            for batch in _batched(devices.values(), batch_size):
+                result, batch_logs = _send_batch(messaging_service, incident, incident_data, batch)
+                summary['success'] += result['success']
+                summary['failed'] += result['failed']
+                dead_tokens.update(result.get('dead_tokens', ()))
+                logs.extend(batch_logs)
+        
+        NotificationLog.objects.bulk_create(logs, batch_size=batch_size)
+        summary['incidents_notified'] = len(notified)
+        
+        logger.info(
+            f"Bulk notification results for {len(matches)} incident(s): "
+            f"{summary['success']} successful, {summary['failed']} failed, "
+            f"{summary['topic_broadcasts']} topic broadcast(s)"
+        )
+    
+    except Exception as e:
+        logger.error(f"Error sending bulk incident notifications: {e}")
+    
+    return summary
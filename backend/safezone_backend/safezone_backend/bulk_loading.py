@@ -0,0 +1,242 @@
+"""
+Streaming dataset readers and batched upserts for reference data loaders.
+
+Datasets are read record by record, so files of any size load in constant
+memory:
+
+- CSV files yield one dictionary per row.
+- JSON files hold an array of objects, or a GeoJSON FeatureCollection.
+  The array is decoded one element at a time rather than as a whole.
+- NDJSON / GeoJSON sequence files hold one object per line.
+
+GeoJSON features are flattened to their properties, plus `latitude` and
+`longitude` from Point geometries and `id` from the feature id.
+
+Records are written with bulk_create(update_conflicts=True) keyed on a
+model's natural key, so loading a dataset again updates rows in place
+instead of duplicating them, and rows missing from the dataset are left
+untouched.
+"""
+
+import csv
+import io
+import json
+import os
+
+# File extensions and the format they are read as
+FORMATS_BY_EXTENSION = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.geojson': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.geojsonl': 'ndjson',
+    '.geojsons': 'ndjson',
+}
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def detect_format(path):
+    """Return the dataset format for a file name, or None if unknown."""
+    return FORMATS_BY_EXTENSION.get(os.path.splitext(str(path))[1].lower())
+
+
+class _JSONStream:
+    """Incremental reader of a JSON document from a text stream."""
+
+    def __init__(self, fileobj, chunk_size=64 * 1024):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read the next chunk; return False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.fileobj.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop consumed text so the buffer stays about one chunk long
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        """Consume the next non-whitespace character, which must be char."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f'Invalid JSON: expected {char!r}, found {found!r}')
+        self.pos += 1
+
+    def value(self):
+        """Decode and consume the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def array(self):
+        """Yield the elements of the array starting at the current position."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return
+
+
+def _iter_json(fileobj):
+    """Yield the objects of a JSON array or the features of a FeatureCollection."""
+    stream = _JSONStream(fileobj)
+    if stream.peek() == '[':
+        yield from stream.array()
+        return
+
+    stream.expect('{')
+    while stream.peek() != '}':
+        key = stream.value()
+        stream.expect(':')
+        if key == 'features' and stream.peek() == '[':
+            yield from stream.array()
+        else:
+            stream.value()
+        if stream.peek() == ',':
+            stream.pos += 1
+
+
+def _iter_ndjson(fileobj):
+    for line in fileobj:
+        # GeoJSON text sequences prefix each record with a record separator
+        line = line.strip().lstrip('\x1e')
+        if line:
+            yield json.loads(line)
+
+
+def flatten_feature(record):
+    """Flatten a GeoJSON feature to a record; other records are returned unchanged."""
+    if not isinstance(record, dict) or record.get('type') != 'Feature':
+        return record
+
+    flat = dict(record.get('properties') or {})
+    if record.get('id') is not None:
+        flat.setdefault('id', record['id'])
+    geometry = record.get('geometry') or {}
+    if geometry.get('type') == 'Point':
+        longitude, latitude = geometry['coordinates'][:2]
+        flat.setdefault('latitude', latitude)
+        flat.setdefault('longitude', longitude)
+    return flat
+
+
+def parse_bool(value, default=True):
+    """
+    Read a boolean dataset field.
+
+    Blank or missing values give default; the strings '0', 'false' and
+    'no' (in any case) are false and any other string is true.
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() not in ('0', 'false', 'no')
+    return bool(value)
+
+
+def iter_records(source, format=None):
+    """
+    Stream the records of a dataset.
+
+    Args:
+        source: File path or readable text stream
+        format: 'csv', 'json' or 'ndjson' (default: from the file extension)
+
+    Yields:
+        One dictionary per record
+    """
+    if format is None:
+        format = detect_format(getattr(source, 'name', source))
+    readers = {
+        'csv': lambda f: csv.DictReader(f),
+        'json': _iter_json,
+        'ndjson': _iter_ndjson,
+    }
+    if format not in readers:
+        raise ValueError(f'Unknown dataset format for {source!r}; use csv, json or ndjson')
+
+    if isinstance(source, io.IOBase) or hasattr(source, 'read'):
+        for record in readers[format](source):
+            yield flatten_feature(record)
+        return
+
+    with open(source, encoding='utf-8-sig', newline='') as f:
+        for record in readers[format](f):
+            yield flatten_feature(record)
+
+
+def upsert(model, objects, unique_fields, update_fields, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insert objects in batches, updating rows that already exist.
+
+    Objects sharing a natural key within a batch are collapsed to the last
+    one, as a single INSERT ... ON CONFLICT cannot touch a row twice.
+
+    Args:
+        model: Model class; unique_fields must be covered by a unique constraint
+        objects: Iterable of unsaved model instances
+        unique_fields: Natural key field names
+        update_fields: Fields overwritten on existing rows
+        batch_size: Number of objects per INSERT
+
+    Returns:
+        Number of objects written
+    """
+    written = 0
+    batch = {}
+
+    def flush():
+        nonlocal written
+        if batch:
+            model.objects.bulk_create(
+                list(batch.values()),
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=update_fields,
+            )
+            written += len(batch)
+            batch.clear()
+
+    for obj in objects:
+        batch[tuple(getattr(obj, field) for field in unique_fields)] = obj
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return written
@@ -0,0 +1,183 @@
+"""
+Streaming user data exports for GDPR data portability.
+
+Every section of an export is read with an indexed device_id_hash query and
+.iterator(), and written to the output as it is read, so memory stays flat
+however many incidents or confirmations a user has. Exports are written as
+a single JSON document or as a zip archive holding one NDJSON file per
+device.
+"""
+
+import io
+import json
+import zipfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+# Sections holding a single object; all other sections are lists
+SINGLE_OBJECT_SECTIONS = ('preferences', 'profile')
+
+
+def _chunk_size():
+    return getattr(settings, 'USER_DATA_EXPORT_CHUNK_SIZE', 1000)
+
+
+def _rows(queryset, fields):
+    """Yield rows as dictionaries with datetimes in ISO 8601 format."""
+    for row in queryset.values(*fields).iterator(chunk_size=_chunk_size()):
+        yield {
+            key: value.isoformat() if hasattr(value, 'isoformat') else value
+            for key, value in row.items()
+        }
+
+
+def iter_user_data_sections(device_id_hash):
+    """
+    Yield (section, records) pairs with all data held about a device.
+
+    Records are lazy iterators and must be consumed in order.
+    """
+    from user_settings.models import UserDevice, UserPreferences, SafeZone
+    from incident_reporting.models import Incident
+    from scoring.models import UserProfile, Badge, IncidentConfirmation
+
+    yield 'devices', _rows(
+        UserDevice.objects.filter(device_id_hash=device_id_hash).order_by('pk'),
+        ['platform', 'created_at', 'updated_at', 'is_active'],
+    )
+    yield 'preferences', _rows(
+        UserPreferences.objects.filter(device_id_hash=device_id_hash).order_by('pk')[:1],
+        [
+            'alert_radius',
+            'default_zoom',
+            'push_notifications',
+            'proximity_alerts',
+            'sound_vibration',
+            'anonymous_reporting',
+            'created_at',
+            'updated_at',
+        ],
+    )
+    yield 'safe_zones', _rows(
+        SafeZone.objects.filter(device_id_hash=device_id_hash).order_by('pk'),
+        ['name', 'zone_type', 'latitude', 'longitude', 'radius', 'is_active', 'created_at'],
+    )
+    yield 'incidents', _rows(
+        Incident.objects.filter(reporter_device_id_hash=device_id_hash).order_by('pk'),
+        [
+            'id',
+            'category',
+            'latitude',
+            'longitude',
+            'title',
+            'description',
+            'timestamp',
+            'confirmed_by',
+            'notify_nearby',
+        ],
+    )
+    yield 'profile', _rows(
+        UserProfile.objects.filter(device_id_hash=device_id_hash)[:1],
+        [
+            'total_points',
+            'reports_count',
+            'confirmations_count',
+            'current_tier',
+            'verified_reports',
+            'created_at',
+            'updated_at',
+        ],
+    )
+    yield 'badges', _rows(
+        Badge.objects.filter(profile__device_id_hash=device_id_hash).order_by('pk'),
+        ['badge_type', 'earned_at'],
+    )
+    yield 'confirmations', _rows(
+        IncidentConfirmation.objects.filter(device_id_hash=device_id_hash).order_by('pk'),
+        ['incident_id', 'confirmed_at'],
+    )
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def write_user_data_json(device_id, output):
+    """
+    Write a device's data to a text stream as one JSON document.
+
+    The document has the same keys as export_user_data(); single-object
+    sections are {} when there is no data.
+
+    Args:
+        device_id: The device identifier to export data for
+        output: Writable text stream
+    """
+    from user_settings.models import hash_device_id
+
+    output.write('{')
+    output.write(f'"device_id": {_dumps(device_id)}, ')
+    output.write(f'"export_date": {_dumps(timezone.now().isoformat())}')
+
+    for section, records in iter_user_data_sections(hash_device_id(device_id)):
+        output.write(f', {_dumps(section)}: ')
+        if section in SINGLE_OBJECT_SECTIONS:
+            output.write(_dumps(next(records, {})))
+            continue
+
+        output.write('[')
+        for index, record in enumerate(records):
+            if index:
+                output.write(', ')
+            output.write(_dumps(record))
+        output.write(']')
+
+    output.write('}')
+
+
+def write_user_data_ndjson(device_id, output):
+    """
+    Write a device's data to a text stream as NDJSON.
+
+    The first line holds the export metadata; every following line is one
+    record as {"section": ..., "data": {...}}.
+    """
+    from user_settings.models import hash_device_id
+
+    output.write(_dumps({
+        'section': 'export',
+        'data': {'device_id': device_id, 'export_date': timezone.now().isoformat()},
+    }) + '\n')
+
+    for section, records in iter_user_data_sections(hash_device_id(device_id)):
+        for record in records:
+            output.write(_dumps({'section': section, 'data': record}) + '\n')
+
+
+def write_user_data_archive(device_ids, fileobj):
+    """
+    Write a zip archive with one NDJSON file per device.
+
+    Members are named after the device ID hash and compressed as they are
+    written, so the archive never holds a whole export in memory.
+
+    Args:
+        device_ids: Iterable of device identifiers
+        fileobj: Writable binary file object or path
+
+    Returns:
+        Number of devices exported
+    """
+    from user_settings.models import hash_device_id
+
+    count = 0
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for device_id in device_ids:
+            name = f'{hash_device_id(device_id)}.ndjson'
+            member = archive.open(name, 'w', force_zip64=True)
+            with io.TextIOWrapper(member, encoding='utf-8') as output:
+                write_user_data_ndjson(device_id, output)
+            count += 1
+    return count
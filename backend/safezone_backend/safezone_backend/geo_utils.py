@@ -0,0 +1,361 @@
+"""
+Geospatial helpers shared across SafeZone apps.
+
+This module provides utilities for:
+- Geohash encoding and cell bounds
+- Bounding boxes around a point and radius
+- Enumerating the geohash cells that cover a bounding box
+- A regular latitude/longitude grid for nearest-neighbour searches
+"""
+
+import heapq
+import threading
+from math import asin, ceil, cos, degrees, radians, sin
+
+from alerts.utils import haversine_distance
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Approximate length of one degree of latitude in meters
+METERS_PER_DEGREE = 111320.0
+
+# Mean radius of the Earth, as used by haversine_distance()
+EARTH_RADIUS_KM = 6371.0
+
+
+def geohash_encode(latitude, longitude, precision):
+    """
+    Encode a coordinate as a geohash string.
+
+    Args:
+        latitude: Latitude in degrees
+        longitude: Longitude in degrees
+        precision: Number of characters in the resulting geohash
+
+    Returns:
+        Geohash string of the requested precision
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash):
+    """
+    Return the bounding box of a geohash cell.
+
+    Returns:
+        Tuple (min_lat, min_lon, max_lat, max_lon)
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lon_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def geohash_cell_size(precision):
+    """
+    Return the size of a geohash cell in degrees.
+
+    Returns:
+        Tuple (lat_degrees, lon_degrees)
+    """
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def bounding_box(latitude, longitude, radius_meters):
+    """
+    Compute a bounding box that fully contains a circle on the Earth.
+
+    Longitudes may fall outside [-180, 180] when the circle crosses the
+    antimeridian; geohash_cells_covering() wraps them.
+
+    Returns:
+        Tuple (min_lat, min_lon, max_lat, max_lon)
+    """
+    # Same Earth radius as haversine_distance(), so a point at exactly the
+    # radius is never left outside the box
+    delta_lat = degrees(radius_meters / (EARTH_RADIUS_KM * 1000))
+    min_lat = max(latitude - delta_lat, -90.0)
+    max_lat = min(latitude + delta_lat, 90.0)
+
+    # Use the widest parallel inside the box so the circle is always covered
+    widest = max(abs(min_lat), abs(max_lat))
+    cos_lat = cos(radians(widest))
+    if cos_lat <= 1e-6 or min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+
+    delta_lon = delta_lat / cos_lat
+    if delta_lon >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+
+    return min_lat, longitude - delta_lon, max_lat, longitude + delta_lon
+
+
+def geohash_cells_covering(min_lat, min_lon, max_lat, max_lon, precision):
+    """
+    Enumerate the geohash cells of a given precision that intersect a box.
+
+    Args:
+        min_lat, min_lon, max_lat, max_lon: Box corners in degrees
+        precision: Geohash precision of the returned cells
+
+    Returns:
+        Set of geohash strings
+    """
+    cell_lat, cell_lon = geohash_cell_size(precision)
+    cells = set()
+
+    # Snap the box to the cell grid, stepping through cell centers
+    lat = (int((min_lat + 90.0) // cell_lat) * cell_lat) - 90.0 + cell_lat / 2
+    while lat - cell_lat / 2 <= max_lat and lat < 90.0:
+        if max_lon - min_lon >= 360.0:
+            start_lon, end_lon = -180.0, 180.0 - cell_lon / 2
+        else:
+            start_lon, end_lon = min_lon, max_lon
+
+        lon = (int((start_lon + 180.0) // cell_lon) * cell_lon) - 180.0 + cell_lon / 2
+        while lon - cell_lon / 2 <= end_lon:
+            wrapped_lon = ((lon + 180.0) % 360.0) - 180.0
+            cells.add(geohash_encode(lat, wrapped_lon, precision))
+            lon += cell_lon
+        lat += cell_lat
+
+    return cells
+
+
+def geohash_cell_count(min_lat, min_lon, max_lat, max_lon, precision):
+    """Estimate how many cells geohash_cells_covering() returns, without enumerating them."""
+    cell_lat, cell_lon = geohash_cell_size(precision)
+    rows = ceil((max_lat - min_lat) / cell_lat) + 1
+    columns = min(ceil((max_lon - min_lon) / cell_lon) + 1, ceil(360.0 / cell_lon))
+    return rows * columns
+
+
+def geohash_cells_for_radius(latitude, longitude, radius_meters, precision):
+    """Return the geohash cells covering a circle of the given radius."""
+    return geohash_cells_covering(
+        *bounding_box(latitude, longitude, radius_meters),
+        precision,
+    )
+
+
+def grid_shape(cell_size):
+    """Return the number of rows and columns of a grid with cells of cell_size degrees."""
+    return ceil(180 / cell_size), ceil(360 / cell_size)
+
+
+def grid_cell(latitude, longitude, cell_size):
+    """Return the (row, column) of the grid cell containing a point."""
+    rows, columns = grid_shape(cell_size)
+    row = min(max(int((latitude + 90) // cell_size), 0), rows - 1)
+    column = int((longitude + 180) // cell_size) % columns
+    return row, column
+
+
+def grid_ring(row, column, radius, cell_size):
+    """
+    Yield the grid cells at Chebyshev distance radius from a cell.
+
+    Columns wrap around the antimeridian; rows stop at the poles.
+    """
+    rows, columns = grid_shape(cell_size)
+    seen = set()
+    for ring_row in range(row - radius, row + radius + 1):
+        if not 0 <= ring_row < rows:
+            continue
+        if abs(ring_row - row) == radius:
+            ring_columns = range(column - radius, column + radius + 1)
+        else:
+            ring_columns = (column - radius, column + radius)
+        for ring_column in ring_columns:
+            cell = (ring_row, ring_column % columns)
+            if cell not in seen:
+                seen.add(cell)
+                yield cell
+
+
+def grid_ring_distance_km(latitude, radius, cell_size):
+    """
+    Return a lower bound on the distance in km from a point to any grid cell
+    at least radius rings away from the point's cell.
+
+    Such a cell is at least radius - 1 whole cells away in latitude or in
+    longitude; the longitude bound is the distance to the nearest meridian
+    that far away, which holds at any latitude.
+    """
+    degrees = max(radius - 1, 0) * cell_size
+    latitude_km = radians(degrees) * EARTH_RADIUS_KM
+    longitude_km = EARTH_RADIUS_KM * asin(
+        min(1.0, cos(radians(latitude)) * sin(radians(min(degrees, 90))))
+    )
+    return min(latitude_km, longitude_km)
+
+
+class PointGridIndex:
+    """
+    Thread-safe in-memory grid of points for nearest-neighbour queries.
+
+    Points are bucketed into cells of cell_size degrees. A query scans
+    rings of cells around the point and stops once no unscanned point can
+    be closer than the k-th best match, so only nearby cells are visited.
+    """
+
+    def __init__(self, cell_size=0.1):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._points = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def insert(self, key, latitude, longitude, value=None):
+        """Insert or move a point."""
+        cell = grid_cell(latitude, longitude, self.cell_size)
+        with self._lock:
+            self.remove(key)
+            self._cells.setdefault(cell, {})[key] = (latitude, longitude, value)
+            self._points[key] = cell
+
+    def remove(self, key):
+        """Remove a point if present."""
+        with self._lock:
+            cell = self._points.pop(key, None)
+            if cell is None:
+                return
+            bucket = self._cells[cell]
+            del bucket[key]
+            if not bucket:
+                del self._cells[cell]
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Find the points inside a bounding box.
+
+        Only the cells overlapping the box are visited, or every cell when
+        the box spans more cells than the index holds.
+
+        Returns:
+            List of (key, latitude, longitude, value) tuples
+        """
+        min_row, min_column = grid_cell(min_lat, min_lon, self.cell_size)
+        max_row, _ = grid_cell(max_lat, max_lon, self.cell_size)
+        # grid_cell wraps longitude 180 back to column 0
+        max_column = min(int((max_lon + 180) // self.cell_size), grid_shape(self.cell_size)[1] - 1)
+        rows = range(min_row, max_row + 1)
+        columns = range(min_column, max_column + 1)
+
+        matches = []
+        with self._lock:
+            if len(rows) * len(columns) > len(self._cells):
+                buckets = self._cells.values()
+            else:
+                buckets = [
+                    self._cells[(row, column)]
+                    for row in rows
+                    for column in columns
+                    if (row, column) in self._cells
+                ]
+            for bucket in buckets:
+                for key, (latitude, longitude, value) in bucket.items():
+                    if min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon:
+                        matches.append((key, latitude, longitude, value))
+        return matches
+
+    def nearest(self, latitude, longitude, k=1, max_distance_km=None, predicate=None):
+        """
+        Find the k nearest points.
+
+        Args:
+            latitude, longitude: Query point
+            k: Maximum number of points to return
+            max_distance_km: Ignore points further away than this
+            predicate: Optional function of a point's value; points for
+                which it returns False are skipped
+
+        Returns:
+            List of (distance_km, key, value) tuples, nearest first
+        """
+        limit = max_distance_km if max_distance_km is not None else float('inf')
+        row, column = grid_cell(latitude, longitude, self.cell_size)
+        max_radius = max(grid_shape(self.cell_size))
+
+        # Max-heap (negated distances) of the k best matches so far
+        best = []
+
+        def consider(key, point):
+            point_latitude, point_longitude, value = point
+            if predicate is not None and not predicate(value):
+                return
+            distance = haversine_distance(longitude, latitude, point_longitude, point_latitude)
+            if distance > limit:
+                return
+            if len(best) < k:
+                heapq.heappush(best, (-distance, key, value))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, key, value))
+
+        with self._lock:
+            for radius in range(max_radius + 1):
+                bound = grid_ring_distance_km(latitude, radius, self.cell_size)
+                if bound > limit or (len(best) == k and -best[0][0] <= bound):
+                    break
+                if (2 * radius + 1) ** 2 > len(self._cells):
+                    # The ring has more cells than the index; check every point instead
+                    best = []
+                    for bucket in self._cells.values():
+                        for key, point in bucket.items():
+                            consider(key, point)
+                    break
+                for cell in grid_ring(row, column, radius, self.cell_size):
+                    for key, point in self._cells.get(cell, {}).items():
+                        consider(key, point)
+
+        return sorted((-distance, key, value) for distance, key, value in best)
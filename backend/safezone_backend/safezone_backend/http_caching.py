@@ -0,0 +1,134 @@
+"""
+Conditional GET and response caching for near-static API content.
+
+Views using ConditionalContentMixin compute a content version for each
+request with a single aggregate query (row count and latest updated_at of
+the queryset being served) and derive a strong ETag from it:
+
+- A request whose If-None-Match matches gets an empty 304 response, so
+  clients that already hold the content skip the download entirely.
+- Otherwise the JSON body is served from a cache of pre-rendered bytes
+  keyed on the ETag, so the rows are only queried and serialized once per
+  content version.
+
+Saving or deleting a model bumps its content generation, which is part of
+every ETag, so cached bodies are dropped as soon as the content changes
+in this process. Changes made elsewhere (other workers, bulk loads) move
+updated_at or the row count and produce a new version as well.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+GENERATION_KEY = 'content-generation:{}'
+BODY_KEY = 'content-body:{}'
+
+
+def get_content_generation(model):
+    """Return the current content generation of a model."""
+    return cache.get_or_set(GENERATION_KEY.format(model._meta.label_lower), 0, timeout=None)
+
+
+def bump_content_generation(model):
+    """Invalidate the cached responses built from a model's rows."""
+    key = GENERATION_KEY.format(model._meta.label_lower)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def etag_matches(etag, if_none_match):
+    """Check an If-None-Match header against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    if '*' in etags:
+        return True
+    return any(candidate.removeprefix('W/') == etag for candidate in etags)
+
+
+class ConditionalContentMixin:
+    """
+    Add ETags, 304 responses and a rendered-body cache to a read-only view.
+
+    Responses carry `Cache-Control: <cache_control>, max-age=CONTENT_CACHE_MAX_AGE`.
+    Views whose content requires authentication should use 'private'.
+    """
+    cache_control = 'public'
+
+    def get_version_queryset(self):
+        """Return the rows the response is built from."""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_content_version(self, queryset):
+        """Return (row count, latest updated_at) of the content being served."""
+        version = queryset.order_by().aggregate(
+            count=Count('pk'),
+            updated_at=Max('updated_at'),
+        )
+        return version['count'], version['updated_at']
+
+    def get_etag(self, request):
+        """Build a strong ETag for the response to this request."""
+        queryset = self.get_version_queryset()
+        count, updated_at = self.get_content_version(queryset)
+        key = '|'.join([
+            queryset.model._meta.label_lower,
+            str(get_content_generation(queryset.model)),
+            str(count),
+            updated_at.isoformat() if updated_at else '',
+            request.accepted_renderer.format,
+            request.build_absolute_uri(),
+        ])
+        return '"' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '"'
+
+    def _set_caching_headers(self, response, etag):
+        response['ETag'] = etag
+        patch_cache_control(
+            response,
+            **{self.cache_control: True},
+            max_age=getattr(settings, 'CONTENT_CACHE_MAX_AGE', 300),
+        )
+        return response
+
+    def get(self, request, *args, **kwargs):
+        """Answer from the client's copy or the body cache when the content is unchanged."""
+        etag = self.get_etag(request)
+        self.response_etag = etag
+
+        if etag_matches(etag, request.META.get('HTTP_IF_NONE_MATCH')):
+            return self._set_caching_headers(HttpResponseNotModified(), etag)
+
+        cached = cache.get(BODY_KEY.format(etag))
+        if cached is not None:
+            content, content_type = cached
+            return self._set_caching_headers(HttpResponse(content, content_type=content_type), etag)
+
+        return super().get(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, 'response_etag', None)
+        if etag is None or response.status_code != 200 or response.has_header('ETag'):
+            return response
+
+        # Only JSON is cached; the browsable API embeds per-user markup
+        if request.accepted_renderer.format == 'json':
+            response.render()
+            cache.set(
+                BODY_KEY.format(etag),
+                (response.content, response['Content-Type']),
+                timeout=getattr(settings, 'CONTENT_CACHE_TIMEOUT', 86400),
+            )
+        return self._set_caching_headers(response, etag)
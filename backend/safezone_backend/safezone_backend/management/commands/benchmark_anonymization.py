@@ -0,0 +1,114 @@
+"""
+Django management command to benchmark incident anonymization.
+
+Compares the set-based anonymize_old_incidents() with the previous
+approach of loading and saving every incident. Rows are generated inside a
+transaction that is rolled back, so the database is left untouched. The
+per-row approach runs on a sample and is extrapolated to the full size.
+
+Usage:
+    python manage.py benchmark_anonymization [--rows 1000000] [--per-row-sample 10000]
+"""
+
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from incident_reporting.models import Incident
+from safezone_backend.security_utils import ANONYMIZED_DESCRIPTION, anonymize_old_incidents
+
+
+def anonymize_per_row(queryset):
+    """Previous implementation: one SELECT and one UPDATE per incident."""
+    count = 0
+    for incident in queryset:
+        incident.latitude = round(incident.latitude, 2)
+        incident.longitude = round(incident.longitude, 2)
+        incident.description = ANONYMIZED_DESCRIPTION
+        incident.title = f"{incident.get_category_display()} - Historical"
+        incident.save()
+        count += 1
+    return count
+
+
+class Command(BaseCommand):
+    help = 'Benchmark set-based against per-row incident anonymization'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000000,
+            help='Number of old incidents to anonymize (default: 1000000)',
+        )
+        parser.add_argument(
+            '--per-row-sample',
+            type=int,
+            default=10000,
+            help='Incidents anonymized with the per-row approach before extrapolating (default: 10000)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Incidents per UPDATE statement (default: INCIDENT_ANONYMIZE_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        sample = min(options['per_row_sample'], rows)
+
+        with transaction.atomic():
+            self.stdout.write(f'Generating {rows} old incident(s)...')
+            self.generate_incidents(rows)
+
+            # Per-row approach on a sample of the rows
+            started = time.perf_counter()
+            anonymize_per_row(Incident.objects.order_by('pk')[:sample])
+            per_row_seconds = time.perf_counter() - started
+            estimated = per_row_seconds / sample * rows if sample else 0
+
+            started = time.perf_counter()
+            count = anonymize_old_incidents(batch_size=options['batch_size'])
+            set_based_seconds = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'Per-row:   {sample} row(s) in {per_row_seconds:.2f} s '
+            f'({sample / per_row_seconds if per_row_seconds else 0:.0f} rows/s), '
+            f'~{estimated:.1f} s for {rows} row(s)'
+        )
+        self.stdout.write(
+            f'Set-based: {count} row(s) in {set_based_seconds:.2f} s '
+            f'({count / set_based_seconds if set_based_seconds else 0:.0f} rows/s)'
+        )
+        if set_based_seconds:
+            self.stdout.write(
+                self.style.SUCCESS(f'✓ Set-based is ~{estimated / set_based_seconds:.0f}x faster')
+            )
+        self.stdout.write('Benchmark data rolled back')
+
+    def generate_incidents(self, rows, batch_size=10000):
+        """Insert old incidents with random categories and coordinates."""
+        retention_days = getattr(settings, 'INCIDENT_RETENTION_DAYS', 90)
+        timestamp = timezone.now() - timedelta(days=retention_days + 30)
+        categories = [value for value, _ in Incident.CATEGORY_CHOICES]
+        rng = random.Random(0)
+
+        for start in range(0, rows, batch_size):
+            Incident.objects.bulk_create([
+                Incident(
+                    category=rng.choice(categories),
+                    latitude=rng.uniform(-90, 90),
+                    longitude=rng.uniform(-180, 180),
+                    title='Benchmark incident',
+                    description='Benchmark description',
+                )
+                for _ in range(min(batch_size, rows - start))
+            ])
+        # timestamp is auto_now_add, so age the rows afterwards
+        Incident.objects.filter(title='Benchmark incident').update(timestamp=timestamp)
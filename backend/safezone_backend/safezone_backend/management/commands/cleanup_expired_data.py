@@ -2,7 +2,8 @@
 Django management command to clean up expired data according to retention policies.
 
 Usage:
-    python manage.py cleanup_expired_data [--dry-run]
+    python manage.py cleanup_expired_data [--dry-run] [--batch-size N]
+                                          [--sleep SECONDS] [--time-budget SECONDS]
 """
 
 from datetime import timedelta
@@ -27,6 +28,22 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be deleted without actually deleting',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Expired incidents deleted per batch (default: INCIDENT_CLEANUP_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            help='Seconds to pause between incident batches (default: INCIDENT_CLEANUP_BATCH_SLEEP)',
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=int,
+            help='Stop deleting incidents after this many seconds, 0 for no limit; '
+                 'the next run resumes (default: INCIDENT_CLEANUP_TIME_BUDGET)',
+        )
 
     def handle(self, *args, **options):
         dry_run = options.get('dry_run', False)
@@ -39,7 +56,12 @@ class Command(BaseCommand):
         # Clean up expired incidents
         self.stdout.write('Checking for expired incidents...')
         if not dry_run:
-            incidents_deleted = cleanup_expired_incidents()
+            incidents_deleted = cleanup_expired_incidents(
+                batch_size=options.get('batch_size'),
+                sleep_seconds=options.get('sleep'),
+                time_budget=options.get('time_budget'),
+                progress_callback=self.report_progress,
+            )
             self.stdout.write(
                 self.style.SUCCESS(f'✓ Deleted {incidents_deleted} expired incident(s)')
             )
@@ -91,3 +113,11 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.SUCCESS('Data cleanup complete!'))
         self.stdout.write('='*50)
+    
+    def report_progress(self, progress):
+        """Print progress after each batch of deleted incidents."""
+        self.stdout.write(
+            f"  Batch {progress['batch']}: {progress['deleted']} incident(s) and "
+            f"{progress['cascaded']} related row(s) deleted "
+            f"(up to id {progress['last_pk']}, {progress['elapsed']:.1f}s)"
+        )
@@ -0,0 +1,60 @@
+"""
+Django management command to erase user data for many devices (GDPR/CCPA).
+
+Usage:
+    python manage.py erase_user_data --device-id ID [--device-id ID ...]
+    python manage.py erase_user_data --device-ids-file ids.txt [--chunk-size 500]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from safezone_backend.security_utils import delete_users_data
+
+
+class Command(BaseCommand):
+    help = 'Erase all data held about devices; reported incidents are anonymized'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--device-id',
+            action='append',
+            default=[],
+            help='Device ID to erase (repeatable)',
+        )
+        parser.add_argument(
+            '--device-ids-file',
+            help='File with one device ID per line',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Devices erased per transaction (default: USER_DATA_ERASURE_CHUNK_SIZE)',
+        )
+
+    def iter_device_ids(self, options):
+        """Yield device IDs from the options and file without loading the file."""
+        yield from options['device_id']
+        if options['device_ids_file']:
+            with open(options['device_ids_file'], encoding='utf-8') as ids_file:
+                for line in ids_file:
+                    device_id = line.strip()
+                    if device_id:
+                        yield device_id
+
+    def handle(self, *args, **options):
+        if not options['device_id'] and not options['device_ids_file']:
+            raise CommandError('Provide --device-id or --device-ids-file')
+
+        result = delete_users_data(
+            self.iter_device_ids(options),
+            chunk_size=options['chunk_size'],
+        )
+
+        device_count = result.pop('device_ids')
+        elapsed = result.pop('elapsed_seconds')
+        anonymized = result.pop('incidents')
+        for name, count in result.items():
+            self.stdout.write(f"  {name.replace('_', ' ')}: {count} deleted")
+        self.stdout.write(f'  incidents: {anonymized} anonymized')
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Erased data for {device_count} device(s) in {elapsed:.2f}s')
+        )
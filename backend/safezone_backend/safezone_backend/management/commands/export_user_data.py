@@ -0,0 +1,78 @@
+"""
+Django management command to export user data for many devices (GDPR).
+
+Usage:
+    python manage.py export_user_data --device-id ID [--device-id ID ...] --output FILE
+    python manage.py export_user_data --device-ids-file ids.txt --output exports.zip
+    python manage.py export_user_data --device-id ID --format json [--output FILE]
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from safezone_backend.data_export import write_user_data_archive, write_user_data_json
+
+
+class Command(BaseCommand):
+    help = 'Export all data held about devices as a zip of NDJSON files or as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--device-id',
+            action='append',
+            default=[],
+            help='Device ID to export (repeatable)',
+        )
+        parser.add_argument(
+            '--device-ids-file',
+            help='File with one device ID per line',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['zip', 'json'],
+            default='zip',
+            help='zip: one NDJSON file per device; json: a JSON array of exports (default: zip)',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write to (required for zip, default stdout for json)',
+        )
+
+    def iter_device_ids(self, options):
+        """Yield device IDs from the options and file without loading the file."""
+        yield from options['device_id']
+        if options['device_ids_file']:
+            with open(options['device_ids_file'], encoding='utf-8') as ids_file:
+                for line in ids_file:
+                    device_id = line.strip()
+                    if device_id:
+                        yield device_id
+
+    def handle(self, *args, **options):
+        if not options['device_id'] and not options['device_ids_file']:
+            raise CommandError('Provide --device-id or --device-ids-file')
+
+        if options['format'] == 'zip':
+            if not options['output']:
+                raise CommandError('--output is required for zip exports')
+            count = write_user_data_archive(self.iter_device_ids(options), options['output'])
+        else:
+            output = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+            try:
+                count = self.write_json(self.iter_device_ids(options), output)
+            finally:
+                if options['output']:
+                    output.close()
+
+        self.stderr.write(self.style.SUCCESS(f'✓ Exported data for {count} device(s)'))
+
+    def write_json(self, device_ids, output):
+        count = 0
+        output.write('[')
+        for device_id in device_ids:
+            if count:
+                output.write(',\n')
+            write_user_data_json(device_id, output)
+            count += 1
+        output.write(']\n')
+        return count
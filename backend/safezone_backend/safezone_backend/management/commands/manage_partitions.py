@@ -0,0 +1,85 @@
+"""
+Django management command to maintain monthly table partitions (PostgreSQL).
+
+Creates the partitions for the coming months and, with --drop-expired,
+drops the partitions that are entirely past the retention period. Run it
+daily, before cleanup_expired_data. Does nothing unless
+TIME_PARTITIONING_ENABLED is set on a PostgreSQL database.
+
+Usage:
+    python manage.py manage_partitions [--convert] [--months-ahead 3]
+                                       [--drop-expired] [--retention-days 90]
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from safezone_backend import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions and drop expired ones (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Partition tables that are still stored as plain tables',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            help='Months after the current month to create partitions for '
+                 '(default: TIME_PARTITIONING_MONTHS_AHEAD)',
+        )
+        parser.add_argument(
+            '--drop-expired',
+            action='store_true',
+            help='Drop partitions whose rows are all older than the retention period',
+        )
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            help='Retention period in days (default: INCIDENT_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning.partitioning_enabled(connection):
+            self.stdout.write(self.style.WARNING(
+                'Time partitioning requires PostgreSQL with TIME_PARTITIONING_ENABLED; '
+                'nothing to do'
+            ))
+            return
+
+        for table, column in partitioning.PARTITIONED_TABLES.items():
+            if not partitioning.is_partitioned(table, connection):
+                if not options['convert']:
+                    self.stdout.write(self.style.WARNING(
+                        f'{table} is not partitioned; run with --convert to partition it'
+                    ))
+                    continue
+                with transaction.atomic():
+                    partitioning.partition_table(table, column, connection)
+                self.stdout.write(self.style.SUCCESS(f'✓ Partitioned {table} by month on {column}'))
+
+            created = partitioning.ensure_partitions(
+                table, column, months_ahead=options['months_ahead'], connection=connection,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Created {len(created)} partition(s) for {table}'
+            ))
+
+        if options['drop_expired']:
+            # Logs are never older than their incident, so this only drops
+            # rows that incident cleanup would delete through the cascade
+            retention_days = options['retention_days']
+            if retention_days is None:
+                retention_days = getattr(settings, 'INCIDENT_RETENTION_DAYS', 90)
+            cutoff = timezone.now() - timedelta(days=retention_days)
+            dropped = partitioning.drop_expired_partitions(cutoff, connection)
+            for name in dropped:
+                self.stdout.write(f'  Dropped {name}')
+            self.stdout.write(self.style.SUCCESS(f'✓ Dropped {len(dropped)} expired partition(s)'))
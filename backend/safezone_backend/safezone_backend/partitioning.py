@@ -0,0 +1,277 @@
+"""
+Monthly range partitioning of append-only tables on PostgreSQL.
+
+Notification logs grow with every push that is sent and are only read for
+recent time windows. With TIME_PARTITIONING_ENABLED on PostgreSQL the table
+is stored partitioned by month on sent_at: retention drops whole partitions
+instead of deleting rows one by one, and queries bounded on sent_at only
+scan the matching months. A DEFAULT partition catches rows outside the
+premade months, so inserts never fail when maintenance falls behind.
+
+Every helper is a no-op on other databases, so SQLite keeps the plain
+table layout.
+"""
+
+import logging
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Partitioned tables and their partition key column
+PARTITIONED_TABLES = {
+    'push_notifications_notificationlog': 'sent_at',
+}
+
+
+def month_start(value):
+    """Return the first day of the month containing a date or datetime."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Return the first day of the month count months after month."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    """Return the name of the partition holding a month of table."""
+    return f'{table}_p{month:%Y%m}'
+
+
+def _month_datetime(month):
+    """Return midnight UTC on the first day of month."""
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _bound(month):
+    """Format a month as a UTC timestamp literal for partition bounds."""
+    return _month_datetime(month).isoformat(sep=' ')
+
+
+def partitioning_enabled(connection=None):
+    """Return True when tables should be partitioned on this database."""
+    connection = connection or default_connection
+    return (
+        connection.vendor == 'postgresql'
+        and getattr(settings, 'TIME_PARTITIONING_ENABLED', False)
+    )
+
+
+def is_partitioned(table, connection=None):
+    """Return True if table is a partitioned table."""
+    connection = connection or default_connection
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s AND c.relkind = 'p'
+            """,
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table, connection=None):
+    """
+    List the monthly partitions of a table.
+
+    Returns:
+        Sorted list of (partition name, first day of month) tuples; the
+        DEFAULT partition is not included
+    """
+    connection = connection or default_connection
+    if not is_partitioned(table, connection):
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    prefix = f'{table}_p'
+    partitions = []
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions.append((name, date(int(suffix[:4]), int(suffix[4:]), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(table, column, month, connection=None):
+    """
+    Create the partition holding a month of table.
+
+    Rows of that month already stored in the DEFAULT partition are moved
+    into the new partition before it is attached.
+    """
+    connection = connection or default_connection
+    qn = connection.ops.quote_name
+    name = partition_name(table, month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {qn(name)} '
+            f'(LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)'
+        )
+        cursor.execute(
+            f'WITH moved AS ('
+            f'DELETE FROM {qn(table + "_default")} '
+            f'WHERE {qn(column)} >= %s AND {qn(column)} < %s RETURNING *'
+            f') INSERT INTO {qn(name)} SELECT * FROM moved',
+            [lower, upper],
+        )
+        cursor.execute(
+            f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} '
+            f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        )
+    logger.info(f"Created partition {name}")
+    return name
+
+
+def ensure_partitions(table, column, months_ahead=None, start=None, connection=None):
+    """
+    Create missing monthly partitions from start through months_ahead.
+
+    Args:
+        table: Partitioned table name
+        column: Partition key column
+        months_ahead: Months after the current month to create
+            (default: TIME_PARTITIONING_MONTHS_AHEAD)
+        start: First month to create (default: the current month)
+        connection: Database connection (default: the default database)
+
+    Returns:
+        Names of the partitions created
+    """
+    connection = connection or default_connection
+    if not is_partitioned(table, connection):
+        return []
+    if months_ahead is None:
+        months_ahead = getattr(settings, 'TIME_PARTITIONING_MONTHS_AHEAD', 3)
+
+    current = month_start(timezone.now())
+    month = month_start(start) if start else current
+    last = add_months(current, months_ahead)
+    existing = {partition_month for _, partition_month in list_partitions(table, connection)}
+
+    created = []
+    while month <= last:
+        if month not in existing:
+            created.append(create_partition(table, column, month, connection))
+        month = add_months(month, 1)
+    return created
+
+
+def drop_partitions_before(table, cutoff, connection=None):
+    """
+    Drop the monthly partitions whose rows are all older than cutoff.
+
+    Returns:
+        Names of the partitions dropped
+    """
+    connection = connection or default_connection
+    qn = connection.ops.quote_name
+
+    dropped = []
+    for name, month in list_partitions(table, connection):
+        if _month_datetime(add_months(month, 1)) > cutoff:
+            break
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {qn(name)}')
+        logger.info(f"Dropped expired partition {name}")
+        dropped.append(name)
+    return dropped
+
+
+def drop_expired_partitions(cutoff, connection=None):
+    """
+    Drop partitions older than cutoff from every partitioned table.
+
+    Returns:
+        Names of the partitions dropped
+    """
+    dropped = []
+    for table in PARTITIONED_TABLES:
+        dropped.extend(drop_partitions_before(table, cutoff, connection))
+    return dropped
+
+
+def partition_table(table, column, connection=None):
+    """
+    Convert a table into a table partitioned by month on column.
+
+    The table is renamed, recreated as a partitioned table with the same
+    columns, indexes and foreign keys, and its rows are copied into monthly
+    partitions. PostgreSQL requires the partition key in the primary key,
+    so the primary key becomes (id, column); ids stay unique because they
+    keep coming from a single sequence. Must run inside a transaction.
+    """
+    connection = connection or default_connection
+    qn = connection.ops.quote_name
+    legacy = f'{table}_legacy'
+    sequence = f'{table}_id_part_seq'
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}')
+
+        # LIKE ... INCLUDING INDEXES would copy the single-column primary key
+        cursor.execute(
+            """
+            SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype IN ('p', 'f')
+            """,
+            [legacy],
+        )
+        constraints = cursor.fetchall()
+        for name, kind, _ in constraints:
+            if kind == 'p':
+                cursor.execute(f'ALTER TABLE {qn(legacy)} DROP CONSTRAINT {qn(name)}')
+
+        cursor.execute(
+            f'CREATE TABLE {qn(table)} (LIKE {qn(legacy)} '
+            f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING INDEXES INCLUDING STORAGE) '
+            f'PARTITION BY RANGE ({qn(column)})'
+        )
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD PRIMARY KEY ("id", {qn(column)})')
+        for name, kind, definition in constraints:
+            if kind == 'f':
+                cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+
+        # Identity columns are not supported on partitioned tables before PostgreSQL 17
+        cursor.execute(f'CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}."id"')
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ALTER COLUMN \"id\" SET DEFAULT nextval('{sequence}')"
+        )
+        cursor.execute(
+            f'SELECT setval(%s, COALESCE(MAX("id"), 0) + 1, false) FROM {qn(legacy)}',
+            [sequence],
+        )
+
+        cursor.execute(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(table)} DEFAULT')
+        cursor.execute(f'SELECT MIN({qn(column)}) FROM {qn(legacy)}')
+        oldest = cursor.fetchone()[0]
+
+    # Create the partitions while the table is still empty, then copy the rows
+    ensure_partitions(table, column, start=oldest, connection=connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}')
+        cursor.execute(f'DROP TABLE {qn(legacy)}')
+    logger.info(f"Partitioned {table} by month on {column}")
@@ -7,24 +7,102 @@ This module provides utilities for:
 - Privacy compliance helpers
 """
 
+import logging
+import time
 from datetime import timedelta
+from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
+from safezone_backend.partitioning import drop_expired_partitions
 
+logger = logging.getLogger(__name__)
 
-def cleanup_expired_incidents():
+
+def cleanup_expired_incidents(batch_size=None, sleep_seconds=None, time_budget=None,
+                              progress_callback=None):
     """
     Delete incident reports older than the retention period.
+    
+    Incidents are deleted in primary key order, batch_size at a time, each
+    batch in its own transaction, so the cascade to alerts, confirmations
+    and notification logs only locks a bounded number of rows at once.
+    Sleeping between batches leaves room for concurrent writes. When the
+    time budget runs out the cleanup stops after the current batch; the
+    next run resumes with the incidents that are still expired. On
+    PostgreSQL with TIME_PARTITIONING_ENABLED, notification log partitions
+    older than the cutoff are dropped first.
+    
+    Args:
+        batch_size: Incidents deleted per batch (default: INCIDENT_CLEANUP_BATCH_SIZE)
+        sleep_seconds: Pause between batches (default: INCIDENT_CLEANUP_BATCH_SLEEP)
+        time_budget: Maximum run time in seconds, 0 for no limit
+            (default: INCIDENT_CLEANUP_TIME_BUDGET)
+        progress_callback: Called after each batch with a dict containing
+            batch, deleted, cascaded, last_pk and elapsed
+    
     Returns the number of incidents deleted.
     """
     from incident_reporting.models import Incident
     
+    if batch_size is None:
+        batch_size = getattr(settings, 'INCIDENT_CLEANUP_BATCH_SIZE', 1000)
+    if sleep_seconds is None:
+        sleep_seconds = getattr(settings, 'INCIDENT_CLEANUP_BATCH_SLEEP', 0.1)
+    if time_budget is None:
+        time_budget = getattr(settings, 'INCIDENT_CLEANUP_TIME_BUDGET', 0)
+    
     retention_days = getattr(settings, 'INCIDENT_RETENTION_DAYS', 90)
     cutoff_date = timezone.now() - timedelta(days=retention_days)
     
-    expired_incidents = Incident.objects.filter(timestamp__lt=cutoff_date)
-    count = expired_incidents.count()
-    expired_incidents.delete()
+    # With time partitioning, expired notification logs go a month at a
+    # time, so the cascade below finds few or none left to delete
+    drop_expired_partitions(cutoff_date)
+    
+    expired_incidents = Incident.objects.filter(timestamp__lt=cutoff_date).order_by('pk')
+    incident_label = Incident._meta.label
+    
+    started = time.monotonic()
+    count = 0
+    cascaded = 0
+    batch = 0
+    last_pk = 0
+    
+    while True:
+        pks = list(
+            expired_incidents.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            break
+        
+        with transaction.atomic():
+            _, deleted_by_model = Incident.objects.filter(pk__in=pks).delete()
+        
+        batch += 1
+        last_pk = pks[-1]
+        deleted = deleted_by_model.get(incident_label, 0)
+        count += deleted
+        cascaded += sum(deleted_by_model.values()) - deleted
+        elapsed = time.monotonic() - started
+        
+        if progress_callback:
+            progress_callback({
+                'batch': batch,
+                'deleted': count,
+                'cascaded': cascaded,
+                'last_pk': last_pk,
+                'elapsed': elapsed,
+            })
+        
+        if len(pks) < batch_size:
+            break
+        if time_budget and elapsed + sleep_seconds >= time_budget:
+            logger.info(
+                f"Incident cleanup stopped after {batch} batch(es) at time budget "
+                f"of {time_budget}s; {count} incident(s) deleted"
+            )
+            break
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
     
     return count
 
@@ -66,38 +144,108 @@ def cleanup_inactive_device_tokens():
     return count
 
 
-def anonymize_old_incidents():
+ANONYMIZED_DESCRIPTION = "Historical incident - details removed for privacy"
+
+
+def anonymize_old_incidents(batch_size=None):
     """
     Anonymize incident data older than retention period by removing
     identifying information while preserving aggregate statistics.
+    
+    Coordinates are rounded to 2 decimal places (~1km precision), the
+    description is replaced and the title is rebuilt from the category.
+    The incident coordinates copied onto alerts are rounded the same way.
+    Each chunk of batch_size incidents is anonymized with a single UPDATE
+    computed in the database, instead of loading and saving every row, and
+    its incidents are moved to the rollup cells of their rounded
+    coordinates in the same transaction. Incidents that are already
+    anonymized are skipped, so repeated runs only touch new rows. The
+    worker's incident cluster, route and risk indexes are discarded after
+    the commit; other workers pick up the new coordinates at their next
+    periodic rebuild.
+    
+    Args:
+        batch_size: Incidents updated per statement (default: INCIDENT_ANONYMIZE_BATCH_SIZE)
+    
     Returns the number of incidents anonymized.
     """
+    from django.db.models import Case, CharField, F, Value, When
+    from django.db.models.functions import Concat, Round
+    from alerts.models import Alert
     from incident_reporting.models import Incident
+    from incident_reporting.rollups import move_rollup_counts
+    
+    if batch_size is None:
+        batch_size = getattr(settings, 'INCIDENT_ANONYMIZE_BATCH_SIZE', 5000)
     
     retention_days = getattr(settings, 'INCIDENT_RETENTION_DAYS', 90)
     cutoff_date = timezone.now() - timedelta(days=retention_days)
     
-    # For incidents older than retention period, we could:
-    # - Round coordinates to reduce precision
-    # - Remove detailed descriptions
-    # - Keep only category and timestamp for trend analysis
+    # Same title as f"{incident.get_category_display()} - Historical"
+    category_display = Case(
+        *[
+            When(category=value, then=Value(label))
+            for value, label in Incident.CATEGORY_CHOICES
+        ],
+        default=F('category'),
+        output_field=CharField(),
+    )
+    anonymized_fields = {
+        'latitude': Round(F('latitude'), 2),
+        'longitude': Round(F('longitude'), 2),
+        'description': Value(ANONYMIZED_DESCRIPTION),
+        'title': Concat(category_display, Value(' - Historical'), output_field=CharField()),
+    }
+    
+    old_incidents = Incident.objects.filter(
+        timestamp__lt=cutoff_date,
+    ).exclude(description=ANONYMIZED_DESCRIPTION).order_by('pk')
+    count = 0
+    last_pk = 0
     
-    old_incidents = Incident.objects.filter(timestamp__lt=cutoff_date)
-    count = old_incidents.count()
+    while True:
+        with transaction.atomic():
+            rows = list(
+                old_incidents.filter(pk__gt=last_pk).values_list(
+                    'pk', 'latitude', 'longitude', 'timestamp', 'category',
+                )[:batch_size]
+            )
+            if not rows:
+                break
+            pks = [row[0] for row in rows]
+            
+            count += Incident.objects.filter(pk__in=pks).update(**anonymized_fields)
+            Alert.objects.filter(incident_id__in=pks).update(
+                incident_latitude=Round(F('incident_latitude'), 2),
+                incident_longitude=Round(F('incident_longitude'), 2),
+            )
+            # Read the rounded coordinates back so the rollups match the database
+            move_rollup_counts(rows, {
+                pk: (latitude, longitude)
+                for pk, latitude, longitude in Incident.objects.filter(pk__in=pks).values_list(
+                    'pk', 'latitude', 'longitude',
+                )
+            })
+        last_pk = pks[-1]
     
-    # Example anonymization (customize based on needs)
-    for incident in old_incidents:
-        # Round coordinates to 2 decimal places (~1km precision)
-        incident.latitude = round(incident.latitude, 2)
-        incident.longitude = round(incident.longitude, 2)
-        # Remove detailed description
-        incident.description = "Historical incident - details removed for privacy"
-        incident.title = f"{incident.get_category_display()} - Historical"
-        incident.save()
+    if count:
+        # QuerySet.update() skips the signals that keep the indexes in sync
+        transaction.on_commit(_reset_incident_indexes)
     
     return count
 
 
+def _reset_incident_indexes():
+    """Discard the worker's incident indexes so they are rebuilt on next use."""
+    from incident_reporting.clustering import reset_incident_cluster_index
+    from incident_reporting.risk_grid import reset_risk_grid
+    from incident_reporting.routes import reset_route_index
+    
+    reset_incident_cluster_index()
+    reset_route_index()
+    reset_risk_grid()
+
+
 def delete_user_data(device_id):
     """
     Delete all data associated with a device_id (for GDPR/CCPA compliance).
@@ -107,40 +255,132 @@ def delete_user_data(device_id):
         device_id: The device identifier to delete data for
         
     Returns:
-        dict: Summary of deleted items
+        dict: Summary of deleted items (see delete_users_data)
     """
+    return delete_users_data([device_id])
+
+
+def _erase_device_chunk(device_ids, deleted):
+    """Erase the data of one chunk of devices inside a transaction."""
+    from collections import defaultdict
     from user_settings.models import UserDevice, UserPreferences, SafeZone, hash_device_id
     from incident_reporting.models import Incident
+    from scoring.models import UserProfile, IncidentConfirmation
+    from push_notifications.models import NotificationLog, TopicSubscription
+    
+    device_id_hashes = {hash_device_id(device_id) for device_id in device_ids}
+    
+    with transaction.atomic():
+        # Remember topic subscriptions while the FCM tokens are still known
+        tokens_by_hash = defaultdict(list)
+        for device_id_hash, fcm_token in UserDevice.objects.filter(
+            device_id_hash__in=device_id_hashes,
+        ).values_list('device_id_hash', 'fcm_token'):
+            if fcm_token:
+                tokens_by_hash[device_id_hash].append(fcm_token)
+        tokens_by_topic = defaultdict(list)
+        for device_id_hash, topic in TopicSubscription.objects.filter(
+            device_id_hash__in=tokens_by_hash,
+        ).values_list('device_id_hash', 'topic'):
+            tokens_by_topic[topic].extend(tokens_by_hash[device_id_hash])
+        
+        deleted['devices'] += UserDevice.objects.filter(
+            device_id_hash__in=device_id_hashes,
+        ).delete()[0]
+        deleted['preferences'] += UserPreferences.objects.filter(
+            device_id_hash__in=device_id_hashes,
+        ).delete()[0]
+        deleted['safe_zones'] += SafeZone.objects.filter(
+            device_id_hash__in=device_id_hashes,
+        ).delete()[0]
+        deleted['topic_subscriptions'] += TopicSubscription.objects.filter(
+            device_id_hash__in=device_id_hashes,
+        ).delete()[0]
+        
+        # Badges cascade from the profile
+        _, profile_counts = UserProfile.objects.filter(
+            device_id_hash__in=device_id_hashes,
+        ).delete()
+        deleted['profiles'] += profile_counts.get('scoring.UserProfile', 0)
+        deleted['badges'] += profile_counts.get('scoring.Badge', 0)
+        
+        deleted['confirmations'] += IncidentConfirmation.objects.filter(
+            device_id_hash__in=device_id_hashes,
+        ).delete()[0]
+        # Notification logs store the raw device ID
+        deleted['notification_logs'] += NotificationLog.objects.filter(
+            device_id__in=device_ids,
+        ).delete()[0]
+        
+        # Incidents are kept for community safety but unlinked from the reporter
+        deleted['incidents'] += Incident.objects.filter(
+            reporter_device_id_hash__in=device_id_hashes,
+        ).update(reporter_device_id_hash=None)
+        
+        if tokens_by_topic:
+            transaction.on_commit(lambda: _unsubscribe_erased_tokens(tokens_by_topic))
+
+
+def _unsubscribe_erased_tokens(tokens_by_topic):
+    """Stop FCM topic broadcasts to erased devices, one call per topic."""
+    from push_notifications.services import get_messaging_service
+    
+    try:
+        service = get_messaging_service()
+        for topic, tokens in tokens_by_topic.items():
+            service.unsubscribe_from_topic(tokens, topic)
+    except Exception as e:
+        logger.error(f"Failed to unsubscribe erased devices from topics: {e}")
+
+
+def delete_users_data(device_ids, chunk_size=None):
+    """
+    Erase all data associated with many device_ids (for GDPR/CCPA compliance).
+    
+    Devices, preferences, safe zones, topic subscriptions, scoring profiles
+    with their badges, confirmations and notification logs are deleted;
+    reported incidents are kept for community safety but anonymized by
+    clearing the reporter hash. Each model is handled with one query per
+    chunk of devices and each chunk is erased in a single transaction.
+    
+    Args:
+        device_ids: Iterable of device identifiers to erase
+        chunk_size: Devices erased per transaction (default: USER_DATA_ERASURE_CHUNK_SIZE)
+        
+    Returns:
+        dict: Number of rows deleted (or incidents anonymized) per model,
+        the number of devices processed and the elapsed time in seconds
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'USER_DATA_ERASURE_CHUNK_SIZE', 500)
     
     deleted = {
         'devices': 0,
         'preferences': 0,
         'safe_zones': 0,
         'incidents': 0,
+        'topic_subscriptions': 0,
+        'profiles': 0,
+        'badges': 0,
+        'confirmations': 0,
+        'notification_logs': 0,
+        'device_ids': 0,
+        'elapsed_seconds': 0.0,
     }
     
-    # Use hash-based lookup for efficient filtering
-    device_id_hash = hash_device_id(device_id)
-    
-    # Delete user devices
-    devices = UserDevice.objects.filter(device_id_hash=device_id_hash)
-    deleted['devices'] = devices.count()
-    devices.delete()
-    
-    # Delete user preferences
-    prefs = UserPreferences.objects.filter(device_id_hash=device_id_hash)
-    deleted['preferences'] = prefs.count()
-    prefs.delete()
-    
-    # Delete safe zones
-    zones = SafeZone.objects.filter(device_id_hash=device_id_hash)
-    deleted['safe_zones'] = zones.count()
-    zones.delete()
-    
-    # Note: Incidents are typically kept for community safety
-    # but can be anonymized or deleted based on policy
-    # For now, we'll keep incidents but could add deletion here if needed
+    started = time.monotonic()
+    chunk = []
+    for device_id in device_ids:
+        chunk.append(device_id)
+        if len(chunk) >= chunk_size:
+            _erase_device_chunk(chunk, deleted)
+            deleted['device_ids'] += len(chunk)
+            chunk = []
+    if chunk:
+        _erase_device_chunk(chunk, deleted)
+        deleted['device_ids'] += len(chunk)
     
+    deleted['elapsed_seconds'] = round(time.monotonic() - started, 3)
     return deleted
 
 
@@ -148,64 +388,32 @@ def export_user_data(device_id):
     """
     Export all data associated with a device_id (for GDPR data portability).
     
+    Covers devices, preferences, safe zones, reported incidents, the scoring
+    profile, badges and incident confirmations. For large exports, stream
+    them with safezone_backend.data_export instead of building a dict.
+    
     Args:
         device_id: The device identifier to export data for
         
     Returns:
         dict: All user data in a portable format
     """
-    from user_settings.models import UserDevice, UserPreferences, SafeZone, hash_device_id
-    from incident_reporting.models import Incident
+    from user_settings.models import hash_device_id
+    from safezone_backend.data_export import (
+        SINGLE_OBJECT_SECTIONS,
+        iter_user_data_sections,
+    )
     
     data = {
         'device_id': device_id,
         'export_date': timezone.now().isoformat(),
-        'devices': [],
-        'preferences': {},
-        'safe_zones': [],
-        'incidents': [],
     }
     
     # Use hash-based lookup for efficient filtering
-    device_id_hash = hash_device_id(device_id)
-    
-    # Export devices
-    devices = UserDevice.objects.filter(device_id_hash=device_id_hash)
-    for device in devices:
-        data['devices'].append({
-            'platform': device.platform,
-            'created_at': device.created_at.isoformat(),
-            'updated_at': device.updated_at.isoformat(),
-            'is_active': device.is_active,
-        })
-    
-    # Export preferences
-    try:
-        prefs = UserPreferences.objects.get(device_id_hash=device_id_hash)
-        data['preferences'] = {
-            'alert_radius': prefs.alert_radius,
-            'default_zoom': prefs.default_zoom,
-            'push_notifications': prefs.push_notifications,
-            'proximity_alerts': prefs.proximity_alerts,
-            'sound_vibration': prefs.sound_vibration,
-            'anonymous_reporting': prefs.anonymous_reporting,
-            'created_at': prefs.created_at.isoformat(),
-            'updated_at': prefs.updated_at.isoformat(),
-        }
-    except UserPreferences.DoesNotExist:
-        pass
-    
-    # Export safe zones
-    zones = SafeZone.objects.filter(device_id_hash=device_id_hash)
-    for zone in zones:
-        data['safe_zones'].append({
-            'name': zone.name,
-            'zone_type': zone.zone_type,
-            'latitude': zone.latitude,
-            'longitude': zone.longitude,
-            'radius': zone.radius,
-            'is_active': zone.is_active,
-            'created_at': zone.created_at.isoformat(),
-        })
+    for section, records in iter_user_data_sections(hash_device_id(device_id)):
+        if section in SINGLE_OBJECT_SECTIONS:
+            data[section] = next(records, {})
+        else:
+            data[section] = list(records)
     
     return data
@@ -38,6 +38,8 @@ ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1,10.0
 # Must be defined early as it's used in other settings
 AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN', '')
 AUTH0_AUDIENCE = os.environ.get('AUTH0_AUDIENCE', '')
+# Access token permission (Auth0 RBAC) granting admin-only endpoints
+AUTH0_ADMIN_PERMISSION = os.environ.get('AUTH0_ADMIN_PERMISSION', 'admin:safezone')
 
 
 # Application definition
@@ -62,11 +64,13 @@ INSTALLED_APPS = [
     'user_settings',
     'emergency_services',
     'scoring',
+    # Project package, for its management commands
+    'safezone_backend',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'safezone_backend.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -245,6 +249,140 @@ CSRF_COOKIE_SAMESITE = 'Lax'
 INCIDENT_RETENTION_DAYS = int(os.environ.get('INCIDENT_RETENTION_DAYS', '90'))
 USER_PREFERENCES_INACTIVE_DAYS = int(os.environ.get('USER_PREFERENCES_INACTIVE_DAYS', '365'))
 DEVICE_TOKEN_INACTIVE_DAYS = int(os.environ.get('DEVICE_TOKEN_INACTIVE_DAYS', '180'))
+# Expired incidents are deleted in batches to keep cascade locks short
+INCIDENT_CLEANUP_BATCH_SIZE = int(os.environ.get('INCIDENT_CLEANUP_BATCH_SIZE', '1000'))
+# Seconds to pause between cleanup batches
+INCIDENT_CLEANUP_BATCH_SLEEP = float(os.environ.get('INCIDENT_CLEANUP_BATCH_SLEEP', '0.1'))
+# Stop incident cleanup after this many seconds (0 = no limit); the next run resumes
+INCIDENT_CLEANUP_TIME_BUDGET = int(os.environ.get('INCIDENT_CLEANUP_TIME_BUDGET', '0'))
+# Old incidents anonymized per UPDATE statement
+INCIDENT_ANONYMIZE_BATCH_SIZE = int(os.environ.get('INCIDENT_ANONYMIZE_BATCH_SIZE', '5000'))
+# Rows fetched per query by streaming user data exports
+USER_DATA_EXPORT_CHUNK_SIZE = int(os.environ.get('USER_DATA_EXPORT_CHUNK_SIZE', '1000'))
+# Devices erased per transaction by bulk user data deletion
+USER_DATA_ERASURE_CHUNK_SIZE = int(os.environ.get('USER_DATA_ERASURE_CHUNK_SIZE', '500'))
+
+# Time Partitioning (PostgreSQL only, ignored on other databases)
+# Store notification logs in monthly partitions of sent_at so retention drops whole partitions
+TIME_PARTITIONING_ENABLED = os.environ.get('TIME_PARTITIONING_ENABLED', 'False') == 'True'
+# Monthly partitions created ahead of the current month by manage_partitions
+TIME_PARTITIONING_MONTHS_AHEAD = int(os.environ.get('TIME_PARTITIONING_MONTHS_AHEAD', '3'))
+
+# Push Notification Targeting
+# Geohash precision of the in-memory safe zone index (5 = ~4.9km x 4.9km cells)
+SAFE_ZONE_INDEX_PRECISION = int(os.environ.get('SAFE_ZONE_INDEX_PRECISION', '5'))
+# Rebuild the per-worker index after this many seconds to pick up changes from other workers
+SAFE_ZONE_INDEX_MAX_AGE = int(os.environ.get('SAFE_ZONE_INDEX_MAX_AGE', '300'))
+# Zones covering more cells than this are checked on every match instead of being indexed by cell
+SAFE_ZONE_INDEX_MAX_CELLS = int(os.environ.get('SAFE_ZONE_INDEX_MAX_CELLS', '1024'))
+# Number of device hashes resolved to FCM tokens per query
+TOKEN_RESOLUTION_CHUNK_SIZE = int(os.environ.get('TOKEN_RESOLUTION_CHUNK_SIZE', '500'))
+# Number of devices handed to the messaging service (and logged) per batch
+NOTIFICATION_SEND_BATCH_SIZE = int(os.environ.get('NOTIFICATION_SEND_BATCH_SIZE', '500'))
+# Retries (with exponential backoff, in seconds) for transient and quota FCM failures
+FCM_MAX_RETRIES = int(os.environ.get('FCM_MAX_RETRIES', '3'))
+FCM_RETRY_BASE_DELAY = float(os.environ.get('FCM_RETRY_BASE_DELAY', '0.5'))
+FCM_RETRY_MAX_DELAY = float(os.environ.get('FCM_RETRY_MAX_DELAY', '8.0'))
+# Total backoff (seconds) one send may spend; sends run on the incident request path
+FCM_RETRY_BUDGET = float(os.environ.get('FCM_RETRY_BUDGET', '1.0'))
+# Broadcast to geohash cell topics when more devices than this match an incident (0 disables)
+NOTIFICATION_TOPIC_THRESHOLD = int(os.environ.get('NOTIFICATION_TOPIC_THRESHOLD', '1000'))
+# Broadcast to cell topics in dense areas; subscriptions are kept in sync by
+# running `manage.py sync_notification_topics` periodically
+NOTIFICATION_TOPICS_ENABLED = os.environ.get('NOTIFICATION_TOPICS_ENABLED', 'False') == 'True'
+NOTIFICATION_TOPIC_PRECISION = int(os.environ.get('NOTIFICATION_TOPIC_PRECISION', '5'))
+NOTIFICATION_TOPIC_PREFIX = 'cell_'
+# Messaging backend; use 'push_notifications.testing.FakeMessagingService' to run offline
+PUSH_MESSAGING_SERVICE = os.environ.get(
+    'PUSH_MESSAGING_SERVICE',
+    'push_notifications.services.FirebaseMessagingService',
+)
+
+# Incident Ingestion
+# Maximum number of incidents accepted by one POST /api/incidents/bulk/
+INCIDENT_BULK_MAX_ITEMS = int(os.environ.get('INCIDENT_BULK_MAX_ITEMS', '500'))
+# Rows fetched per query by streaming incident exports
+INCIDENT_EXPORT_CHUNK_SIZE = int(os.environ.get('INCIDENT_EXPORT_CHUNK_SIZE', '2000'))
+
+# Alert Geocoding
+# Reverse geocoder; use 'alerts.geocoding.GazetteerBackend' to geocode offline
+GEOCODER_BACKEND = os.environ.get('GEOCODER_BACKEND', 'alerts.geocoding.NominatimBackend')
+# Index built with `python manage.py build_gazetteer` for the gazetteer backend
+GEOCODER_GAZETTEER_PATH = os.environ.get('GEOCODER_GAZETTEER_PATH', str(BASE_DIR / 'gazetteer.bin'))
+# Places further than this (in km) are not used as an alert location
+GEOCODER_GAZETTEER_MAX_DISTANCE_KM = float(os.environ.get('GEOCODER_GAZETTEER_MAX_DISTANCE_KM', '5'))
+# Open the geocoder circuit after this many consecutive failures and probe again after the timeout (seconds)
+GEOCODER_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('GEOCODER_CIRCUIT_FAILURE_THRESHOLD', '5'))
+GEOCODER_CIRCUIT_RESET_TIMEOUT = float(os.environ.get('GEOCODER_CIRCUIT_RESET_TIMEOUT', '30'))
+# Per-worker limits on remote geocoder calls: concurrent calls, seconds between calls
+# and how long (seconds) a caller waits for a slot before falling back to coordinates
+GEOCODER_MAX_CONCURRENCY = int(os.environ.get('GEOCODER_MAX_CONCURRENCY', '2'))
+GEOCODER_MIN_INTERVAL = float(os.environ.get('GEOCODER_MIN_INTERVAL', '1.0'))
+GEOCODER_QUEUE_TIMEOUT = float(os.environ.get('GEOCODER_QUEUE_TIMEOUT', '0.5'))
+# Alert batches waiting for the background geocoder; further batches are left to `manage.py geocode_alerts`
+GEOCODER_BACKGROUND_MAX_PENDING = int(os.environ.get('GEOCODER_BACKGROUND_MAX_PENDING', '100'))
+
+# Emergency Services
+# Grid cell size (degrees) of the in-memory nearest-service index
+EMERGENCY_SERVICE_INDEX_CELL_SIZE = float(os.environ.get('EMERGENCY_SERVICE_INDEX_CELL_SIZE', '0.1'))
+# Rebuild the per-worker index after this many seconds to pick up changes from other workers
+EMERGENCY_SERVICE_INDEX_MAX_AGE = int(os.environ.get('EMERGENCY_SERVICE_INDEX_MAX_AGE', '300'))
+# GeoJSON country boundaries (e.g. Natural Earth admin 0) used to resolve country_code from coordinates
+COUNTRY_BOUNDARIES_PATH = os.environ.get('COUNTRY_BOUNDARIES_PATH', str(BASE_DIR / 'country_boundaries.geojson'))
+# Douglas-Peucker tolerance (degrees) applied to the boundaries when they are loaded
+COUNTRY_BOUNDARIES_SIMPLIFY_TOLERANCE = float(os.environ.get('COUNTRY_BOUNDARIES_SIMPLIFY_TOLERANCE', '0.01'))
+
+# Incident Map Clustering
+# Only incidents reported in the last CLUSTER_WINDOW_HOURS are clustered
+CLUSTER_WINDOW_HOURS = int(os.environ.get('CLUSTER_WINDOW_HOURS', '168'))
+# Deepest zoom level with its own clusters and grid cells per axis of a 256 px map tile
+CLUSTER_MAX_ZOOM = int(os.environ.get('CLUSTER_MAX_ZOOM', '16'))
+CLUSTER_CELLS_PER_TILE = int(os.environ.get('CLUSTER_CELLS_PER_TILE', '4'))
+# Rebuild the per-worker cluster index after this many seconds
+CLUSTER_INDEX_MAX_AGE = int(os.environ.get('CLUSTER_INDEX_MAX_AGE', '60'))
+# Maximum clusters returned per request
+CLUSTER_MAX_RESULTS = int(os.environ.get('CLUSTER_MAX_RESULTS', '1000'))
+
+# Incident Statistics
+# Geohash precision of the incident rollups (6 = cells of about 1.2 x 0.6 km);
+# run `manage.py rebuild_incident_rollups` after changing it
+INCIDENT_ROLLUP_PRECISION = int(os.environ.get('INCIDENT_ROLLUP_PRECISION', '6'))
+# Maximum cells returned by the heatmap endpoint
+INCIDENT_HEATMAP_MAX_CELLS = int(os.environ.get('INCIDENT_HEATMAP_MAX_CELLS', '5000'))
+
+# Route Safety
+# Incidents reported within this many hours count towards route risk
+ROUTE_RISK_WINDOW_HOURS = int(os.environ.get('ROUTE_RISK_WINDOW_HOURS', '168'))
+# Age in hours at which an incident contributes half its severity weight
+ROUTE_RISK_HALF_LIFE_HOURS = float(os.environ.get('ROUTE_RISK_HALF_LIFE_HOURS', '24'))
+# Default and maximum distance (meters) from the route at which incidents count
+ROUTE_CORRIDOR_METERS = float(os.environ.get('ROUTE_CORRIDOR_METERS', '100'))
+ROUTE_MAX_CORRIDOR_METERS = float(os.environ.get('ROUTE_MAX_CORRIDOR_METERS', '1000'))
+# Maximum number of points in a scored route
+ROUTE_MAX_POINTS = int(os.environ.get('ROUTE_MAX_POINTS', '5000'))
+# Grid cell size (degrees) of the recent incident index
+ROUTE_INDEX_CELL_SIZE = float(os.environ.get('ROUTE_INDEX_CELL_SIZE', '0.01'))
+# Seconds before a worker rebuilds its index from the database
+ROUTE_INDEX_MAX_AGE = int(os.environ.get('ROUTE_INDEX_MAX_AGE', '60'))
+
+# Area Risk Grid
+# Grid cell size (degrees) and cells per side of each allocated region
+RISK_GRID_CELL_SIZE = float(os.environ.get('RISK_GRID_CELL_SIZE', '0.005'))
+RISK_GRID_REGION_CELLS = int(os.environ.get('RISK_GRID_REGION_CELLS', '100'))
+# Age in hours at which an incident contributes half its risk
+RISK_GRID_HALF_LIFE_HOURS = float(os.environ.get('RISK_GRID_HALF_LIFE_HOURS', '24'))
+# Incidents older than this many hours are left out when the grid is rebuilt
+RISK_GRID_WINDOW_HOURS = int(os.environ.get('RISK_GRID_WINDOW_HOURS', '720'))
+# Extra risk per confirmation, as a fraction of the incident's severity weight
+RISK_GRID_CONFIRMATION_WEIGHT = float(os.environ.get('RISK_GRID_CONFIRMATION_WEIGHT', '0.5'))
+# Seconds before a worker rebuilds its grid from the database
+RISK_GRID_MAX_AGE = int(os.environ.get('RISK_GRID_MAX_AGE', '300'))
+
+# Content Caching (guides and emergency services)
+# Cache-Control max-age (seconds) clients may reuse responses before revalidating with If-None-Match
+CONTENT_CACHE_MAX_AGE = int(os.environ.get('CONTENT_CACHE_MAX_AGE', '300'))
+# How long (seconds) rendered response bodies are kept in the cache
+CONTENT_CACHE_TIMEOUT = int(os.environ.get('CONTENT_CACHE_TIMEOUT', '86400'))
 
 # Field Encryption Key (for encrypted model fields)
 # In production, use a separate key from SECRET_KEY stored in secure key management
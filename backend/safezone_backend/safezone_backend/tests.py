@@ -83,3 +83,184 @@ class FieldEncryptionKeyTestCase(unittest.TestCase):
 
 if __name__ == '__main__':
     unittest.main()
+
+
+class AsyncWhiteNoiseMiddlewareTestCase(unittest.TestCase):
+    """Test cases for the async-capable static file middleware."""
+
+    def test_async_chain_stays_async(self):
+        """Test that the middleware awaits an async downstream handler."""
+        import asyncio
+        from asgiref.sync import iscoroutinefunction
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from safezone_backend.middleware import AsyncWhiteNoiseMiddleware
+
+        async def get_response(request):
+            return HttpResponse('ok')
+
+        middleware = AsyncWhiteNoiseMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        response = asyncio.run(middleware(RequestFactory().get('/api/incidents/')))
+        self.assertEqual(response.content, b'ok')
+
+    def test_sync_chain_stays_sync(self):
+        """Test that the middleware still works in a WSGI middleware chain."""
+        from asgiref.sync import iscoroutinefunction
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from safezone_backend.middleware import AsyncWhiteNoiseMiddleware
+
+        middleware = AsyncWhiteNoiseMiddleware(lambda request: HttpResponse('ok'))
+        self.assertFalse(iscoroutinefunction(middleware))
+
+        response = middleware(RequestFactory().get('/api/incidents/'))
+        self.assertEqual(response.content, b'ok')
+
+
+class PartitioningTestCase(unittest.TestCase):
+    """Test cases for monthly time partitioning helpers."""
+
+    def _fake_connection(self):
+        """Build a PostgreSQL-like connection that records executed SQL."""
+        from unittest.mock import MagicMock
+        connection = MagicMock(vendor='postgresql', alias='default')
+        connection.ops.quote_name = lambda name: f'"{name}"'
+        self.cursor = connection.cursor.return_value.__enter__.return_value
+        return connection
+
+    def test_month_arithmetic(self):
+        """Test month helpers across year boundaries."""
+        from datetime import date, datetime
+        from safezone_backend.partitioning import add_months, month_start, partition_name
+
+        self.assertEqual(month_start(datetime(2026, 10, 19, 8, 30)), date(2026, 10, 1))
+        self.assertEqual(add_months(date(2026, 11, 1), 2), date(2027, 1, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+        self.assertEqual(
+            partition_name('push_notifications_notificationlog', date(2027, 1, 1)),
+            'push_notifications_notificationlog_p202701'
+        )
+
+    def test_noop_on_sqlite(self):
+        """Test that partitioning degrades to the plain table layout on SQLite."""
+        from django.db import connection
+        from django.test import override_settings
+        from django.utils import timezone
+        from safezone_backend import partitioning
+
+        table = 'push_notifications_notificationlog'
+        with override_settings(TIME_PARTITIONING_ENABLED=True):
+            self.assertFalse(partitioning.partitioning_enabled(connection))
+            self.assertFalse(partitioning.is_partitioned(table, connection))
+            self.assertEqual(partitioning.ensure_partitions(table, 'sent_at'), [])
+            self.assertEqual(partitioning.drop_expired_partitions(timezone.now()), [])
+
+    def test_drop_only_fully_expired_partitions(self):
+        """Test that the month holding the cutoff is kept."""
+        from datetime import date, datetime, timezone as dt_timezone
+        from safezone_backend import partitioning
+
+        table = 'push_notifications_notificationlog'
+        partitions = [
+            (f'{table}_p202606', date(2026, 6, 1)),
+            (f'{table}_p202607', date(2026, 7, 1)),
+            (f'{table}_p202608', date(2026, 8, 1)),
+        ]
+        connection = self._fake_connection()
+        cutoff = datetime(2026, 7, 21, tzinfo=dt_timezone.utc)
+
+        with patch.object(partitioning, 'list_partitions', return_value=partitions):
+            dropped = partitioning.drop_partitions_before(table, cutoff, connection)
+
+        self.assertEqual(dropped, [f'{table}_p202606'])
+        self.cursor.execute.assert_called_once_with(f'DROP TABLE "{table}_p202606"')
+
+    def test_ensure_partitions_creates_missing_months(self):
+        """Test that only missing months up to months_ahead are created."""
+        from datetime import date, datetime, timezone as dt_timezone
+        from safezone_backend import partitioning
+
+        table = 'push_notifications_notificationlog'
+        connection = self._fake_connection()
+        now = datetime(2026, 11, 15, tzinfo=dt_timezone.utc)
+
+        with patch.object(partitioning, 'is_partitioned', return_value=True), \
+                patch.object(partitioning, 'list_partitions',
+                             return_value=[(f'{table}_p202611', date(2026, 11, 1))]), \
+                patch.object(partitioning, 'create_partition',
+                             side_effect=lambda t, c, month, conn: partitioning.partition_name(t, month)), \
+                patch('safezone_backend.partitioning.timezone.now', return_value=now):
+            created = partitioning.ensure_partitions(table, 'sent_at', months_ahead=2, connection=connection)
+
+        self.assertEqual(created, [f'{table}_p202612', f'{table}_p202701'])
+
+    def test_manage_partitions_without_postgresql(self):
+        """Test that the maintenance command does nothing on SQLite."""
+        from io import StringIO
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('manage_partitions', '--drop-expired', stdout=out)
+        self.assertIn('nothing to do', out.getvalue())
+
+
+class BulkLoadingTestCase(unittest.TestCase):
+    """Test cases for the streaming dataset readers."""
+
+    def test_parse_bool(self):
+        """Test reading boolean fields from CSV strings and JSON values."""
+        from safezone_backend.bulk_loading import parse_bool
+
+        for value in [None, '', 'yes', 'TRUE', '1', True, 1]:
+            self.assertIs(parse_bool(value), True)
+        for value in ['0', ' False ', 'no', False, 0]:
+            self.assertIs(parse_bool(value), False)
+        self.assertIs(parse_bool('', default=False), False)
+
+    def test_json_array_streams_across_chunks(self):
+        """Test that array elements and numbers split across reads are decoded whole."""
+        from io import StringIO
+        from safezone_backend.bulk_loading import _iter_json, _JSONStream
+
+        document = '[{"name": "A", "value": 12345}, {"name": "B, [x]"},\n {"name": "C"}]'
+        stream = _JSONStream(StringIO(document), chunk_size=7)
+        self.assertEqual(
+            list(stream.array()),
+            [{'name': 'A', 'value': 12345}, {'name': 'B, [x]'}, {'name': 'C'}],
+        )
+        self.assertEqual(list(_iter_json(StringIO('[]'))), [])
+
+    def test_geojson_features_are_flattened(self):
+        """Test that features are read from a FeatureCollection with properties and points."""
+        from io import StringIO
+        from safezone_backend.bulk_loading import iter_records
+
+        document = (
+            '{"type": "FeatureCollection", "name": {"nested": [1, 2]}, "features": ['
+            '{"type": "Feature", "id": "node/1", "properties": {"name": "Station"},'
+            ' "geometry": {"type": "Point", "coordinates": [-0.2, 5.6]}}'
+            '], "crs": null}'
+        )
+        self.assertEqual(
+            list(iter_records(StringIO(document), 'json')),
+            [{'name': 'Station', 'id': 'node/1', 'latitude': 5.6, 'longitude': -0.2}],
+        )
+
+    def test_csv_and_ndjson(self):
+        """Test reading CSV rows and NDJSON lines."""
+        from io import StringIO
+        from safezone_backend.bulk_loading import detect_format, iter_records
+
+        self.assertEqual(
+            list(iter_records(StringIO('name,latitude\nA,1.5\n'), 'csv')),
+            [{'name': 'A', 'latitude': '1.5'}],
+        )
+        self.assertEqual(
+            list(iter_records(StringIO('{"name": "A"}\n\n{"name": "B"}\n'), 'ndjson')),
+            [{'name': 'A'}, {'name': 'B'}],
+        )
+        self.assertEqual(detect_format('services.GeoJSON'), 'json')
+        with self.assertRaises(ValueError):
+            list(iter_records(StringIO(''), None))
@@ -135,8 +135,9 @@ class UserProfile(models.Model):
         self.current_tier = new_tier
         return tier_changed
     
-    def add_report_points(self, incident):
-        """Add points for creating a report."""
+    @staticmethod
+    def get_report_points(incident):
+        """Get (base_points, time_bonus) earned for a report."""
         base_points = 10
         time_bonus = 0
         
@@ -145,6 +146,11 @@ class UserProfile(models.Model):
         if time_diff <= timedelta(hours=1):
             time_bonus = 2
         
+        return base_points, time_bonus
+    
+    def add_report_points(self, incident):
+        """Add points for creating a report."""
+        base_points, time_bonus = self.get_report_points(incident)
         points_earned = base_points + time_bonus
         self.total_points += points_earned
         self.reports_count += 1
@@ -162,6 +168,63 @@ class UserProfile(models.Model):
             'new_tier': self.current_tier if tier_changed else None
         }
     
+    @classmethod
+    def add_bulk_report_points(cls, reports):
+        """
+        Add report points for many incidents with grouped queries.
+        
+        Missing profiles are created with one bulk insert and all touched
+        profiles are saved with one bulk update, instead of a
+        get_or_create() and save() per incident.
+        
+        Args:
+            reports: Iterable of (device_id, incident) tuples
+            
+        Returns:
+            Dictionary mapping device_id_hash to points earned
+        """
+        reports_by_hash = {}
+        for device_id, incident in reports:
+            device_id_hash = hash_device_id(device_id)
+            reports_by_hash.setdefault(device_id_hash, (device_id, []))[1].append(incident)
+        
+        if not reports_by_hash:
+            return {}
+        
+        existing = set(
+            cls.objects.filter(
+                device_id_hash__in=reports_by_hash,
+            ).values_list('device_id_hash', flat=True)
+        )
+        cls.objects.bulk_create(
+            [
+                cls(device_id_hash=device_id_hash, device_id=device_id)
+                for device_id_hash, (device_id, _) in reports_by_hash.items()
+                if device_id_hash not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        
+        now = timezone.now()
+        points_by_hash = {}
+        profiles = list(cls.objects.filter(device_id_hash__in=reports_by_hash))
+        for profile in profiles:
+            _, incidents = reports_by_hash[profile.device_id_hash]
+            points_earned = sum(
+                sum(cls.get_report_points(incident)) for incident in incidents
+            )
+            profile.total_points += points_earned
+            profile.reports_count += len(incidents)
+            profile.update_tier()
+            profile.updated_at = now
+            points_by_hash[profile.device_id_hash] = points_earned
+        
+        cls.objects.bulk_update(
+            profiles,
+            ['total_points', 'reports_count', 'current_tier', 'updated_at'],
+        )
+        return points_by_hash
+    
     def add_confirmation_points(self):
         """Add points for confirming an incident."""
         points_earned = 5
@@ -4,14 +4,16 @@ from django.db import IntegrityError
 from datetime import timedelta
 from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
 from rest_framework import status
-from user_settings.models import UserDevice, SafeZone, UserPreferences
+from user_settings.models import UserDevice, SafeZone, UserPreferences, hash_device_id
 from django.contrib.auth.models import User
 from incident_reporting.models import Incident
 from safezone_backend.security_utils import (
     cleanup_expired_incidents,
     cleanup_inactive_user_preferences,
+    anonymize_old_incidents,
     export_user_data,
-    delete_user_data
+    delete_user_data,
+    delete_users_data,
 )
 from authentication.auth0 import Auth0User
 from user_settings.views import UserDeviceRegisterView
@@ -150,6 +152,134 @@ class DataRetentionTestCase(TestCase):
         self.assertFalse(Incident.objects.filter(pk=self.old_incident.pk).exists())
         self.assertTrue(Incident.objects.filter(pk=self.new_incident.pk).exists())
     
+    def test_cleanup_expired_incidents_in_batches(self):
+        """Test batched deletion, cascades and progress reporting."""
+        from alerts.models import Alert
+        
+        old_date = timezone.now() - timedelta(days=100)
+        for index in range(4):
+            incident = Incident.objects.create(
+                category='theft',
+                latitude=37.7749,
+                longitude=-122.4194,
+                title=f'Old Incident {index}',
+            )
+            Incident.objects.filter(pk=incident.pk).update(timestamp=old_date)
+            Alert.objects.create(incident=incident, title='Alert', location='Somewhere')
+        
+        progress = []
+        deleted = cleanup_expired_incidents(
+            batch_size=2,
+            sleep_seconds=0,
+            progress_callback=progress.append,
+        )
+        
+        self.assertEqual(deleted, 5)
+        self.assertEqual([p['batch'] for p in progress], [1, 2, 3])
+        self.assertEqual(progress[-1]['deleted'], 5)
+        self.assertEqual(progress[-1]['cascaded'], 4)
+        self.assertEqual(list(Incident.objects.values_list('pk', flat=True)), [self.new_incident.pk])
+        self.assertEqual(Alert.objects.count(), 0)
+    
+    def test_cleanup_expired_incidents_time_budget(self):
+        """Test that cleanup stops at the time budget and resumes on the next run."""
+        from unittest.mock import patch
+        
+        old_date = timezone.now() - timedelta(days=100)
+        for index in range(3):
+            incident = Incident.objects.create(
+                category='theft',
+                latitude=37.7749,
+                longitude=-122.4194,
+                title=f'Old Incident {index}',
+            )
+            Incident.objects.filter(pk=incident.pk).update(timestamp=old_date)
+        
+        # Each monotonic() call advances the clock by 10 seconds
+        clock = iter(range(0, 1000, 10))
+        with patch('safezone_backend.security_utils.time.monotonic', side_effect=lambda: next(clock)):
+            deleted = cleanup_expired_incidents(batch_size=1, sleep_seconds=0, time_budget=15)
+        
+        self.assertEqual(deleted, 2)
+        self.assertEqual(Incident.objects.filter(timestamp__lt=timezone.now() - timedelta(days=90)).count(), 2)
+        
+        self.assertEqual(cleanup_expired_incidents(batch_size=1, sleep_seconds=0), 2)
+        self.assertEqual(Incident.objects.count(), 1)
+    
+    def test_anonymize_old_incidents(self):
+        """Test that old incidents are anonymized in bulk like the per-row version."""
+        old_date = timezone.now() - timedelta(days=100)
+        fire = Incident.objects.create(
+            category='fire',
+            latitude=-33.868812,
+            longitude=151.209312,
+            title='Warehouse fire',
+            description='Near the docks',
+        )
+        Incident.objects.filter(pk=fire.pk).update(timestamp=old_date)
+        
+        # Per chunk: savepoint, row query, two UPDATEs (incidents, alerts), rounded
+        # coordinates query and release; the theft incident changes rollup cell, adding
+        # a nested savepoint, insert, two count updates, delete and release. Then the
+        # final empty chunk.
+        with self.assertNumQueries(21):
+            anonymized = anonymize_old_incidents(batch_size=1)
+        self.assertEqual(anonymized, 2)
+        
+        for incident, expected_title in [(self.old_incident, 'Theft - Historical'), (fire, 'Fire - Historical')]:
+            original = incident
+            incident = Incident.objects.get(pk=incident.pk)
+            self.assertAlmostEqual(incident.latitude, round(original.latitude, 2))
+            self.assertAlmostEqual(incident.longitude, round(original.longitude, 2))
+            self.assertEqual(incident.title, expected_title)
+            self.assertEqual(incident.description, 'Historical incident - details removed for privacy')
+        
+        self.new_incident.refresh_from_db()
+        self.assertEqual(self.new_incident.title, 'New Incident')
+        self.assertEqual(self.new_incident.latitude, 37.7750)
+    
+    def test_anonymize_skips_anonymized_incidents(self):
+        """Test that a second run leaves anonymized incidents alone and indexes are reset."""
+        from incident_reporting.routes import get_route_index, peek_route_index
+        
+        get_route_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(anonymize_old_incidents(), 1)
+        self.assertIsNone(peek_route_index())
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            # One empty chunk: savepoint, row query, release
+            with self.assertNumQueries(3):
+                self.assertEqual(anonymize_old_incidents(), 0)
+        self.assertEqual(callbacks, [])
+    
+    def test_anonymize_then_cleanup_keeps_rollups_consistent(self):
+        """Test that anonymized incidents are uncounted from their rounded cell on cleanup."""
+        from incident_reporting.models import IncidentRollup
+        from incident_reporting.rollups import rebuild_rollups, rollup_key
+        
+        rebuild_rollups()
+        old = self.old_incident
+        self.assertNotEqual(
+            rollup_key(old.latitude, old.longitude, old.timestamp, old.category),
+            rollup_key(round(old.latitude, 2), round(old.longitude, 2), old.timestamp, old.category),
+        )
+        
+        def rollups():
+            return sorted(IncidentRollup.objects.values_list('geohash', 'hour', 'category', 'count'))
+        
+        anonymize_old_incidents()
+        anonymized = rollups()
+        rebuild_rollups()
+        self.assertEqual(anonymized, rollups())
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            cleanup_expired_incidents(sleep_seconds=0)
+        self.assertEqual(
+            list(IncidentRollup.objects.values_list('category', 'count')),
+            [('assault', 1)],
+        )
+    
     def test_cleanup_inactive_preferences(self):
         """Test that inactive user preferences are cleaned up."""
         
@@ -221,6 +351,86 @@ class UserDataManagementTestCase(TestCase):
         self.assertEqual(data['preferences']['alert_radius'], 5.0)
         self.assertEqual(data['safe_zones'][0]['name'], 'Home')
     
+    def test_export_user_data_all_apps(self):
+        """Test that incidents, scoring and confirmations are exported."""
+        from scoring.models import UserProfile, Badge, IncidentConfirmation
+        
+        incident = Incident.objects.create(
+            category='theft',
+            latitude=37.7749,
+            longitude=-122.4194,
+            title='Reported theft',
+            reporter_device_id_hash=hash_device_id(self.device_id),
+        )
+        other = Incident.objects.create(
+            category='fire', latitude=37.7749, longitude=-122.4194, title='Other fire',
+        )
+        profile = UserProfile.objects.create(device_id=self.device_id, total_points=15)
+        Badge.objects.create(profile=profile, badge_type='truth_triangulator')
+        IncidentConfirmation.objects.create(incident=other, device_id=self.device_id)
+        
+        data = export_user_data(self.device_id)
+        
+        self.assertEqual([row['id'] for row in data['incidents']], [incident.id])
+        self.assertEqual(data['profile']['total_points'], 15)
+        self.assertEqual(data['badges'][0]['badge_type'], 'truth_triangulator')
+        self.assertEqual(data['confirmations'][0]['incident_id'], other.id)
+    
+    def test_streaming_exports_match_dict_export(self):
+        """Test that the JSON and zipped NDJSON exports hold the same data."""
+        import io
+        import json
+        import zipfile
+        from safezone_backend.data_export import write_user_data_archive, write_user_data_json
+        
+        Incident.objects.create(
+            category='theft',
+            latitude=37.7749,
+            longitude=-122.4194,
+            title='Reported theft',
+            reporter_device_id_hash=hash_device_id(self.device_id),
+        )
+        expected = export_user_data(self.device_id)
+        del expected['export_date']
+        
+        output = io.StringIO()
+        write_user_data_json(self.device_id, output)
+        exported = json.loads(output.getvalue())
+        del exported['export_date']
+        self.assertEqual(exported, expected)
+        self.assertEqual(exported['profile'], {})
+        
+        archive = io.BytesIO()
+        self.assertEqual(write_user_data_archive([self.device_id, 'unknown-device'], archive), 2)
+        with zipfile.ZipFile(archive) as zipped:
+            self.assertEqual(len(zipped.namelist()), 2)
+            lines = zipped.read(f'{hash_device_id(self.device_id)}.ndjson').decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(records[0]['data']['device_id'], self.device_id)
+        self.assertEqual(
+            [record['section'] for record in records[1:]],
+            ['devices', 'preferences', 'safe_zones', 'incidents'],
+        )
+    
+    def test_export_user_data_command(self):
+        """Test bulk export through the management command."""
+        import io
+        import os
+        import tempfile
+        import zipfile
+        from django.core.management import call_command
+        
+        with tempfile.TemporaryDirectory() as directory:
+            ids_path = os.path.join(directory, 'ids.txt')
+            with open(ids_path, 'w') as ids_file:
+                ids_file.write(f'{self.device_id}\nother-device\n')
+            output = os.path.join(directory, 'exports.zip')
+            
+            call_command('export_user_data', device_ids_file=ids_path, output=output, stderr=io.StringIO())
+            
+            with zipfile.ZipFile(output) as zipped:
+                self.assertEqual(len(zipped.namelist()), 2)
+    
     def test_delete_user_data(self):
         """Test deleting all user data."""
         # Delete all data for the device
@@ -237,6 +447,117 @@ class UserDataManagementTestCase(TestCase):
         self.assertEqual(SafeZone.objects.filter(device_id=self.device_id).count(), 0)
 
 
+@override_settings(PUSH_MESSAGING_SERVICE='push_notifications.testing.FakeMessagingService')
+class UserDataErasureTestCase(TestCase):
+    """Test complete and bulk erasure of user data."""
+    
+    def setUp(self):
+        from push_notifications.testing import FakeMessagingService
+        FakeMessagingService.reset()
+    
+    def tearDown(self):
+        from push_notifications.testing import FakeMessagingService
+        from push_notifications.spatial_index import reset_safe_zone_index
+        FakeMessagingService.reset()
+        reset_safe_zone_index()
+    
+    def _create_user(self, device_id):
+        from scoring.models import UserProfile, Badge, IncidentConfirmation
+        from push_notifications.models import NotificationLog, TopicSubscription
+        
+        device_id_hash = hash_device_id(device_id)
+        UserDevice.objects.create(device_id=device_id, fcm_token=f'token-{device_id}')
+        UserPreferences.objects.create(device_id=device_id)
+        SafeZone.objects.create(
+            device_id=device_id, name='Home', latitude=37.7749, longitude=-122.4194, radius=500,
+        )
+        reported = Incident.objects.create(
+            category='theft', latitude=37.7749, longitude=-122.4194, title='Theft',
+            reporter_device_id_hash=device_id_hash,
+        )
+        profile = UserProfile.objects.create(device_id=device_id)
+        Badge.objects.create(profile=profile, badge_type='first_responder')
+        IncidentConfirmation.objects.create(incident=self.other_incident, device_id=device_id)
+        NotificationLog.objects.create(
+            incident=self.other_incident, device_id=device_id, fcm_token=f'token-{device_id}',
+        )
+        TopicSubscription.objects.create(device_id_hash=device_id_hash, topic='cell_9q8yy')
+        return reported
+    
+    def test_delete_user_data_covers_all_apps(self):
+        """Test that every model tied to the device is erased or anonymized."""
+        from push_notifications.testing import FakeMessagingService
+        from scoring.models import UserProfile, Badge, IncidentConfirmation
+        from push_notifications.models import NotificationLog, TopicSubscription
+        
+        self.other_incident = Incident.objects.create(
+            category='fire', latitude=37.7749, longitude=-122.4194, title='Fire',
+        )
+        reported = self._create_user('erase-me')
+        self._create_user('keep-me')
+        FakeMessagingService.subscriptions['cell_9q8yy'] = {'token-erase-me', 'token-keep-me'}
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            result = delete_user_data('erase-me')
+        
+        for key in ['devices', 'preferences', 'safe_zones', 'incidents', 'topic_subscriptions',
+                    'profiles', 'badges', 'confirmations', 'notification_logs']:
+            self.assertEqual(result[key], 1, key)
+        self.assertIn('elapsed_seconds', result)
+        
+        reported.refresh_from_db()
+        self.assertIsNone(reported.reporter_device_id_hash)
+        self.assertTrue(Incident.objects.filter(pk=reported.pk).exists())
+        
+        self.assertEqual(UserDevice.objects.count(), 1)
+        self.assertEqual(UserProfile.objects.count(), 1)
+        self.assertEqual(Badge.objects.count(), 1)
+        self.assertEqual(IncidentConfirmation.objects.count(), 1)
+        self.assertEqual(NotificationLog.objects.count(), 1)
+        self.assertEqual(TopicSubscription.objects.count(), 1)
+        self.assertEqual(FakeMessagingService.subscribers('cell_9q8yy'), {'token-keep-me'})
+    
+    def test_bulk_erasure(self):
+        """Test erasing many devices with a bounded number of queries."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self.other_incident = Incident.objects.create(
+            category='fire', latitude=37.7749, longitude=-122.4194, title='Fire',
+        )
+        device_ids = [f'bulk-{index}' for index in range(6)]
+        for device_id in device_ids:
+            self._create_user(device_id)
+        
+        with CaptureQueriesContext(connection) as few:
+            delete_users_data(device_ids[:2], chunk_size=10)
+        with CaptureQueriesContext(connection) as many:
+            result = delete_users_data(device_ids[2:], chunk_size=10)
+        
+        self.assertEqual(result['device_ids'], 4)
+        self.assertEqual(result['profiles'], 4)
+        self.assertEqual(result['incidents'], 4)
+        self.assertEqual(Incident.objects.exclude(reporter_device_id_hash=None).count(), 0)
+        # Statements per chunk do not grow with the number of devices
+        self.assertEqual(len(few), len(many))
+    
+    def test_erase_user_data_command(self):
+        """Test bulk erasure through the management command."""
+        import io
+        from django.core.management import call_command
+        
+        self.other_incident = Incident.objects.create(
+            category='fire', latitude=37.7749, longitude=-122.4194, title='Fire',
+        )
+        self._create_user('command-device')
+        
+        out = io.StringIO()
+        call_command('erase_user_data', device_id=['command-device'], stdout=out)
+        
+        self.assertIn('Erased data for 1 device(s)', out.getvalue())
+        self.assertEqual(UserDevice.objects.count(), 0)
+
+
 class SecuritySettingsTestCase(TestCase):
     """Test Django security settings."""
     